@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.counts import EstimatedCountAdminMixin
 from .models import Author, Genre, Book
 
 @admin.register(Author)
@@ -13,7 +14,7 @@ class GenreAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'author', 'genre', 'available_copies', 'total_copies')
     list_filter = ('genre', 'author')
     search_fields = ('title', 'author__name', 'isbn')
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Book, Author, Genre
+from .search import search_books
 
 class BookForm(forms.ModelForm):
     class Meta:
@@ -58,4 +59,30 @@ class BookSearchForm(forms.Form):
     available_only = forms.BooleanField(
         required=False,
         label='Только доступные'
-    )
\ No newline at end of file
+    )
+
+    def get_ordering(self):
+        """Ключи сортировки результатов: по релевантности при поиске, иначе по названию"""
+        if self.is_valid() and self.cleaned_data.get('query'):
+            return ['-rank', 'title', 'id']
+        return ['title', 'id']
+
+    def filter_queryset(self, queryset):
+        """Применяет поиск и фильтры формы к queryset книг"""
+        if not self.is_valid():
+            return queryset
+
+        query = self.cleaned_data.get('query')
+        genre = self.cleaned_data.get('genre')
+        available_only = self.cleaned_data.get('available_only')
+
+        if query:
+            queryset = search_books(queryset, query)
+
+        if genre:
+            queryset = queryset.filter(genre=genre)
+
+        if available_only:
+            queryset = queryset.filter(available_copies__gt=0)
+
+        return queryset
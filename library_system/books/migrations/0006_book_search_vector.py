@@ -0,0 +1,47 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_search_vectors(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Author = apps.get_model('books', 'Author')
+    Genre = apps.get_model('books', 'Genre')
+
+    author_name = Subquery(Author.objects.filter(pk=OuterRef('author_id')).values('name')[:1])
+    genre_name = Subquery(Genre.objects.filter(pk=OuterRef('genre_id')).values('name')[:1])
+
+    Book.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='russian')
+        + SearchVector(author_name, weight='B', config='russian')
+        + SearchVector(genre_name, weight='C', config='russian')
+        + SearchVector('description', weight='D', config='russian')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_bookrequest'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='book_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_book_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество читателей')),
+                ('book_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='books.book', verbose_name='Книга A')),
+                ('book_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='books.book', verbose_name='Книга B')),
+            ],
+            options={
+                'verbose_name': 'Совместная выдача',
+                'verbose_name_plural': 'Совместные выдачи',
+                'constraints': [models.UniqueConstraint(fields=('book_a', 'book_b'), name='book_cooccurrence_pair_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='books.book', verbose_name='Книга')),
+                ('similar_book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='books.book', verbose_name='Похожая книга')),
+            ],
+            options={
+                'verbose_name': 'Похожая книга',
+                'verbose_name_plural': 'Похожие книги',
+                'constraints': [models.UniqueConstraint(fields=('book', 'similar_book'), name='book_similarity_pair_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_bookcooccurrence_booksimilarity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(models.Func(django.db.models.functions.text.Upper('isbn'), models.Value('[^0-9X]'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE'), name='book_isbn_normalized_idx'),
+        ),
+    ]
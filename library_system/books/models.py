@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
@@ -30,6 +33,10 @@ class Genre(models.Model):
         verbose_name = 'Жанр'
         verbose_name_plural = 'Жанры'
 
+def normalized_isbn(field='isbn'):
+    """ISBN без дефисов и пробелов в верхнем регистре, как его приводит импорт каталога"""
+    return models.Func(Upper(field), models.Value('[^0-9X]'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE')
+
 class Book(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название')
     author = models.ForeignKey(Author, on_delete=models.CASCADE, verbose_name='Автор')
@@ -49,6 +56,7 @@ class Book(models.Model):
     publisher = models.CharField(max_length=200, blank=True, null=True, verbose_name='Издательство')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Поисковый документ')
     
     def save(self, *args, **kwargs):
         if not self.pk:  
@@ -66,6 +74,12 @@ class Book(models.Model):
         verbose_name = 'Книга'
         verbose_name_plural = 'Книги'
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            GinIndex(fields=['search_vector'], name='book_search_vector_idx'),
+            GinIndex(fields=['title'], name='book_title_trgm_idx', opclasses=['gin_trgm_ops']),
+            models.Index(normalized_isbn(), name='book_isbn_normalized_idx'),
+        ]
 
 
 class BookRequest(models.Model):
@@ -133,3 +147,35 @@ class BorrowRecord(models.Model):
         verbose_name = 'Запись о выдаче'
         verbose_name_plural = 'Записи о выдачах'
         ordering = ['-borrow_date']
+
+
+
+class BookCooccurrence(models.Model):
+    """Сколько читателей брали обе книги; при book_a == book_b - число читателей книги"""
+    book_a = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name='Книга A')
+    book_b = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name='Книга B')
+    count = models.IntegerField(default=0, verbose_name='Количество читателей')
+
+    class Meta:
+        verbose_name = 'Совместная выдача'
+        verbose_name_plural = 'Совместные выдачи'
+        constraints = [
+            models.UniqueConstraint(fields=['book_a', 'book_b'], name='book_cooccurrence_pair_uniq'),
+        ]
+
+
+class BookSimilarity(models.Model):
+    """Предрассчитанные похожие книги ("с этой книгой также брали")"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similarities', verbose_name='Книга')
+    similar_book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_to', verbose_name='Похожая книга')
+    score = models.FloatField(verbose_name='Сходство')
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.similar_book_id} ({self.score:.3f})"
+
+    class Meta:
+        verbose_name = 'Похожая книга'
+        verbose_name_plural = 'Похожие книги'
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'similar_book'], name='book_similarity_pair_uniq'),
+        ]
@@ -0,0 +1,210 @@
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+
+from borrowings.models import Borrowing
+from core.models import HighWaterMark
+from .models import Book, BookCooccurrence, BookSimilarity, BorrowRecord
+
+TOP_N = 20
+
+# Оба журнала выдач: (имя отметки, модель)
+LOAN_SOURCES = [
+    ('recommendations:borrowing', Borrowing),
+    ('recommendations:borrowrecord', BorrowRecord),
+]
+
+
+def _pairs(rows):
+    """Список (user_id, book_id) -> два массива int64"""
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    array = np.asarray(rows, dtype=np.int64)
+    return array[:, 0], array[:, 1]
+
+
+def _encode(users, books, base):
+    return users * base + books
+
+
+def _collect_new_loans(marks):
+    """Выдачи, еще не учтенные по отметкам журналов, и фильтры уже учтенных; отметки сдвигаются в памяти"""
+    rows, counted = [], {}
+    for name, model in LOAN_SOURCES:
+        counted[name] = marks[name].counted()
+        claimed = marks[name].claim(model.objects.all())
+        if claimed is not None:
+            rows.extend(model.objects.filter(claimed).values_list('user_id', 'book_id'))
+    return _pairs(rows), counted
+
+
+def _collect_history(user_ids, counted):
+    """Ранее учтенные книги затронутых читателей (по отметкам до текущего запуска)"""
+    rows = set()
+    for name, model in LOAN_SOURCES:
+        rows.update(
+            model.objects.filter(counted[name], user_id__in=user_ids)
+            .order_by()
+            .values_list('user_id', 'book_id')
+            .distinct()
+        )
+    return _pairs(list(rows))
+
+
+def pair_increments(new_users, new_books, old_users, old_books):
+    """
+    Приращения матрицы совместных выдач от новых пар (читатель, книга).
+
+    Для каждого читателя новые книги образуют пары со старыми и друг с другом;
+    диагональ (книга с самой собой) считает число читателей книги.
+    Возвращает массивы book_a <= book_b и количество.
+    """
+    base = int(max(new_books.max(initial=0), old_books.max(initial=0))) + 1
+
+    order = np.argsort(new_users, kind='stable')
+    new_users, new_books = new_users[order], new_books[order]
+    order = np.argsort(old_users, kind='stable')
+    old_users, old_books = old_users[order], old_books[order]
+
+    keys = []
+    for user in np.unique(new_users):
+        lo, hi = np.searchsorted(new_users, [user, user + 1])
+        fresh = new_books[lo:hi]
+        lo, hi = np.searchsorted(old_users, [user, user + 1])
+        seen = old_books[lo:hi]
+
+        left, right = np.meshgrid(fresh, fresh, indexing='ij')
+        upper = left <= right
+        a = [left[upper]]
+        b = [right[upper]]
+        if seen.size:
+            left, right = np.meshgrid(fresh, seen, indexing='ij')
+            a.append(np.minimum(left, right).ravel())
+            b.append(np.maximum(left, right).ravel())
+        a, b = np.concatenate(a), np.concatenate(b)
+        keys.append(np.minimum(a, b) * base + np.maximum(a, b))
+
+    if not keys:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    unique_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+    return unique_keys // base, unique_keys % base, counts
+
+
+def _apply_increments(book_a, book_b, counts, batch_size=1000):
+    """Прибавляет приращения к таблице совместных выдач через INSERT ... ON CONFLICT"""
+    table = connection.ops.quote_name(BookCooccurrence._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(counts), batch_size):
+            rows = list(zip(
+                book_a[start:start + batch_size].tolist(),
+                book_b[start:start + batch_size].tolist(),
+                counts[start:start + batch_size].tolist(),
+            ))
+            values = ', '.join(['(%s, %s, %s)'] * len(rows))
+            cursor.execute(
+                f'INSERT INTO {table} (book_a_id, book_b_id, count) VALUES {values} '
+                f'ON CONFLICT (book_a_id, book_b_id) DO UPDATE SET count = {table}.count + EXCLUDED.count',
+                [value for row in rows for value in row],
+            )
+
+
+def rebuild_similarities(book_ids, top_n=TOP_N, chunk_size=500):
+    """Пересчитывает top-N похожих книг (косинусная мера) для указанных книг"""
+    book_ids = np.unique(np.asarray(book_ids, dtype=np.int64))
+    for start in range(0, len(book_ids), chunk_size):
+        chunk = book_ids[start:start + chunk_size].tolist()
+        rows = list(
+            BookCooccurrence.objects.filter(Q(book_a__in=chunk) | Q(book_b__in=chunk))
+            .exclude(book_a=F('book_b'))
+            .values_list('book_a', 'book_b', 'count')
+        )
+        similarities = []
+        if rows:
+            pairs = np.asarray(rows, dtype=np.int64)
+            src = np.concatenate([pairs[:, 0], pairs[:, 1]])
+            dst = np.concatenate([pairs[:, 1], pairs[:, 0]])
+            together = np.concatenate([pairs[:, 2], pairs[:, 2]]).astype(np.float64)
+            mask = np.isin(src, chunk)
+            src, dst, together = src[mask], dst[mask], together[mask]
+
+            # Число читателей каждой книги хранится на диагонали
+            ids = np.unique(np.concatenate([src, dst]))
+            readers = dict(
+                BookCooccurrence.objects.filter(book_a__in=ids.tolist(), book_b=F('book_a'))
+                .values_list('book_a', 'count')
+            )
+            reader_counts = np.array([readers.get(pk, 1) for pk in ids.tolist()], dtype=np.float64)
+            scores = together / np.sqrt(
+                reader_counts[np.searchsorted(ids, src)] * reader_counts[np.searchsorted(ids, dst)]
+            )
+
+            order = np.lexsort((-scores, src))
+            src, dst, scores = src[order], dst[order], scores[order]
+            group_start = np.searchsorted(src, src, side='left')
+            keep = (np.arange(len(src)) - group_start) < top_n
+
+            similarities = [
+                BookSimilarity(book_id=a, similar_book_id=b, score=score)
+                for a, b, score in zip(src[keep].tolist(), dst[keep].tolist(), scores[keep].tolist())
+            ]
+
+        with transaction.atomic():
+            BookSimilarity.objects.filter(book_id__in=chunk).delete()
+            BookSimilarity.objects.bulk_create(similarities, batch_size=1000)
+
+
+def refresh_recommendations(top_n=TOP_N, full=False):
+    """
+    Инкрементально обновляет рекомендации по выдачам, появившимся с прошлого запуска.
+
+    Приращения, пересчет похожих книг и сдвиг отметок выполняются в одной
+    транзакции: при сбое следующий запуск заново возьмет те же выдачи.
+    Возвращает (число новых пар читатель-книга, число пересчитанных книг).
+    """
+    with transaction.atomic():
+        marks = {name: HighWaterMark.lock(name) for name, _ in LOAN_SOURCES}
+        if full:
+            BookSimilarity.objects.all().delete()
+            BookCooccurrence.objects.all().delete()
+            for mark in marks.values():
+                mark.reset()
+
+        (users, books), counted = _collect_new_loans(marks)
+        new_pairs = affected = 0
+        if users.size:
+            old_users, old_books = _collect_history(np.unique(users).tolist(), counted)
+            base = int(max(books.max(), old_books.max(initial=0))) + 1
+
+            # Повторные выдачи уже учтенных книг не меняют матрицу
+            new_keys = np.unique(_encode(users, books, base))
+            if old_users.size:
+                new_keys = new_keys[~np.isin(new_keys, _encode(old_users, old_books, base))]
+
+            new_users, new_books = new_keys // base, new_keys % base
+            book_a, book_b, counts = pair_increments(new_users, new_books, old_users, old_books)
+            _apply_increments(book_a, book_b, counts)
+
+            affected_books = np.unique(np.concatenate([book_a, book_b]))
+            rebuild_similarities(affected_books, top_n=top_n)
+            new_pairs, affected = len(new_keys), len(affected_books)
+
+        for mark in marks.values():
+            mark.save(update_fields=['last_id', 'last_timestamp', 'pending', 'updated_at'])
+    return new_pairs, affected
+
+
+def recommend_for_user(user, limit):
+    """Доступные книги, похожие на прочитанные пользователем, одним запросом к предрассчитанной таблице"""
+    borrowed = Borrowing.objects.filter(user=user).values('book_id')
+    recorded = BorrowRecord.objects.filter(user=user).values('book_id')
+
+    return list(
+        Book.objects.filter(available_copies__gt=0)
+        .filter(Q(similar_to__book_id__in=borrowed) | Q(similar_to__book_id__in=recorded))
+        .exclude(pk__in=borrowed)
+        .exclude(pk__in=recorded)
+        .annotate(score=Sum('similar_to__score'))
+        .select_related('author', 'genre')
+        .order_by('-score', 'pk')[:limit]
+    )
@@ -0,0 +1,43 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery
+from django.db.models.functions import Cast
+
+# Конфигурация полнотекстового поиска PostgreSQL (стемминг для русского языка)
+SEARCH_CONFIG = 'russian'
+
+# Поля книги, изменение которых требует пересчета поискового документа
+SEARCH_SOURCE_FIELDS = {'title', 'description', 'author', 'author_id', 'genre', 'genre_id'}
+
+
+def book_search_vector():
+    """Выражение поискового документа книги: название, автор, жанр и описание с весами"""
+    from .models import Author, Genre
+
+    # Подзапросы вместо JOIN, чтобы выражение можно было использовать в UPDATE
+    author_name = Subquery(Author.objects.filter(pk=OuterRef('author_id')).values('name')[:1])
+    genre_name = Subquery(Genre.objects.filter(pk=OuterRef('genre_id')).values('name')[:1])
+
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(author_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector(genre_name, weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Пересчитывает поисковые документы для книг из queryset одним UPDATE"""
+    return queryset.update(search_vector=book_search_vector())
+
+
+def search_books(queryset, query):
+    """Полнотекстовый поиск с ранжированием по релевантности и нечетким совпадением по названию"""
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+
+    # ts_rank возвращает float4: после JSON курсора значение уже не равно сохраненному,
+    # поэтому ранг округляется до numeric - точного ключа для курсорной пагинации
+    return queryset.annotate(
+        rank=Cast(SearchRank(F('search_vector'), search_query), DecimalField(max_digits=12, decimal_places=6)),
+    ).filter(
+        Q(search_vector=search_query) | Q(title__trigram_similar=query)
+    ).order_by('-rank', 'title', 'id')
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Author, Book, Genre
+from .search import SEARCH_SOURCE_FIELDS, update_search_vectors
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_search_vector(sender, instance, created, update_fields=None, **kwargs):
+    """Обновляет поисковый документ книги после изменения ее текстовых полей"""
+    if update_fields is not None and not SEARCH_SOURCE_FIELDS.intersection(update_fields):
+        return
+    update_search_vectors(Book.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Author)
+def refresh_author_books_search_vectors(sender, instance, created, **kwargs):
+    """При переименовании автора пересчитывает документы всех его книг"""
+    if not created:
+        update_search_vectors(Book.objects.filter(author_id=instance.pk))
+
+
+@receiver(post_save, sender=Genre)
+def refresh_genre_books_search_vectors(sender, instance, created, **kwargs):
+    """При переименовании жанра пересчитывает документы всех книг жанра"""
+    if not created:
+        update_search_vectors(Book.objects.filter(genre_id=instance.pk))
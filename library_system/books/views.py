@@ -1,41 +1,24 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.core.paginator import Paginator
 from django.utils import timezone
-from .models import Book, Genre
+from .models import Book, Genre, BookRequest, BorrowRecord
 from .forms import BookForm, BookSearchForm
 from users.decorators import librarian_required
+from core.pagination import CursorPaginator
+from borrowings.services import BookUnavailable, checkout
 from datetime import timedelta
 
 
 def book_list(request):
     """Список всех книг с фильтрацией"""
     form = BookSearchForm(request.GET or None)
-    books = Book.objects.all().select_related('author', 'genre')
-    
-    if form.is_valid():
-        query = form.cleaned_data.get('query')
-        genre = form.cleaned_data.get('genre')
-        available_only = form.cleaned_data.get('available_only')
-        
-        if query:
-            books = books.filter(
-                Q(title__icontains=query) |
-                Q(author__name__icontains=query) |
-                Q(genre__name__icontains=query)
-            )
-        
-        if genre:
-            books = books.filter(genre=genre)
-            
-        if available_only:
-            books = books.filter(available_copies__gt=0)
+    books = form.filter_queryset(
+        Book.objects.all().select_related('author', 'genre').defer('search_vector')
+    )
     
-    paginator = Paginator(books, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(books, form.get_ordering(), 12)
+    page_obj = paginator.get_page(request.GET.get('cursor'), params=request.GET)
     
     context = {
         'page_obj': page_obj,
@@ -50,7 +33,6 @@ def book_detail(request, pk):
     """Детальная информация о книге"""
     book = get_object_or_404(Book, pk=pk)
 
-    from .models import BorrowRecord
     user_has_book = BorrowRecord.objects.filter(
         user=request.user,
         book=book,
@@ -175,9 +157,6 @@ def borrow_self(request, book_id):
         messages.warning(request, f'У вас уже есть книга "{book.title}".')
         return redirect('books:book_list')
 
-    from django.utils import timezone
-    from datetime import timedelta
-
     borrow_record = BorrowRecord(
         user=request.user,
         book=book,
@@ -185,10 +164,11 @@ def borrow_self(request, book_id):
         due_date=timezone.now() + timedelta(days=14),
         returned=False
     )
-    borrow_record.save()
-
-    book.available_copies -= 1
-    book.save()
+    try:
+        checkout(borrow_record)
+    except BookUnavailable:
+        messages.error(request, 'Эта книга сейчас недоступна.')
+        return redirect('books:book_list')
 
     # Помечаем заявку как выполненную (можно добавить новый статус, но пока оставим approved)
     approved_request.notes = f"Книга выдана {timezone.now().strftime('%d.%m.%Y %H:%M')}"
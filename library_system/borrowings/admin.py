@@ -1,8 +1,9 @@
 from django.contrib import admin
+from core.counts import EstimatedCountAdminMixin
 from .models import Borrowing
 
 @admin.register(Borrowing)
-class BorrowingAdmin(admin.ModelAdmin):
+class BorrowingAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ('book', 'user', 'borrowed_date', 'due_date', 'status')
     list_filter = ('status', 'borrowed_date')
     search_fields = ('book__title', 'user__username')
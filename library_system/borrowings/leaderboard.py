@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Borrowing, ReaderActivity, ReaderRoleTotal
+
+ROLE_MEASURES = ['users', 'readers', 'loans', 'active_loans', 'overdue_loans']
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def record_loan_change(user_id, total=0, active=0, overdue=0):
+    """
+    Прибавляет приращения к счетчикам читателя и его роли одним запросом.
+
+    Строка читателя создается при первой выдаче с ролью пользователя; если после
+    обновления total_loans равно приращению, читатель новый и попадает в итог роли.
+    """
+    readers = _table(ReaderActivity)
+    roles = _table(ReaderRoleTotal)
+    users = _table(get_user_model())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH reader AS ('
+            f'INSERT INTO {readers} (user_id, role, total_loans, active_loans, overdue_loans) '
+            f'SELECT id, role, %s, %s, %s FROM {users} WHERE id = %s '
+            f'ON CONFLICT (user_id) DO UPDATE SET '
+            f'total_loans = {readers}.total_loans + EXCLUDED.total_loans, '
+            f'active_loans = {readers}.active_loans + EXCLUDED.active_loans, '
+            f'overdue_loans = {readers}.overdue_loans + EXCLUDED.overdue_loans '
+            f'RETURNING role, total_loans) '
+            f'INSERT INTO {roles} (role, users, readers, loans, active_loans, overdue_loans) '
+            f'SELECT role, 0, CASE WHEN %s > 0 AND total_loans = %s THEN 1 ELSE 0 END, %s, %s, %s FROM reader '
+            f'ON CONFLICT (role) DO UPDATE SET '
+            f'readers = {roles}.readers + EXCLUDED.readers, '
+            f'loans = {roles}.loans + EXCLUDED.loans, '
+            f'active_loans = {roles}.active_loans + EXCLUDED.active_loans, '
+            f'overdue_loans = {roles}.overdue_loans + EXCLUDED.overdue_loans',
+            [total, active, overdue, user_id, total, total, total, active, overdue],
+        )
+
+
+def add_role_totals(role, **deltas):
+    """Прибавляет приращения к итогам роли, создавая строку при необходимости"""
+    values = [deltas.get(name, 0) for name in ROLE_MEASURES]
+    roles = _table(ReaderRoleTotal)
+    updates = ', '.join(f'{name} = {roles}.{name} + EXCLUDED.{name}' for name in ROLE_MEASURES)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {roles} (role, {", ".join(ROLE_MEASURES)}) VALUES (%s, %s, %s, %s, %s, %s) '
+            f'ON CONFLICT (role) DO UPDATE SET {updates}',
+            [role] + values,
+        )
+
+
+def _activity_totals(activity, sign):
+    if activity is None:
+        return {}
+    return {
+        'readers': sign,
+        'loans': sign * activity.total_loans,
+        'active_loans': sign * activity.active_loans,
+        'overdue_loans': sign * activity.overdue_loans,
+    }
+
+
+def move_user_role(user_id, old_role, new_role):
+    """Переносит пользователя и его выдачи из итогов старой роли в итоги новой"""
+    with transaction.atomic():
+        activity = ReaderActivity.objects.select_for_update().filter(user_id=user_id).first()
+        if activity is not None:
+            activity.role = new_role
+            activity.save(update_fields=['role'])
+        add_role_totals(old_role, users=-1, **_activity_totals(activity, -1))
+        add_role_totals(new_role, users=1, **_activity_totals(activity, 1))
+
+
+def remove_user(user_id, role):
+    """Вычитает удаляемого пользователя и его выдачи из итогов роли"""
+    activity = ReaderActivity.objects.filter(user_id=user_id).first()
+    add_role_totals(role, users=-1, **_activity_totals(activity, -1))
+
+
+def rebuild_leaderboard():
+    """
+    Полностью пересчитывает счетчики читателей и итоги ролей из журнала выдач.
+
+    Обе таблицы итогов блокируются от записи до конца пересчета: выдача,
+    уже изменившая счетчики, успевает зафиксироваться и попадает в подсчет,
+    а остальные ждут и прибавляют свои изменения к новым итогам.
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for model in (ReaderActivity, ReaderRoleTotal):
+                cursor.execute(f'LOCK TABLE {_table(model)} IN SHARE ROW EXCLUSIVE MODE')
+        ReaderActivity.objects.all().delete()
+        ReaderRoleTotal.objects.all().delete()
+
+        ReaderActivity.objects.bulk_create(
+            (
+                ReaderActivity(
+                    user_id=row['user_id'],
+                    role=row['user__role'],
+                    total_loans=row['total'],
+                    active_loans=row['active'],
+                    overdue_loans=row['overdue'],
+                )
+                for row in Borrowing.objects.order_by().values('user_id', 'user__role').annotate(
+                    total=Count('id'),
+                    active=Count('id', filter=~Q(status='returned')),
+                    overdue=Count('id', filter=Q(status='overdue')),
+                ).iterator()
+            ),
+            batch_size=1000,
+        )
+
+        totals = {
+            row['role']: ReaderRoleTotal(role=row['role'], users=row['users'])
+            for row in User.objects.order_by().values('role').annotate(users=Count('id'))
+        }
+        for row in ReaderActivity.objects.order_by().values('role').annotate(
+            readers=Count('user_id'),
+            loans=Sum('total_loans'),
+            active=Sum('active_loans'),
+            overdue=Sum('overdue_loans'),
+        ):
+            total = totals.setdefault(row['role'], ReaderRoleTotal(role=row['role']))
+            total.readers = row['readers']
+            total.loans = row['loans']
+            total.active_loans = row['active']
+            total.overdue_loans = row['overdue']
+        ReaderRoleTotal.objects.bulk_create(totals.values())
+    return len(totals)
+
+
+def top_readers(limit):
+    """Читатели с наибольшим числом выдач по индексу reader_activity_top_idx"""
+    return list(
+        ReaderActivity.objects.filter(total_loans__gt=0)
+        .select_related('user')
+        .order_by('-total_loans', 'user')[:limit]
+    )
+
+
+def overdue_readers(limit):
+    """Читатели с просроченными выдачами по частичному индексу reader_activity_overdue_idx"""
+    return list(
+        ReaderActivity.objects.filter(overdue_loans__gt=0)
+        .select_related('user')
+        .order_by('-overdue_loans', 'user')[:limit]
+    )
+
+
+def role_totals():
+    return list(ReaderRoleTotal.objects.order_by('-readers', 'role'))
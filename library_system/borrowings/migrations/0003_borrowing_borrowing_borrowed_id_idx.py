@@ -0,0 +1,20 @@
+
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_book_title_id_idx'),
+        ('borrowings', '0002_alter_borrowing_due_date_alter_borrowing_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['-borrowed_date', '-id'], name='borrowing_borrowed_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0003_borrowing_borrowing_borrowed_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['due_date'], name='borrowing_active_due_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0004_borrowing_active_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['returned_date'], name='borrowing_returned_date_idx'),
+        ),
+    ]
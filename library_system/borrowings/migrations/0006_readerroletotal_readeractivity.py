@@ -0,0 +1,87 @@
+
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_leaderboard(apps, schema_editor):
+    Borrowing = apps.get_model('borrowings', 'Borrowing')
+    ReaderActivity = apps.get_model('borrowings', 'ReaderActivity')
+    ReaderRoleTotal = apps.get_model('borrowings', 'ReaderRoleTotal')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    ReaderActivity.objects.bulk_create([
+        ReaderActivity(
+            user_id=row['user_id'],
+            role=row['user__role'],
+            total_loans=row['total'],
+            active_loans=row['active'],
+            overdue_loans=row['overdue'],
+        )
+        for row in Borrowing.objects.order_by().values('user_id', 'user__role').annotate(
+            total=Count('id'),
+            active=Count('id', filter=~Q(status='returned')),
+            overdue=Count('id', filter=Q(status='overdue')),
+        )
+    ], batch_size=1000)
+
+    totals = {
+        row['role']: ReaderRoleTotal(role=row['role'], users=row['users'])
+        for row in User.objects.order_by().values('role').annotate(users=Count('id'))
+    }
+    for row in ReaderActivity.objects.order_by().values('role').annotate(
+        readers=Count('user_id'),
+        loans=Sum('total_loans'),
+        active=Sum('active_loans'),
+        overdue=Sum('overdue_loans'),
+    ):
+        total = totals.setdefault(row['role'], ReaderRoleTotal(role=row['role']))
+        total.readers = row['readers']
+        total.loans = row['loans']
+        total.active_loans = row['active']
+        total.overdue_loans = row['overdue']
+    ReaderRoleTotal.objects.bulk_create(totals.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0005_borrowing_borrowing_returned_date_idx'),
+        ('users', '0002_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReaderRoleTotal',
+            fields=[
+                ('role', models.CharField(choices=[('reader', 'Читатель'), ('librarian', 'Библиотекарь'), ('admin', 'Администратор')], max_length=10, primary_key=True, serialize=False, verbose_name='Роль')),
+                ('users', models.IntegerField(default=0, verbose_name='Пользователей')),
+                ('readers', models.IntegerField(default=0, verbose_name='Читателей с выдачами')),
+                ('loans', models.IntegerField(default=0, verbose_name='Всего выдач')),
+                ('active_loans', models.IntegerField(default=0, verbose_name='Активные выдачи')),
+                ('overdue_loans', models.IntegerField(default=0, verbose_name='Просроченные выдачи')),
+            ],
+            options={
+                'verbose_name': 'Итог по роли',
+                'verbose_name_plural': 'Итоги по ролям',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReaderActivity',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reader_activity', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('role', models.CharField(choices=[('reader', 'Читатель'), ('librarian', 'Библиотекарь'), ('admin', 'Администратор')], max_length=10, verbose_name='Роль')),
+                ('total_loans', models.IntegerField(default=0, verbose_name='Всего выдач')),
+                ('active_loans', models.IntegerField(default=0, verbose_name='Активные выдачи')),
+                ('overdue_loans', models.IntegerField(default=0, verbose_name='Просроченные выдачи')),
+            ],
+            options={
+                'verbose_name': 'Активность читателя',
+                'verbose_name_plural': 'Активность читателей',
+                'indexes': [models.Index(fields=['-total_loans', 'user'], name='reader_activity_top_idx'), models.Index(condition=models.Q(('overdue_loans__gt', 0)), fields=['-overdue_loans', 'user'], name='reader_activity_overdue_idx')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
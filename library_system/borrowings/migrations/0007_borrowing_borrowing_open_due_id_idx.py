@@ -0,0 +1,20 @@
+
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_bookcooccurrence_booksimilarity'),
+        ('borrowings', '0006_readerroletotal_readeractivity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('status__in', ['active', 'overdue'])), fields=['due_date', 'id'], name='borrowing_open_due_id_idx'),
+        ),
+    ]
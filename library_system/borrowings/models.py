@@ -27,10 +27,9 @@ class Borrowing(models.Model):
         if not self.pk:
             self.due_date = timezone.now() + timedelta(days=30)
         
+        # Счетчик available_copies меняется только через borrowings.services
         if self.returned_date and self.status != 'returned':
             self.status = 'returned'
-            self.book.available_copies += 1
-            self.book.save()
         
         if not self.returned_date and timezone.now() > self.due_date:
             self.status = 'overdue'
@@ -55,4 +54,60 @@ class Borrowing(models.Model):
     class Meta:
         verbose_name = 'Выдача книги'
         verbose_name_plural = 'Выдачи книг'
-        ordering = ['-borrowed_date']
\ No newline at end of file
+        ordering = ['-borrowed_date']
+        indexes = [
+            models.Index(fields=['-borrowed_date', '-id'], name='borrowing_borrowed_id_idx'),
+            models.Index(fields=['due_date'], name='borrowing_active_due_idx', condition=models.Q(status='active')),
+            models.Index(fields=['returned_date'], name='borrowing_returned_date_idx'),
+            models.Index(
+                fields=['due_date', 'id'],
+                name='borrowing_open_due_id_idx',
+                condition=models.Q(status__in=['active', 'overdue']),
+            ),
+        ]
+
+class ReaderActivity(models.Model):
+    """Счетчики выдач читателя, поддерживаемые при выдаче, возврате и просрочке"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reader_activity',
+        verbose_name='Пользователь',
+    )
+    role = models.CharField(max_length=10, choices=User.ROLE_CHOICES, verbose_name='Роль')
+    total_loans = models.IntegerField(default=0, verbose_name='Всего выдач')
+    active_loans = models.IntegerField(default=0, verbose_name='Активные выдачи')
+    overdue_loans = models.IntegerField(default=0, verbose_name='Просроченные выдачи')
+
+    class Meta:
+        verbose_name = 'Активность читателя'
+        verbose_name_plural = 'Активность читателей'
+        indexes = [
+            models.Index(fields=['-total_loans', 'user'], name='reader_activity_top_idx'),
+            models.Index(
+                fields=['-overdue_loans', 'user'],
+                name='reader_activity_overdue_idx',
+                condition=models.Q(overdue_loans__gt=0),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total_loans}"
+
+
+class ReaderRoleTotal(models.Model):
+    """Итоги по роли пользователей: число пользователей, читателей и выдач"""
+    role = models.CharField(max_length=10, choices=User.ROLE_CHOICES, primary_key=True, verbose_name='Роль')
+    users = models.IntegerField(default=0, verbose_name='Пользователей')
+    readers = models.IntegerField(default=0, verbose_name='Читателей с выдачами')
+    loans = models.IntegerField(default=0, verbose_name='Всего выдач')
+    active_loans = models.IntegerField(default=0, verbose_name='Активные выдачи')
+    overdue_loans = models.IntegerField(default=0, verbose_name='Просроченные выдачи')
+
+    class Meta:
+        verbose_name = 'Итог по роли'
+        verbose_name_plural = 'Итоги по ролям'
+
+    def __str__(self):
+        return f"{self.role}: {self.readers}"
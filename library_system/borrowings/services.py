@@ -0,0 +1,101 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from books.models import Book
+from core import audit
+from .leaderboard import record_loan_change
+from .models import Borrowing, ReaderActivity, ReaderRoleTotal
+
+
+class BookUnavailable(Exception):
+    """Нет свободных экземпляров книги для выдачи"""
+
+
+def reserve_copy(book_id):
+    """Списывает один экземпляр условным UPDATE; возвращает False, если свободных копий нет"""
+    return Book.objects.filter(
+        pk=book_id,
+        available_copies__gt=0,
+    ).update(available_copies=F('available_copies') - 1) == 1
+
+
+def release_copy(book_id):
+    """Возвращает один экземпляр в фонд, не превышая общее количество копий"""
+    return Book.objects.filter(
+        pk=book_id,
+        available_copies__lt=F('total_copies'),
+    ).update(available_copies=F('available_copies') + 1) == 1
+
+
+def checkout(loan):
+    """
+    Выдает книгу: списание экземпляра и запись в журнал выдач в одной транзакции.
+
+    loan - несохраненная запись Borrowing или BorrowRecord. Если свободных
+    экземпляров нет, запись не создается и выбрасывается BookUnavailable.
+    """
+    with transaction.atomic():
+        if not reserve_copy(loan.book_id):
+            raise BookUnavailable(f'Книга #{loan.book_id} сейчас недоступна')
+        loan.save()
+        if isinstance(loan, Borrowing):
+            record_loan_change(loan.user_id, total=1, active=1, overdue=int(loan.status == 'overdue'))
+        audit.record('borrow', audit.current_actor() or loan.user_id, f'Книга #{loan.book_id}, читатель #{loan.user_id}')
+    return loan
+
+
+def return_borrowing(borrowing):
+    """Закрывает выдачу и возвращает экземпляр; повторный возврат ничего не меняет"""
+    returned_date = timezone.now()
+    with transaction.atomic():
+        # Два условных UPDATE вместо чтения статуса: известно, была ли выдача просрочена
+        was_overdue = Borrowing.objects.filter(
+            pk=borrowing.pk,
+            status='overdue',
+        ).update(status='returned', returned_date=returned_date)
+        closed = was_overdue or Borrowing.objects.filter(
+            pk=borrowing.pk,
+        ).exclude(status='returned').update(status='returned', returned_date=returned_date)
+        if not closed:
+            return False
+        release_copy(borrowing.book_id)
+        record_loan_change(borrowing.user_id, active=-1, overdue=-was_overdue)
+        audit.record(
+            'return',
+            audit.current_actor() or borrowing.user_id,
+            f'Книга #{borrowing.book_id}, читатель #{borrowing.user_id}' + (' (с просрочкой)' if was_overdue else ''),
+        )
+
+    borrowing.status = 'returned'
+    borrowing.returned_date = returned_date
+    return True
+
+
+def mark_overdue_borrowings(now=None):
+    """
+    Переводит все активные выдачи с истекшим сроком в статус overdue.
+
+    Один запрос: UPDATE с RETURNING в CTE сразу прибавляет просрочки к счетчикам
+    читателей и итогам их ролей.
+    """
+    borrowings = connection.ops.quote_name(Borrowing._meta.db_table)
+    readers = connection.ops.quote_name(ReaderActivity._meta.db_table)
+    roles = connection.ops.quote_name(ReaderRoleTotal._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH marked AS ("
+            f"UPDATE {borrowings} SET status = 'overdue' "
+            f"WHERE status = 'active' AND due_date < %s RETURNING user_id), "
+            f"per_user AS (SELECT user_id, count(*) AS n FROM marked GROUP BY user_id), "
+            f"reader AS ("
+            f"UPDATE {readers} SET overdue_loans = {readers}.overdue_loans + per_user.n "
+            f"FROM per_user WHERE {readers}.user_id = per_user.user_id RETURNING {readers}.role, per_user.n), "
+            f"per_role AS ("
+            f"UPDATE {roles} SET overdue_loans = {roles}.overdue_loans + totals.n "
+            f"FROM (SELECT role, sum(n) AS n FROM reader GROUP BY role) AS totals "
+            f"WHERE {roles}.role = totals.role) "
+            f"SELECT count(*) FROM marked",
+            [now or timezone.now()],
+        )
+        return cursor.fetchone()[0]
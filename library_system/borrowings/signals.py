@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .leaderboard import add_role_totals, move_user_role, remove_user
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_role(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнюю роль, если сохранение может ее изменить"""
+    if instance.pk and (update_fields is None or 'role' in update_fields):
+        instance._previous_role = User.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def update_role_totals(sender, instance, created, **kwargs):
+    """Учитывает нового пользователя или смену роли в итогах по ролям"""
+    if created:
+        add_role_totals(instance.role, users=1)
+        return
+    previous_role = getattr(instance, '_previous_role', None)
+    if previous_role and previous_role != instance.role:
+        move_user_role(instance.pk, previous_role, instance.role)
+    instance._previous_role = instance.role
+
+
+@receiver(pre_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    """Вычитает удаляемого пользователя из итогов его роли"""
+    remove_user(instance.pk, instance.role)
@@ -5,7 +5,9 @@ from django.utils import timezone
 from books.models import Book, BorrowRecord, BookRequest
 from .models import Borrowing
 from .forms import BorrowBookForm
+from .services import BookUnavailable, checkout, return_borrowing
 from users.decorators import librarian_required
+from core.pagination import CursorPaginator
 from datetime import timedelta
 
 @librarian_required
@@ -28,13 +30,13 @@ def borrow_form(request):
         form = BorrowBookForm(request.POST)
         if form.is_valid():
             borrowing = form.save(commit=False)
-            borrowing.borrow_date = timezone.now()
-            borrowing.save()
+            try:
+                checkout(borrowing)
+            except BookUnavailable:
+                messages.error(request, f'Книга "{borrowing.book.title}" сейчас недоступна.')
+                return redirect('borrowings:borrow_form')
             
             book = borrowing.book
-            book.available_copies -= 1
-            book.save()
-            
             messages.success(request, f'Книга "{book.title}" успешно выдана читателю {borrowing.user.get_full_name()}!')
             return redirect('borrowings:active_borrowings')
     else:
@@ -66,10 +68,14 @@ def active_borrowings(request):
     """Активные заимствования (ТОЛЬКО для библиотекарей)"""
     active_borrowings = Borrowing.objects.filter(
         status__in=['active', 'overdue']
-    ).select_related('book', 'book__author', 'user').order_by('-borrowed_date')
+    ).select_related('book', 'book__author', 'user')
+
+    paginator = CursorPaginator(active_borrowings, ['-borrowed_date', '-id'], 50)
+    page_obj = paginator.get_page(request.GET.get('cursor'), params=request.GET)
 
     context = {
-        'active_borrowings': active_borrowings,
+        'active_borrowings': page_obj,
+        'page_obj': page_obj,
     }
     return render(request, 'borrowings/active_borrowings.html', context)
 
@@ -90,14 +96,11 @@ def return_book(request, borrowing_id):
         messages.error(request, 'У вас нет прав для возврата этой книги.')
         return redirect('borrowings:my_books')
 
-    borrowing.status = 'returned'
-    borrowing.returned_date = timezone.now()
-    borrowing.save()
+    if not return_borrowing(borrowing):
+        messages.warning(request, 'Эта книга уже была возвращена.')
+        return redirect('borrowings:my_books')
 
     book = borrowing.book
-    book.available_copies += 1
-    book.save()
-
     messages.success(request, f'Книга "{book.title}" успешно возвращена!')
 
     if is_librarian or is_admin:
@@ -1,14 +1,74 @@
+import os
+
+from asgiref.sync import sync_to_async
 from django.contrib import admin
-from django.urls import path
-from django.shortcuts import render
+from django.contrib.auth.views import redirect_to_login
+from django.urls import path, reverse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_protect
+from django.contrib import messages
+from django.shortcuts import get_object_or_404, redirect, render
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count, Q
-from django.core.paginator import Paginator
+from datetime import date, datetime, time, timedelta
+from functools import update_wrapper
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import ExtractDay
 from django.contrib.auth import get_user_model
 from borrowings.models import Borrowing
 from django.utils import timezone
-from .models import AuditLog
+from .models import AuditLog, MonthlyBorrowingStat, PopularityRanking, ReportJob
+from .pagination import CursorPaginator
+from .rankings import WINDOWS
+from .parallel import gather_queries
+from .report_cache import acached_report, cached_report, report_cache_stats
+from .reports import active_readers_queries, run_queries, statistics_queries, statistics_result
+from .exports import EXPORTS, FORMATS, stream_csv, stream_export
+from .jobs import REPORT_KINDS, enqueue_report
+from .audit import action_counts
+
+OVERDUE_EXPORT_COLUMNS = [
+    ('borrowing_id', 'id'),
+    ('username', 'user__username'),
+    ('last_name', 'user__last_name'),
+    ('first_name', 'user__first_name'),
+    ('book_title', 'book__title'),
+    ('genre', 'book__genre__name'),
+    ('borrowed_date', 'borrowed_date'),
+    ('due_date', 'due_date'),
+    ('overdue_days', 'overdue_days'),
+]
+
+
+def overdue_queryset(params, now):
+    """
+    Невозвращенные выдачи с истекшим сроком и числом дней просрочки, посчитанным в SQL.
+
+    Фильтры из params: reader (логин или фамилия), genre (id жанра),
+    min_days (не меньше стольких дней просрочки).
+    """
+    queryset = Borrowing.objects.filter(
+        status__in=['active', 'overdue'],
+        due_date__lt=now,
+    ).annotate(
+        overdue_days=ExtractDay(ExpressionWrapper(Value(now) - F('due_date'), output_field=DurationField()))
+    )
+    
+    reader = (params.get('reader') or '').strip()
+    if reader:
+        queryset = queryset.filter(Q(user__username__istartswith=reader) | Q(user__last_name__istartswith=reader))
+    
+    genre = params.get('genre')
+    if genre and genre.isdigit():
+        queryset = queryset.filter(book__genre_id=genre)
+    
+    min_days = params.get('min_days')
+    if min_days and min_days.isdigit():
+        # Условие на due_date, а не на вычисленное поле: работает индекс по сроку возврата
+        queryset = queryset.filter(due_date__lte=now - timedelta(days=int(min_days)))
+    
+    return queryset
+
 
 class LibraryAdminSite(admin.AdminSite):
     site_header = "Управление библиотекой"
@@ -19,21 +79,43 @@ class LibraryAdminSite(admin.AdminSite):
         urls = super().get_urls()
         custom_urls = [
             path('statistics/', self.admin_view(self.statistics_view), name='statistics'),
+            path('statistics/async/', self.async_admin_view(self.statistics_async_view), name='statistics-async'),
             path('overdue-list/', self.admin_view(self.overdue_list_view), name='overdue-list'),
             path('activity-monitor/', self.admin_view(self.activity_monitor_view), name='activity-monitor'),
             path('monthly-stats/', self.admin_view(self.monthly_statistics_view), name='monthly-stats'),
             path('popular-books/', self.admin_view(self.popular_books_view), name='popular-books'),
             path('active-readers/', self.admin_view(self.active_readers_view), name='active-readers'),
+            path(
+                'active-readers/async/',
+                self.async_admin_view(self.active_readers_async_view),
+                name='active-readers-async',
+            ),
             path('audit-log/', self.admin_view(self.audit_log_view), name='audit-log'),
+            path('audit-log/users/', self.admin_view(self.audit_log_users_view), name='audit-log-users'),
+            path('export/<str:name>/', self.admin_view(self.export_view), name='export'),
+            path('report-jobs/', self.admin_view(self.report_jobs_view), name='report-jobs'),
+            path('report-jobs/<int:job_id>/status/', self.admin_view(self.report_job_status_view), name='report-job-status'),
+            path(
+                'report-jobs/<int:job_id>/download/',
+                self.admin_view(self.report_job_download_view),
+                name='report-job-download',
+            ),
         ]
         return custom_urls + urls
     
-    def statistics_view(self, request):
-        from books.models import Book
-        from borrowings.models import Borrowing
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
+    def async_admin_view(self, view):
+        """Аналог admin_view для асинхронных представлений: проверка прав выполняется в потоке"""
+        async def inner(request, *args, **kwargs):
+            if not await sync_to_async(self.has_permission)(request):
+                return redirect_to_login(
+                    request.get_full_path(),
+                    reverse('admin:login', current_app=self.name),
+                )
+            return await view(request, *args, **kwargs)
         
+        return csrf_protect(never_cache(update_wrapper(inner, view)))
+    
+    def _statistics_period(self, request):
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
         
@@ -43,54 +125,72 @@ class LibraryAdminSite(admin.AdminSite):
         else:
             end_date = timezone.now().date()
             start_date = end_date - timedelta(days=30)
-        
-        books_stats = Book.objects.filter(
-            created_at__date__range=[start_date, end_date]
-        ).aggregate(
-            total=Count('id'),
-            available=Count('id', filter=Q(available_copies__gt=0)),
-            borrowed=Count('id', filter=Q(available_copies=0))
-        )
-        
-        borrowing_stats = Borrowing.objects.filter(
-            borrowed_date__range=[start_date, end_date]
-        ).aggregate(
-            total_borrowings=Count('id'),
-            returned=Count('id', filter=Q(status='returned')),
-            active=Count('id', filter=Q(status='borrowed'))
-        )
-        
-        total_stats = {
-            'total_books': Book.objects.count(),
-            'total_users': User.objects.count(),
-            'total_borrowings': Borrowing.objects.count(),
-        }
-        
-        context = {
+        return start_date, end_date
+    
+    def _statistics_context(self, start_date, end_date, stats, cache_status):
+        return {
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d'),
-            'books_stats': books_stats,
-            'borrowing_stats': borrowing_stats,
-            'total_stats': total_stats,
+            **stats,
+            'cache_status': cache_status,
+            'cache_stats': report_cache_stats('statistics'),
             'title': 'Статистика за период'
         }
+    
+    def statistics_view(self, request):
+        start_date, end_date = self._statistics_period(request)
+        
+        # Дневные итоги пополняет refresh_rollups по расписанию, страница их только читает
+        stats, cache_status = cached_report(
+            'statistics', {'start': start_date, 'end': end_date},
+            lambda: statistics_result(run_queries(statistics_queries(start_date, end_date))),
+        )
+        
+        context = self._statistics_context(start_date, end_date, stats, cache_status)
         return render(request, 'admin/statistics.html', context)
     
+    async def statistics_async_view(self, request):
+        """Статистика за период: независимые агрегаты выполняются параллельно"""
+        start_date, end_date = self._statistics_period(request)
+        
+        async def compute():
+            return statistics_result(await gather_queries(statistics_queries(start_date, end_date)))
+        
+        stats, cache_status = await acached_report('statistics', {'start': start_date, 'end': end_date}, compute)
+        
+        context = await sync_to_async(self._statistics_context)(start_date, end_date, stats, cache_status)
+        return await sync_to_async(render)(request, 'admin/statistics.html', context)
+    
     def overdue_list_view(self, request):
-        from borrowings.models import Borrowing
+        """Список задолжников с постраничным выводом и потоковой выгрузкой в CSV"""
+        from books.models import Genre
         
-        today = timezone.now().date()
-        overdue_borrowings = Borrowing.objects.filter(
-            due_date__lt=today,
-            status='borrowed'
-        ).select_related('book', 'user')
+        now = timezone.now()
+        overdue_borrowings = overdue_queryset(request.GET, now)
         
-        for borrowing in overdue_borrowings:
-            borrowing.overdue_days = (today - borrowing.due_date).days
+        if request.GET.get('format') == 'csv':
+            rows = overdue_borrowings.order_by('due_date', 'id').values_list(
+                *[field for _, field in OVERDUE_EXPORT_COLUMNS]
+            ).iterator(chunk_size=2000)
+            response = StreamingHttpResponse(
+                stream_csv([header for header, _ in OVERDUE_EXPORT_COLUMNS], rows),
+                content_type=FORMATS['csv'],
+            )
+            response['Content-Disposition'] = f'attachment; filename="overdue_{now.strftime("%Y%m%d_%H%M%S")}.csv"'
+            return response
+        
+        paginator = CursorPaginator(overdue_borrowings.select_related('book', 'user'), ['due_date', 'id'], 50)
+        page_obj = paginator.get_page(request.GET.get('cursor'), params=request.GET)
+        
+        export_params = request.GET.copy()
+        export_params.pop('cursor', None)
+        export_params['format'] = 'csv'
         
         context = {
-            'overdue_borrowings': overdue_borrowings,
-            'today': today,
+            'page_obj': page_obj,
+            'genres': Genre.objects.order_by('name'),
+            'export_querystring': export_params.urlencode(),
+            'today': now.date(),
             'title': 'Список задолжников'
         }
         return render(request, 'admin/overdue_list.html', context)
@@ -118,39 +218,47 @@ class LibraryAdminSite(admin.AdminSite):
     
     def monthly_statistics_view(self, request):
         """Статистика выдачи книг по месяцам"""
-        from borrowings.models import Borrowing
-        
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=365)
         
+        try:
+            if request.GET.get('start'):
+                start_date = timezone.datetime.strptime(request.GET['start'], '%Y-%m').date()
+            if request.GET.get('end'):
+                end_date = timezone.datetime.strptime(request.GET['end'], '%Y-%m').date()
+        except ValueError:
+            pass
+        
+        first_month = start_date.replace(day=1)
+        
+        # Итог пополняет refresh_rollups по расписанию, отчет его только читает
+        def compute():
+            return dict(
+                MonthlyBorrowingStat.objects.filter(
+                    month__gte=first_month,
+                    month__lte=end_date,
+                ).values_list('month', 'count')
+            )
+        
+        counts, cache_status = cached_report('monthly_statistics', {'start': first_month, 'end': end_date}, compute)
+        
         monthly_data = []
-        current_date = start_date
+        current_date = first_month
         while current_date <= end_date:
             year = current_date.year
             month = current_date.month
             
-            count = Borrowing.objects.filter(
-                borrowed_date__year=year,
-                borrowed_date__month=month
-            ).count()
-            
             monthly_data.append({
                 'period': f"{month:02d}/{year}",
-                'count': count,
+                'count': counts.get(current_date, 0),
                 'year': year,
                 'month': month
             })
             
             if month == 12:
-                year += 1
-                month = 1
+                current_date = current_date.replace(year=year + 1, month=1)
             else:
-                month += 1
-            
-            try:
-                current_date = current_date.replace(year=year, month=month, day=1)
-            except ValueError:
-                break
+                current_date = current_date.replace(month=month + 1)
         
         total_borrowings = sum(item['count'] for item in monthly_data)
         avg_per_month = total_borrowings / len(monthly_data) if monthly_data else 0
@@ -161,106 +269,203 @@ class LibraryAdminSite(admin.AdminSite):
             'avg_per_month': round(avg_per_month, 1),
             'start_date': start_date,
             'end_date': end_date,
+            'cache_status': cache_status,
+            'cache_stats': report_cache_stats('monthly_statistics'),
             'title': 'Статистика выдачи по месяцам'
         }
         return render(request, 'admin/monthly_stats.html', context)
     
     def popular_books_view(self, request):
         """Самые популярные книги"""
-        from books.models import Book
-        
-        popular_books = Book.objects.annotate(
-            borrow_count=Count('borrowing')
-        ).filter(borrow_count__gt=0).order_by('-borrow_count')[:20]
-        
-        genre_stats = Book.objects.values(
-            'genre__name'
-        ).annotate(
-            total_books=Count('id'),
-            total_borrowings=Count('borrowing')
-        ).filter(total_borrowings__gt=0).order_by('-total_borrowings')
-        
-        author_stats = Book.objects.values(
-            'author__name'
-        ).annotate(
-            total_books=Count('id'),
-            total_borrowings=Count('borrowing')
-        ).filter(total_borrowings__gt=0).order_by('-total_borrowings')[:10]
+        window = request.GET.get('window', 'all')
+        if window not in WINDOWS:
+            window = 'all'
+        
+        # Рейтинги пересчитывает refresh_rankings по расписанию
+        rows, cache_status = cached_report(
+            'popular_books', {'window': window},
+            lambda: list(PopularityRanking.objects.filter(window=window)),
+        )
+        computed_at = rows[0].computed_at if rows else None
         
         context = {
-            'popular_books': popular_books,
-            'genre_stats': genre_stats,
-            'author_stats': author_stats,
+            'popular_books': [row for row in rows if row.kind == 'book'],
+            'genre_stats': [row for row in rows if row.kind == 'genre'],
+            'author_stats': [row for row in rows if row.kind == 'author'],
+            'window': window,
+            'window_choices': PopularityRanking.WINDOW_CHOICES,
+            'computed_at': computed_at,
+            'cache_status': cache_status,
+            'cache_stats': report_cache_stats('popular_books'),
             'title': 'Популярные книги и авторы'
         }
         return render(request, 'admin/popular_books.html', context)
     
+    def _active_readers_context(self, readers, cache_status):
+        return {
+            **readers,
+            'cache_status': cache_status,
+            'cache_stats': report_cache_stats('active_readers'),
+            'title': 'Активные читатели'
+        }
+    
     def active_readers_view(self, request):
         """Активные читатели"""
-        User = get_user_model()
-        
-        active_readers = User.objects.annotate(
-            borrow_count=Count('borrowing'),
-            active_borrowings=Count('borrowing', filter=Q(borrowing__status='borrowed'))
-        ).filter(borrow_count__gt=0).order_by('-borrow_count')[:20]
-        
-        role_stats = User.objects.values(
-            'role'
-        ).annotate(
-            total_users=Count('id'),
-            active_readers=Count('id', filter=Q(borrowing__isnull=False)),
-            total_borrowings=Count('borrowing')
-        ).order_by('-active_readers')
-        
-        readers_with_overdue = User.objects.filter(
-            borrowing__status='borrowed',
-            borrowing__due_date__lt=timezone.now().date()
-        ).annotate(
-            overdue_count=Count('borrowing', filter=Q(borrowing__due_date__lt=timezone.now().date()))
-        ).distinct()[:10]
+        readers, cache_status = cached_report(
+            'active_readers', {}, lambda: run_queries(active_readers_queries())
+        )
         
-        context = {
-            'active_readers': active_readers,
-            'role_stats': role_stats,
-            'readers_with_overdue': readers_with_overdue,
-            'title': 'Активные читатели'
-        }
+        context = self._active_readers_context(readers, cache_status)
         return render(request, 'admin/active_readers.html', context)
     
+    async def active_readers_async_view(self, request):
+        """Активные читатели: топ, просрочки и итоги по ролям читаются параллельно"""
+        async def compute():
+            return await gather_queries(active_readers_queries())
+        
+        readers, cache_status = await acached_report('active_readers', {}, compute)
+        
+        context = await sync_to_async(self._active_readers_context)(readers, cache_status)
+        return await sync_to_async(render)(request, 'admin/active_readers.html', context)
+    
+    def _audit_period(self, request):
+        """Период журнала аудита; по умолчанию последние 30 дней"""
+        end_date = timezone.localdate()
+        try:
+            end_date = date.fromisoformat(request.GET.get('date_to', ''))
+        except ValueError:
+            pass
+        try:
+            start_date = date.fromisoformat(request.GET.get('date_from', ''))
+        except ValueError:
+            start_date = end_date - timedelta(days=30)
+        return start_date, end_date
+    
     def audit_log_view(self, request):
-        """Журнал аудита действий пользователей"""
+        """
+        Журнал аудита действий пользователей.
+        
+        Запросы не зависят от размера журнала: страница выбирается по индексу
+        (timestamp, id) внутри периода, счетчики действий берутся из дневных
+        итогов AuditActionCount, пользователь выбирается поиском audit-log/users/.
+        """
         action_filter = request.GET.get('action')
-        user_filter = request.GET.get('user')
+        user_filter = request.GET.get('user', '')
+        user_id = int(user_filter) if user_filter.isdigit() else None
+        start_date, end_date = self._audit_period(request)
         
-        audit_logs = AuditLog.objects.all().select_related('user')
+        # Границы по timestamp отсекают месячные секции таблицы вне периода
+        period_logs = AuditLog.objects.filter(
+            timestamp__gte=timezone.make_aware(datetime.combine(start_date, time.min)),
+            timestamp__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+        )
+        if user_id:
+            period_logs = period_logs.filter(user_id=user_id)
+        audit_logs = period_logs.select_related('user')
         
         if action_filter:
             audit_logs = audit_logs.filter(action=action_filter)
         
-        if user_filter:
-            audit_logs = audit_logs.filter(user_id=user_filter)
-        
-        paginator = Paginator(audit_logs, 50)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        paginator = CursorPaginator(audit_logs, ['-timestamp', '-id'], 50)
+        page_obj = paginator.get_page(request.GET.get('cursor'), params=request.GET)
         
-        action_stats = AuditLog.objects.values(
-            'action'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        users = User.objects.all()
+        if user_id:
+            # Записи одного пользователя за период считаются по индексу user_id
+            labels = dict(AuditLog.ACTION_CHOICES)
+            action_stats = [
+                (row['action'], labels.get(row['action'], row['action']), row['count'])
+                for row in period_logs.values('action').annotate(count=Count('id')).order_by('-count', 'action')
+            ]
+            selected_user = get_user_model().objects.filter(pk=user_id).values_list('username', flat=True).first()
+        else:
+            action_stats = action_counts(start_date, end_date)
+            selected_user = None
         
         context = {
             'page_obj': page_obj,
+            'total_count': sum(count for _, _, count in action_stats),
             'action_stats': action_stats,
-            'users': users,
+            'user_id': user_id or '',
+            'selected_user': selected_user or '',
             'action_choices': AuditLog.ACTION_CHOICES,
+            'date_from': start_date.isoformat(),
+            'date_to': end_date.isoformat(),
             'title': 'Журнал аудита'
         }
         return render(request, 'admin/audit_log.html', context)
+    
+    def audit_log_users_view(self, request):
+        """Поиск пользователя для фильтра журнала по началу логина или фамилии (JSON, до 10 записей)"""
+        query = request.GET.get('q', '').strip()
+        users = []
+        if query:
+            users = get_user_model().objects.filter(
+                Q(username__istartswith=query) | Q(last_name__istartswith=query)
+            ).order_by('username').values('id', 'username', 'first_name', 'last_name')[:10]
+        return JsonResponse({
+            'results': [
+                {
+                    'id': user['id'],
+                    'username': user['username'],
+                    'name': f"{user['last_name']} {user['first_name']}".strip(),
+                }
+                for user in users
+            ]
+        })
+
+    def export_view(self, request, name):
+        """Потоковая выгрузка каталога, журналов выдач и аудита в CSV или JSONL"""
+        file_format = request.GET.get('format', 'csv')
+        if name not in EXPORTS or file_format not in FORMATS:
+            raise Http404('Неизвестная выгрузка')
+
+        timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+        response = StreamingHttpResponse(stream_export(name, file_format), content_type=FORMATS[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{name}_{timestamp}.{file_format}"'
+        return response
+
+    def report_jobs_view(self, request):
+        """Очередь фоновых отчетов: постановка задания и список последних заданий"""
+        if request.method == 'POST':
+            kind = request.POST.get('kind')
+            if kind not in REPORT_KINDS:
+                raise Http404('Неизвестный отчет')
+            params = {
+                key: value for key, value in request.POST.items()
+                if key in ('start_date', 'end_date', 'window', 'name') and value
+            }
+            job = enqueue_report(kind, params, request.user)
+            messages.success(request, f'Отчет поставлен в очередь (задание #{job.pk})')
+            return redirect(request.path)
+        
+        jobs = list(ReportJob.objects.select_related('created_by')[:50])
+        for job in jobs:
+            job.kind_title = REPORT_KINDS.get(job.kind, (job.kind,))[0]
+        
+        context = {
+            'jobs': jobs,
+            'has_active': any(job.status in ('pending', 'running') for job in jobs),
+            'exports': list(EXPORTS),
+            'title': 'Фоновые отчеты'
+        }
+        return render(request, 'admin/report_jobs.html', context)
+    
+    def report_job_status_view(self, request, job_id):
+        """Состояние задания для опроса со страницы"""
+        job = get_object_or_404(ReportJob, pk=job_id)
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'progress': job.progress,
+            'rows': job.rows,
+            'ready': bool(job.result),
+        })
+    
+    def report_job_download_view(self, request, job_id):
+        """Скачивание готового результата из закрытого хранилища"""
+        job = get_object_or_404(ReportJob, pk=job_id, status='done')
+        if not job.result:
+            raise Http404('Файл отчета не найден')
+        return FileResponse(job.result.open('rb'), as_attachment=True, filename=os.path.basename(job.result.name))
 
 library_admin = LibraryAdminSite(name='library_admin')
\ No newline at end of file
@@ -0,0 +1,76 @@
+from datetime import timezone
+
+import numpy as np
+
+from .snapshot import STATUS_CODES
+
+SECONDS_PER_DAY = 86400
+PERCENTILES = (50, 75, 90, 95, 99)
+
+
+def loan_duration_distribution(snapshot, bins=(0, 7, 14, 21, 30, 60, 90, 180, 365)):
+    """
+    Распределение длительности завершенных выдач в днях.
+
+    Возвращает словарь с числом выдач, средним, перцентилями и гистограммой
+    по границам bins; последний интервал открыт справа.
+    """
+    borrowed = snapshot.borrowed
+    returned = snapshot.returned
+    done = ~np.isnat(returned) & ~np.isnat(borrowed)
+    days = (returned[done] - borrowed[done]).astype(np.int64) / SECONDS_PER_DAY
+
+    edges = np.append(np.asarray(bins, dtype=np.float64), np.inf)
+    counts, _ = np.histogram(days, bins=edges)
+    return {
+        'loans': int(days.size),
+        'mean': float(days.mean()) if days.size else 0.0,
+        'percentiles': dict(zip(PERCENTILES, np.percentile(days, PERCENTILES).tolist())) if days.size else {},
+        'histogram': list(zip(edges[:-1].tolist(), edges[1:].tolist(), counts.tolist())),
+    }
+
+
+def overdue_rate_by_genre(snapshot, now=None):
+    """
+    Доля просроченных выдач по жанрам: {genre_id: (выдач, просрочено, доля)}.
+
+    Просроченной считается выдача, возвращенная позже срока, или не возвращенная
+    к моменту now (по умолчанию - время создания снимка). Книги без жанра - genre_id -1.
+    """
+    if now is None:
+        now = np.datetime64(snapshot.meta['created_at'][:19], 's')
+    else:
+        # Время в снимке хранится в UTC без часового пояса
+        now = np.datetime64(now.astimezone(timezone.utc).replace(tzinfo=None), 's')
+    due = snapshot.due
+    returned = snapshot.returned
+    open_loans = np.isnat(returned)
+    overdue = np.where(open_loans, due < now, returned > due)
+    overdue |= snapshot.status == STATUS_CODES['overdue']
+
+    # Сдвиг на 1, чтобы книги без жанра (-1) попали в нулевую корзину bincount
+    genres = snapshot.genre_id + 1
+    loans = np.bincount(genres)
+    late = np.bincount(genres, weights=overdue, minlength=loans.size).astype(np.int64)
+    present = np.flatnonzero(loans)
+    return {
+        int(index - 1): (int(loans[index]), int(late[index]), float(late[index] / loans[index]))
+        for index in present
+    }
+
+
+def monthly_active_readers(snapshot):
+    """Число разных читателей, бравших книги, по месяцам: [(месяц 'ГГГГ-ММ', читателей)]"""
+    borrowed = snapshot.borrowed
+    known = ~np.isnat(borrowed)
+    months = borrowed[known].astype('datetime64[M]').astype(np.int64)
+    users = snapshot.user_id[known]
+    if not months.size:
+        return []
+
+    # Пара (месяц, читатель) кодируется одним числом, повторы убираются np.unique
+    span = int(users.max()) + 1
+    pairs = np.unique((months - months.min()) * span + users)
+    month_index, counts = np.unique(pairs // span, return_counts=True)
+    labels = (month_index + months.min()).astype('datetime64[M]')
+    return [(str(label), int(count)) for label, count in zip(labels, counts)]
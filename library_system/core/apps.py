@@ -6,4 +6,5 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         from core.admin_registry import register_models
-        register_models()
\ No newline at end of file
+        register_models()
+        from . import signals  # noqa: F401
\ No newline at end of file
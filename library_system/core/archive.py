@@ -0,0 +1,280 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .models import AuditLog
+
+ARCHIVE_VERSION = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+BLOCK_ROWS = 5000
+
+# Оглавление сегмента: блок = отдельный gzip-член файла .jsonl.gz
+BLOCK_DTYPE = np.dtype([
+    ('offset', np.int64),
+    ('length', np.int64),
+    ('rows', np.int32),
+    ('actions', np.int32),  # битовая маска действий блока, биты по meta['actions']
+    ('ts_min', np.int64),   # микросекунды от эпохи, UTC
+    ('ts_max', np.int64),
+])
+# Строки сегмента упорядочены по пользователю, поэтому его записи лежат в блоках first..last подряд
+USER_DTYPE = np.dtype([
+    ('user_id', np.int64),
+    ('first_block', np.int32),
+    ('last_block', np.int32),
+])
+
+
+def archive_root():
+    return getattr(settings, 'AUDIT_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'audit_archive'))
+
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _segment_paths(root, name):
+    base = os.path.join(root, name)
+    return {
+        'data': f'{base}.jsonl.gz',
+        'blocks': f'{base}.blocks.npy',
+        'users': f'{base}.users.npy',
+        'meta': f'{base}.json',
+    }
+
+
+def _fsync(path):
+    """Сбрасывает на диск файл или каталог (для каталога - записи о переименованиях)"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def is_archived(name, root=None):
+    return os.path.exists(_segment_paths(root or archive_root(), name)['meta'])
+
+
+def archive_partition(name, start, end, root=None, block_rows=BLOCK_ROWS):
+    """
+    Выгружает секцию журнала аудита в сжатый сегмент с индексом; возвращает число строк.
+
+    Данные - JSONL, каждые block_rows строк сжаты отдельным gzip-членом (файл целиком
+    читается zcat). Рядом лежат оглавление блоков и индекс пользователей в .npy:
+    читатель открывает их через memmap и распаковывает только нужные блоки.
+    Файл описания .json пишется последним и означает, что сегмент готов; в нем
+    же число строк, сумма id и sha256 распакованных данных для verify_archive.
+    Все файлы и каталог сбрасываются на диск до того, как сегмент считается готовым.
+    """
+    root = root or archive_root()
+    os.makedirs(root, exist_ok=True)
+    paths = _segment_paths(root, name)
+    actions = [action for action, _ in AuditLog.ACTION_CHOICES]
+    bits = {action: 1 << index for index, action in enumerate(actions)}
+
+    users_table = connection.ops.quote_name(get_user_model()._meta.db_table)
+    blocks, user_ranges = [], {}
+    rows = id_sum = 0
+    digest = hashlib.sha256()
+
+    def flush_block(output, lines, entries):
+        offset = output.tell()
+        payload = ''.join(lines).encode('utf-8')
+        digest.update(payload)
+        output.write(gzip.compress(payload))
+        mask = 0
+        for action in {entry[1] for entry in entries}:
+            mask |= bits.get(action, 0)
+        blocks.append((
+            offset, output.tell() - offset, len(lines), mask,
+            min(entry[2] for entry in entries), max(entry[2] for entry in entries),
+        ))
+        index = len(blocks) - 1
+        for user_id in {entry[0] for entry in entries}:
+            first, _ = user_ranges.get(user_id, (index, index))
+            user_ranges[user_id] = (first, index)
+
+    with open(paths['data'] + '.tmp', 'wb') as output, connection.chunked_cursor() as cursor:
+        cursor.execute(
+            f'SELECT a.id, a.user_id, u.username, a.action, a.description, host(a.ip_address), a."timestamp" '
+            f'FROM {connection.ops.quote_name(name)} a LEFT JOIN {users_table} u ON u.id = a.user_id '
+            f'ORDER BY a.user_id, a."timestamp", a.id'
+        )
+        lines, entries = [], []
+        while True:
+            chunk = cursor.fetchmany(block_rows)
+            if not chunk:
+                break
+            for log_id, user_id, username, action, description, ip_address, timestamp in chunk:
+                lines.append(json.dumps({
+                    'id': log_id,
+                    'user_id': user_id,
+                    'username': username,
+                    'action': action,
+                    'description': description,
+                    'ip_address': ip_address,
+                    'timestamp': timestamp.isoformat(),
+                }, ensure_ascii=False) + '\n')
+                entries.append((user_id, action, _micros(timestamp)))
+                id_sum += log_id
+                if len(lines) == block_rows:
+                    flush_block(output, lines, entries)
+                    rows += len(lines)
+                    lines, entries = [], []
+        if lines:
+            flush_block(output, lines, entries)
+            rows += len(lines)
+        output.flush()
+        os.fsync(output.fileno())
+
+    indexes = {
+        'blocks': np.array(blocks, dtype=BLOCK_DTYPE),
+        'users': np.array(sorted((user_id, *span) for user_id, span in user_ranges.items()), dtype=USER_DTYPE),
+    }
+    for key, array in indexes.items():
+        with open(paths[key] + '.tmp', 'wb') as output:
+            np.save(output, array, allow_pickle=False)
+            output.flush()
+            os.fsync(output.fileno())
+    for key in ('data', 'blocks', 'users'):
+        os.replace(paths[key] + '.tmp', paths[key])
+    _fsync(root)
+
+    with open(paths['meta'] + '.tmp', 'w', encoding='utf-8') as meta:
+        json.dump({
+            'version': ARCHIVE_VERSION,
+            'partition': name,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'rows': rows,
+            'id_sum': id_sum,
+            'sha256': digest.hexdigest(),
+            'blocks': len(blocks),
+            'actions': actions,
+        }, meta, ensure_ascii=False, indent=2)
+        meta.flush()
+        os.fsync(meta.fileno())
+    os.replace(paths['meta'] + '.tmp', paths['meta'])
+    _fsync(root)
+    return rows
+
+
+def verify_archive(name, root=None):
+    """
+    Сверяет сегмент с секцией перед ее удалением; возвращает число строк.
+
+    Число строк и сумма id сегмента должны совпасть с секцией в БД, а
+    перечитанные с диска данные - с sha256 из описания. При расхождении ValueError.
+    """
+    segment = ArchiveSegment(root or archive_root(), name)
+    expected = (segment.meta['rows'], segment.meta.get('id_sum'))
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*), COALESCE(sum(id), 0) FROM {connection.ops.quote_name(name)}')
+        stored = tuple(int(value) for value in cursor.fetchone())
+    if stored != expected:
+        raise ValueError(f'Сегмент {name} не совпадает с секцией: в БД {stored}, в архиве {expected} (строк, сумма id)')
+
+    digest = hashlib.sha256()
+    rows = id_sum = 0
+    with open(segment.paths['data'], 'rb') as data_file:
+        for block in segment.blocks:
+            data_file.seek(int(block['offset']))
+            payload = gzip.decompress(data_file.read(int(block['length'])))
+            digest.update(payload)
+            for line in payload.decode('utf-8').splitlines():
+                rows += 1
+                id_sum += json.loads(line)['id']
+    if (rows, id_sum) != expected or digest.hexdigest() != segment.meta.get('sha256'):
+        raise ValueError(f'Сегмент {name} поврежден: данные на диске не совпадают с описанием')
+    return rows
+
+
+class ArchiveSegment:
+    """Сегмент архива: оглавление и индекс пользователей открыты через memmap, блоки читаются по требованию"""
+
+    def __init__(self, root, name):
+        self.paths = _segment_paths(root, name)
+        with open(self.paths['meta'], encoding='utf-8') as meta:
+            self.meta = json.load(meta)
+        if self.meta.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f'Неподдерживаемая версия сегмента {name}: {self.meta.get("version")}')
+        self.name = name
+        self.start = datetime.fromisoformat(self.meta['start'])
+        self.end = datetime.fromisoformat(self.meta['end'])
+        self.blocks = np.load(self.paths['blocks'], mmap_mode='r')
+        self.users = np.load(self.paths['users'], mmap_mode='r')
+
+    def candidate_blocks(self, user_id=None, actions=None, start=None, end=None):
+        """Номера блоков, в которых могут быть подходящие записи"""
+        if (start and start >= self.end) or (end and end <= self.start) or not len(self.blocks):
+            return np.empty(0, dtype=np.int64)
+
+        selected = np.ones(len(self.blocks), dtype=bool)
+        if user_id is not None:
+            position = np.searchsorted(self.users['user_id'], user_id)
+            if position == len(self.users) or self.users['user_id'][position] != user_id:
+                return np.empty(0, dtype=np.int64)
+            selected[:] = False
+            selected[self.users['first_block'][position]:self.users['last_block'][position] + 1] = True
+        if actions:
+            mask = 0
+            for action in actions:
+                if action in self.meta['actions']:
+                    mask |= 1 << self.meta['actions'].index(action)
+            selected &= (self.blocks['actions'] & mask) != 0
+        if start is not None:
+            selected &= self.blocks['ts_max'] >= _micros(start)
+        if end is not None:
+            selected &= self.blocks['ts_min'] < _micros(end)
+        return np.flatnonzero(selected)
+
+    def read_block(self, index, data_file):
+        block = self.blocks[index]
+        data_file.seek(int(block['offset']))
+        payload = gzip.decompress(data_file.read(int(block['length'])))
+        return [json.loads(line) for line in payload.decode('utf-8').splitlines()]
+
+
+def open_segments(root=None):
+    root = root or archive_root()
+    if not os.path.isdir(root):
+        return []
+    names = sorted(entry[:-len('.json')] for entry in os.listdir(root) if entry.endswith('.json'))
+    return [ArchiveSegment(root, name) for name in names]
+
+
+def search_archive(user_id=None, actions=None, start=None, end=None, root=None, stats=None):
+    """
+    Записи архива по пользователю, действиям и периоду [start, end) в порядке сегментов.
+
+    stats (словарь), если передан, накапливает число прочитанных и всех блоков.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault('blocks_read', 0)
+    stats.setdefault('blocks_total', 0)
+    for segment in open_segments(root):
+        stats['blocks_total'] += len(segment.blocks)
+        candidates = segment.candidate_blocks(user_id, actions, start, end)
+        if not len(candidates):
+            continue
+        with open(segment.paths['data'], 'rb') as data_file:
+            for index in candidates:
+                stats['blocks_read'] += 1
+                for row in segment.read_block(index, data_file):
+                    if user_id is not None and row['user_id'] != user_id:
+                        continue
+                    if actions and row['action'] not in actions:
+                        continue
+                    timestamp = datetime.fromisoformat(row['timestamp'])
+                    if (start and timestamp < start) or (end and timestamp >= end):
+                        continue
+                    yield row
+
@@ -0,0 +1,326 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, InterfaceError, OperationalError, connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AuditActionCount, AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Текущий запрос: из него сервисы и сигналы берут IP-адрес и того, кто действует
+_current_request = ContextVar('audit_current_request', default=None)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class AuditWriter:
+    """
+    Буферизованная запись журнала аудита.
+
+    События складываются в ограниченную очередь, фоновый поток пишет их пачками
+    через bulk_create, как только набралось batch_size событий или прошло
+    flush_interval секунд. При переполненной очереди запрос ждет не дольше
+    enqueue_timeout, после чего событие отбрасывается и учитывается в dropped;
+    сводка отброшенных пишется в лог не чаще раза в drop_log_interval секунд.
+
+    Пачку, отвергнутую из-за данных (IntegrityError, DataError), поток делит
+    на части вплоть до отдельных событий, так что теряются только сбойные.
+    Если база недоступна, пачка повторяется целиком с нарастающей паузой от
+    retry_delay до max_retry_delay секунд; пока идут повторы, переполненная
+    очередь отбрасывает события без ожидания. Потери пишутся в лог.
+    """
+
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=1.0, enqueue_timeout=0.05,
+                 retry_delay=1.0, max_retry_delay=30.0, drop_log_interval=10.0):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.drop_log_interval = drop_log_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._dropped_unlogged = 0
+        self._drop_logged_at = None
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._unavailable = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, entry):
+        try:
+            if self._unavailable.is_set():
+                self.queue.put_nowait(entry)
+            else:
+                self.queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._drop()
+            return False
+        return True
+
+    def _drop(self):
+        now = time.monotonic()
+        with self._stats_lock:
+            self.dropped += 1
+            self._dropped_unlogged += 1
+            if self._drop_logged_at is not None and now - self._drop_logged_at < self.drop_log_interval:
+                return
+            unlogged, total = self._dropped_unlogged, self.dropped
+            self._dropped_unlogged = 0
+            self._drop_logged_at = now
+        logger.warning('Очередь аудита переполнена, отброшено событий: %s (всего: %s)', unlogged, total)
+
+    def flush(self):
+        """Записывает накопленные события в текущем потоке и дожидается пачки, которую пишет фоновый поток"""
+        while True:
+            batch = self._take(timeout=0)
+            if not batch:
+                break
+            self._write(batch)
+        self.queue.join()
+
+    def shutdown(self, timeout=5.0):
+        """Останавливает фоновый поток и дописывает остаток очереди"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queued': self.queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    def _take(self, timeout):
+        """Пачка до batch_size событий; ждет первых событий не дольше timeout секунд"""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Записывает пачку, пока база недоступна - с повторами; после остановки не повторяет"""
+        try:
+            pending = self._save(batch)
+            delay = self.retry_delay
+            while pending and not self._stopping.is_set():
+                self._unavailable.set()
+                logger.warning('База недоступна, повтор записи %s событий аудита через %s с', len(pending), delay)
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                pending = self._save(pending)
+            self._unavailable.clear()
+            if pending:
+                logger.error('База недоступна, события аудита не записаны: %s', len(pending))
+                with self._stats_lock:
+                    self.failed += len(pending)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def _save(self, batch):
+        """
+        Записывает пачку и возвращает события, которые стоит повторить (база недоступна).
+
+        Пачку, отвергнутую из-за данных, повторяет по половинам, чтобы отбросить
+        только сбойные события.
+        """
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+                count_actions(batch)
+        except (OperationalError, InterfaceError):
+            if not connection.in_atomic_block:
+                # Соединение оборвано, оно переоткроется при следующей записи
+                connection.close()
+            self._reset(batch)
+            return batch
+        except (IntegrityError, DataError) as error:
+            self._reset(batch)
+            if len(batch) == 1:
+                self._fail(batch, 'Событие аудита не записано: %s пользователя %s в %s',
+                           batch[0].action, batch[0].user_id, batch[0].timestamp.isoformat())
+                return []
+            logger.warning('Пачка аудита из %s событий не записана (%s), повтор по частям', len(batch), error)
+            middle = len(batch) // 2
+            return self._save(batch[:middle]) + self._save(batch[middle:])
+        except Exception:
+            self._reset(batch)
+            self._fail(batch, 'Пачка аудита из %s событий не записана', len(batch))
+            return []
+        with self._stats_lock:
+            self.written += len(batch)
+        return []
+
+    def _reset(self, batch):
+        for entry in batch:
+            entry.pk = None
+
+    def _fail(self, batch, message, *args):
+        logger.error(message, *args, exc_info=True)
+        with self._stats_lock:
+            self.failed += len(batch)
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                try:
+                    batch = self._take(timeout=self.flush_interval)
+                    if batch:
+                        self._write(batch)
+                except Exception:
+                    # Поток не должен завершаться: иначе очередь переполнится и все события будут отбрасываться
+                    logger.exception('Ошибка потока записи аудита')
+        finally:
+            connection.close()
+
+
+def count_actions(entries):
+    """Прибавляет события к дневным счетчикам действий одним INSERT ... ON CONFLICT"""
+    # Ключи по порядку: параллельные писатели блокируют строки счетчиков в одной очередности
+    counts = sorted(Counter((timezone.localdate(entry.timestamp), entry.action) for entry in entries).items())
+    if not counts:
+        return
+    table = connection.ops.quote_name(AuditActionCount._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (date, action, count) VALUES {", ".join(["(%s, %s, %s)"] * len(counts))} '
+            f'ON CONFLICT (date, action) DO UPDATE SET count = {table}.count + EXCLUDED.count',
+            [value for (day, action), count in counts for value in (day, action, count)],
+        )
+
+
+def rebuild_action_counts(start_date=None, end_date=None):
+    """
+    Пересчитывает дневные счетчики действий за период [start_date, end_date] (по умолчанию за все время) из журнала.
+
+    Нужен, когда счетчики разошлись с журналом: события удаляются мимо
+    счетчиков, например каскадом при удалении пользователя. Таблица счетчиков
+    блокируется от записи до конца пересчета, как в rebuild_leaderboard.
+    Возвращает число строк счетчиков.
+    """
+    events = AuditLog.objects.annotate(date=TruncDate('timestamp'))
+    counters = AuditActionCount.objects.all()
+    if start_date is not None:
+        events = events.filter(date__gte=start_date)
+        counters = counters.filter(date__gte=start_date)
+    if end_date is not None:
+        events = events.filter(date__lte=end_date)
+        counters = counters.filter(date__lte=end_date)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {connection.ops.quote_name(AuditActionCount._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE'
+            )
+        counters.delete()
+        created = AuditActionCount.objects.bulk_create(
+            (
+                AuditActionCount(**row)
+                for row in events.order_by().values('date', 'action').annotate(count=Count('id')).iterator()
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def action_counts(start_date, end_date):
+    """Число событий по действиям за период по дневным счетчикам: [(действие, название, число)]"""
+    labels = dict(AuditLog.ACTION_CHOICES)
+    rows = (
+        AuditActionCount.objects.filter(date__range=[start_date, end_date])
+        .values('action')
+        .annotate(total=Sum('count'))
+        .order_by('-total', 'action')
+    )
+    return [(row['action'], labels.get(row['action'], row['action']), row['total']) for row in rows]
+
+
+def get_writer():
+    """Общий для процесса писатель аудита; поток записи запускается при первом событии"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AuditWriter(
+                max_size=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+                batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 500),
+                flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0),
+                enqueue_timeout=getattr(settings, 'AUDIT_ENQUEUE_TIMEOUT', 0.05),
+            )
+            _writer.start()
+            atexit.register(_writer.shutdown)
+    return _writer
+
+
+def _forget_writer():
+    # Поток записи не переживает fork: дочерний процесс заведет свой
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_writer)
+
+
+def set_current_request(request):
+    return _current_request.set(request)
+
+
+def reset_current_request(token):
+    _current_request.reset(token)
+
+
+def current_actor():
+    """Пользователь текущего запроса или None вне запроса и для анонимов"""
+    request = _current_request.get()
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') if request is not None else None
+
+
+def record(action, user, description, request=None):
+    """
+    Ставит событие аудита в очередь записи.
+
+    Событие попадает в очередь только после фиксации текущей транзакции:
+    откаченная выдача не оставляет следа в журнале.
+    """
+    user_id = getattr(user, 'pk', user)
+    if user_id is None:
+        return
+    entry = AuditLog(
+        user_id=user_id,
+        action=action,
+        description=description,
+        ip_address=client_ip(request or _current_request.get()),
+        timestamp=timezone.now(),
+    )
+    transaction.on_commit(lambda: get_writer().put(entry))
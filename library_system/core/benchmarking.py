@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+
+from django.db import connection
+
+# Словарь для генерации синтетических названий (русские словоформы проверяют стемминг)
+WORDS = [
+    'война', 'мир', 'преступление', 'наказание', 'идиот', 'братья', 'отцы', 'дети',
+    'мертвые', 'души', 'герой', 'нашего', 'времени', 'тихий', 'дон', 'мастер',
+    'маргарита', 'белая', 'гвардия', 'собачье', 'сердце', 'капитанская', 'дочка',
+    'история', 'путешествие', 'тайна', 'остров', 'город', 'ночь', 'зима', 'море',
+]
+AUTHOR_NAMES = [
+    'Толстой', 'Достоевский', 'Тургенев', 'Гоголь', 'Лермонтов', 'Шолохов',
+    'Булгаков', 'Пушкин', 'Чехов', 'Бунин', 'Набоков', 'Пастернак',
+]
+GENRE_NAMES = ['Роман', 'Повесть', 'Поэзия', 'Драма', 'Фантастика', 'Детектив']
+
+
+def make_title(rng):
+    """Случайное название из 2-4 слов"""
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def fill_catalog(size, batch_size=5000, seed=42):
+    """Дозаполняет каталог синтетическими книгами до size штук, возвращает число добавленных"""
+    from books.models import Author, Book, Genre
+
+    rng = random.Random(seed + Book.objects.count())
+    authors = [Author.objects.get_or_create(name=name)[0] for name in AUTHOR_NAMES]
+    genres = [Genre.objects.get_or_create(name=name)[0] for name in GENRE_NAMES]
+
+    missing = size - Book.objects.count()
+    created = 0
+    while created < missing:
+        chunk = min(batch_size, missing - created)
+        Book.objects.bulk_create(
+            [
+                Book(
+                    title=make_title(rng),
+                    author=rng.choice(authors),
+                    genre=rng.choice(genres),
+                    total_copies=3,
+                    available_copies=rng.randint(0, 3),
+                )
+                for _ in range(chunk)
+            ],
+            batch_size=batch_size,
+        )
+        created += chunk
+    return created
+
+
+def analyze(*tables):
+    """Обновляет статистику планировщика PostgreSQL после массовой загрузки"""
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+
+
+def measure(func, repeat=5):
+    """Запускает func repeat раз, возвращает медиану и максимум времени в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
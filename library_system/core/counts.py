@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+
+EXACT_COUNT_PARAM = 'exact_count'
+
+
+def _threshold():
+    return getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 100000)
+
+
+def table_estimates(*models):
+    """
+    Оценки числа строк таблиц из pg_class.reltuples одним запросом.
+
+    Для таблиц, по которым еще не собиралась статистика, возвращается None.
+    """
+    tables = {model._meta.db_table: model for model in models}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relname, reltuples FROM pg_class '
+            'WHERE oid = ANY(ARRAY[%s]::regclass[])' % ', '.join(['%s'] * len(tables)),
+            list(tables),
+        )
+        rows = dict(cursor.fetchall())
+    return {
+        model: int(rows[table]) if rows.get(table, -1) >= 0 else None
+        for table, model in tables.items()
+    }
+
+
+def is_large(estimate):
+    """Таблица достаточно велика, чтобы точный подсчет заменять оценкой"""
+    return estimate is not None and estimate >= _threshold()
+
+
+def capped_count(queryset, limit):
+    """Точное число строк, но не больше limit + 1: подсчет останавливается на limit + 1 строке"""
+    return queryset.order_by()[:limit + 1].count()
+
+
+def estimated_count(queryset, exact=False):
+    """
+    Число строк queryset и признак того, что это не точное значение.
+
+    Маленькие таблицы (меньше ESTIMATED_COUNT_THRESHOLD строк по статистике)
+    и exact=True считаются точно. Для большой таблицы без условий берется
+    reltuples. Отфильтрованный список считается точно до порога; если строк
+    больше, возвращается порог как нижняя граница.
+    """
+    if exact:
+        return queryset.count(), False
+    return count_for_estimate(queryset, table_estimates(queryset.model)[queryset.model])
+
+
+def count_for_estimate(queryset, estimate):
+    """estimated_count при уже известной оценке размера таблицы estimate"""
+    if not is_large(estimate):
+        return queryset.count(), False
+    if not queryset.query.where:
+        return estimate, True
+    count = capped_count(queryset, _threshold())
+    return min(count, _threshold()), count > _threshold()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, которому для больших таблиц достаточно оценки числа строк"""
+
+    exact = False
+    is_estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.is_estimated = estimated_count(self.object_list, exact=self.exact)
+        return count
+
+
+class EstimatedCountAdminMixin:
+    """
+    Список объектов в админке без точного COUNT(*) по большим таблицам.
+
+    Общее число строк (show_full_result_count) не считается, число результатов
+    оценивается; точный подсчет - по ссылке с параметром exact_count.
+    """
+
+    show_full_result_count = False
+    change_list_template = 'admin/estimated_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        if EXACT_COUNT_PARAM in request.GET:
+            # Параметр не является фильтром списка, иначе ChangeList отвергнет запрос
+            request.GET = request.GET.copy()
+            del request.GET[EXACT_COUNT_PARAM]
+            request.exact_count = True
+        return super().changelist_view(request, extra_context)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        paginator = EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page)
+        paginator.exact = getattr(request, 'exact_count', False)
+        return paginator
@@ -0,0 +1,99 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from books.models import Book, BorrowRecord
+from .counts import count_for_estimate, is_large, table_estimates
+from .parallel import gather_queries
+from .reports import run_queries
+
+GLOBAL_STATS_CACHE_KEY = 'dashboard:global_stats'
+
+
+def _table_counts(queryset, estimate, **conditions):
+    """
+    Несколько счетчиков по одной таблице.
+
+    Небольшая таблица считается точно одним агрегатом. Для большой (см.
+    core.counts) общее число берется из reltuples, а счетчики с условиями
+    считаются точно до порога, как в списках админки; приблизительные
+    значения отмечаются в count_marks: '≈' - оценка, '≥' - нижняя граница.
+    """
+    if not is_large(estimate):
+        counts = queryset.aggregate(**{
+            name: Count('id', filter=condition or None) for name, condition in conditions.items()
+        })
+        counts['count_marks'] = {}
+        return counts
+    counts, marks = {}, {}
+    for name, condition in conditions.items():
+        counts[name], approximate = count_for_estimate(queryset.filter(condition), estimate)
+        if approximate:
+            marks[name] = '≥' if condition or queryset.query.where else '≈'
+    counts['count_marks'] = marks
+    return counts
+
+
+def global_stats_queries(estimates):
+    """Независимые агрегаты для панелей: по одному запросу на таблицу"""
+    User = get_user_model()
+    now = timezone.now()
+
+    return {
+        'books': lambda: _table_counts(
+            Book.objects.all(), estimates[Book],
+            total_books=Q(),
+            available_books=Q(available_copies__gt=0),
+        ),
+        'users': lambda: _table_counts(
+            User.objects.all(), estimates[User],
+            total_users=Q(),
+            librarians_count=Q(role='librarian'),
+            readers_count=Q(role='reader'),
+        ),
+        'loans': lambda: _table_counts(
+            BorrowRecord.objects.filter(returned=False), estimates[BorrowRecord],
+            active_borrowings_count=Q(),
+            overdue_borrowings_count=Q(due_date__lt=now),
+        ),
+    }
+
+
+def _merge(results):
+    marks = {}
+    for table in ('books', 'users', 'loans'):
+        marks.update(results[table].pop('count_marks'))
+    return {**results['books'], **results['users'], **results['loans'], 'count_marks': marks}
+
+
+def compute_global_stats():
+    """Общие показатели панелей"""
+    estimates = table_estimates(Book, get_user_model(), BorrowRecord)
+    return _merge(run_queries(global_stats_queries(estimates)))
+
+
+def get_global_stats():
+    """Общие показатели с кратковременным кэшированием (DASHBOARD_CACHE_TIMEOUT секунд)"""
+    timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60)
+    return cache.get_or_set(GLOBAL_STATS_CACHE_KEY, compute_global_stats, timeout)
+
+
+async def aget_global_stats():
+    """Асинхронный get_global_stats: при промахе агрегаты выполняются параллельно"""
+    stats = await cache.aget(GLOBAL_STATS_CACHE_KEY)
+    if stats is None:
+        estimates = await sync_to_async(table_estimates)(Book, get_user_model(), BorrowRecord)
+        stats = _merge(await gather_queries(global_stats_queries(estimates)))
+        await cache.aset(GLOBAL_STATS_CACHE_KEY, stats, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60))
+    return stats
+
+
+def get_reader_stats(user):
+    """Личные показатели читателя одним запросом"""
+    return BorrowRecord.objects.filter(user=user, returned=False).aggregate(
+        user_borrowings_count=Count('id'),
+        user_overdue_count=Count('id', filter=Q(due_date__lt=timezone.now())),
+    )
@@ -0,0 +1,113 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+CHUNK_SIZE = 2000
+
+
+def _books():
+    from books.models import Book
+    return Book.objects.all()
+
+
+def _borrowings():
+    from borrowings.models import Borrowing
+    return Borrowing.objects.all()
+
+
+def _borrow_records():
+    from books.models import BorrowRecord
+    return BorrowRecord.objects.all()
+
+
+def _audit_log():
+    from .models import AuditLog
+    return AuditLog.objects.all()
+
+
+# Имя выгрузки -> (queryset, [(заголовок, поле для values_list)])
+EXPORTS = {
+    'books': (_books, [
+        ('id', 'id'),
+        ('title', 'title'),
+        ('isbn', 'isbn'),
+        ('author', 'author__name'),
+        ('genre', 'genre__name'),
+        ('total_copies', 'total_copies'),
+        ('available_copies', 'available_copies'),
+        ('publication_year', 'publication_year'),
+        ('publisher', 'publisher'),
+        ('created_at', 'created_at'),
+    ]),
+    'borrowings': (_borrowings, [
+        ('id', 'id'),
+        ('book_id', 'book_id'),
+        ('book_title', 'book__title'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('borrowed_date', 'borrowed_date'),
+        ('due_date', 'due_date'),
+        ('returned_date', 'returned_date'),
+        ('status', 'status'),
+        ('renew_count', 'renew_count'),
+    ]),
+    'borrow_records': (_borrow_records, [
+        ('id', 'id'),
+        ('book_id', 'book_id'),
+        ('book_title', 'book__title'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('borrow_date', 'borrow_date'),
+        ('due_date', 'due_date'),
+        ('returned', 'returned'),
+        ('return_date', 'return_date'),
+    ]),
+    'audit_log': (_audit_log, [
+        ('id', 'id'),
+        ('timestamp', 'timestamp'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('action', 'action'),
+        ('description', 'description'),
+        ('ip_address', 'ip_address'),
+    ]),
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(name, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки по порядку id через серверный курсор, без загрузки всего набора в память"""
+    queryset, columns = EXPORTS[name]
+    return queryset().order_by('pk').values_list(*[field for _, field in columns]).iterator(chunk_size=chunk_size)
+
+
+def stream_export(name, file_format, chunk_size=CHUNK_SIZE):
+    """Генератор строк выгрузки в формате csv или jsonl"""
+    headers = [header for header, _ in EXPORTS[name][1]]
+    rows = iter_rows(name, chunk_size)
+
+    if file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    else:
+        yield from stream_csv(headers, rows)
+
+
+def stream_csv(headers, rows):
+    """Генератор строк CSV: заголовок и строки из итератора"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,180 @@
+import csv
+import tempfile
+import time
+import traceback
+from datetime import date, timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .exports import EXPORTS, iter_rows
+from .models import DailyCirculationFact, ReportJob
+from .rankings import WINDOWS
+from .rollups import refresh_daily_facts
+
+PROGRESS_EVERY = 1000
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = timedelta(minutes=10)
+
+
+def _parse_date(value, default):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def statistics_rows(params, heartbeat):
+    """Выдачи, возвраты, просрочки и новые книги по дням за период"""
+    end_date = _parse_date(params.get('end_date'), timezone.now().date())
+    start_date = _parse_date(params.get('start_date'), end_date - timedelta(days=30))
+
+    refresh_daily_facts()
+    heartbeat()
+    days = (
+        DailyCirculationFact.objects.filter(date__range=[start_date, end_date])
+        .values('date')
+        .annotate(loans=Sum('loans'), returns=Sum('returns'), overdues=Sum('overdues'), new_books=Sum('new_books'))
+        .order_by('date')
+    )
+    return (
+        ['date', 'loans', 'returns', 'overdues', 'new_books'],
+        (end_date - start_date).days + 1,
+        days.values_list('date', 'loans', 'returns', 'overdues', 'new_books').iterator(),
+    )
+
+
+def popular_books_rows(params, heartbeat):
+    """Все книги с выдачами за окно рейтинга, по убыванию числа выдач"""
+    window = params.get('window') if params.get('window') in WINDOWS else 'all'
+    days = WINDOWS[window]
+
+    refresh_daily_facts()
+    heartbeat()
+    facts = DailyCirculationFact.objects.filter(loans__gt=0)
+    if days is not None:
+        facts = facts.filter(date__gt=timezone.now().date() - timedelta(days=days))
+    books = facts.values('book_id').annotate(total=Sum('loans')).order_by('-total', 'book_id')
+    return (
+        ['book_id', 'title', 'author', 'genre', 'loans'],
+        books.count(),
+        books.values_list(
+            'book_id', F('book__title'), F('book__author__name'), F('book__genre__name'), 'total'
+        ).iterator(chunk_size=2000),
+    )
+
+
+def export_rows(params, heartbeat):
+    """Полная выгрузка из core.exports в файл"""
+    name = params.get('name')
+    if name not in EXPORTS:
+        raise ValueError(f'Неизвестная выгрузка: {name}')
+    queryset, columns = EXPORTS[name]
+    return [header for header, _ in columns], queryset().count(), iter_rows(name)
+
+
+# Вид отчета -> (название, функция (параметры, heartbeat) -> (заголовки, ожидаемое число строк, строки));
+# heartbeat() вызывается после долгих шагов подготовки, чтобы задание не сочли зависшим
+REPORT_KINDS = {
+    'statistics': ('Статистика по дням', statistics_rows),
+    'popular_books': ('Полный рейтинг популярности', popular_books_rows),
+    'export': ('Выгрузка журнала', export_rows),
+}
+
+
+def enqueue_report(kind, params=None, user=None):
+    if kind not in REPORT_KINDS:
+        raise ValueError(f'Неизвестный отчет: {kind}')
+    return ReportJob.objects.create(kind=kind, params=params or {}, created_by=user)
+
+
+def claim_next_job():
+    """
+    Забирает самое старое задание из очереди.
+
+    SELECT ... FOR UPDATE SKIP LOCKED: параллельные обработчики не ждут друг
+    друга и не получают одно задание дважды.
+    """
+    with transaction.atomic():
+        job = (
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        now = timezone.now()
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = now
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def requeue_stale_jobs(stale_after=STALE_AFTER):
+    """Возвращает в очередь задания, обработчик которых перестал сообщать о ходе работы"""
+    return ReportJob.objects.filter(
+        status='running',
+        heartbeat_at__lt=timezone.now() - stale_after,
+    ).update(status='pending', progress=0, rows=0)
+
+
+def _claimed(job):
+    """Задание, пока оно за этим обработчиком: не возвращено в очередь и не взято заново"""
+    return ReportJob.objects.filter(pk=job.pk, status='running', started_at=job.started_at)
+
+
+def _heartbeat(job, **fields):
+    return _claimed(job).update(heartbeat_at=timezone.now(), **fields)
+
+
+def _report_progress(job, rows, total):
+    progress = min(99, rows * 100 // total) if total else 0
+    _heartbeat(job, rows=rows, progress=progress)
+
+
+def run_job(job):
+    """
+    Формирует CSV отчета во временный файл, затем сохраняет его в хранилище результатов.
+
+    Итог записывается, только если задание все еще за этим обработчиком; иначе
+    файл удаляется, а возвращается задание в его текущем состоянии.
+    """
+    try:
+        _heartbeat(job)
+        headers, total, rows = REPORT_KINDS[job.kind][1](job.params, lambda: _heartbeat(job))
+        _heartbeat(job)
+        written = 0
+        reported_at = time.monotonic()
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(headers)
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+                if written % PROGRESS_EVERY == 0 or time.monotonic() - reported_at > HEARTBEAT_INTERVAL:
+                    _report_progress(job, written, total)
+                    reported_at = time.monotonic()
+
+            output.seek(0)
+            filename = f'{job.kind}_{job.pk}_{timezone.now():%Y%m%d_%H%M%S}.csv'
+            job.result.save(filename, File(output), save=False)
+
+        job.status = 'done'
+        job.rows = written
+        job.progress = 100
+    except Exception:
+        job.status = 'failed'
+        job.error = traceback.format_exc()
+    job.finished_at = timezone.now()
+    finished = _claimed(job).update(
+        status=job.status, rows=job.rows, progress=job.progress,
+        result=job.result.name, error=job.error, finished_at=job.finished_at,
+    )
+    if not finished:
+        if job.result:
+            job.result.delete(save=False)
+        job.refresh_from_db()
+    return job
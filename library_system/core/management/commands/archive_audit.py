@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.archive import archive_partition, archive_root, is_archived
+from core.partitions import audit_partitions, expired_partitions, month_start
+
+
+class Command(BaseCommand):
+    help = 'Выгружает секции журнала аудита в сжатые сегменты архива с индексом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partition', action='append', dest='partitions', help='Имя секции (можно несколько)')
+        parser.add_argument(
+            '--closed',
+            action='store_true',
+            help='Все завершенные месяцы, а не только секции старше срока хранения',
+        )
+        parser.add_argument('--output', help='Каталог архива (по умолчанию AUDIT_ARCHIVE_ROOT)')
+        parser.add_argument('--force', action='store_true', help='Перезаписать уже архивированные сегменты')
+
+    def handle(self, *args, **options):
+        root = options['output'] or archive_root()
+        if options['partitions']:
+            partitions = [partition for partition in audit_partitions() if partition[0] in options['partitions']]
+            missing = set(options['partitions']) - {name for name, _, _ in partitions}
+            if missing:
+                raise CommandError(f'Нет секций: {", ".join(sorted(missing))}')
+        elif options['closed']:
+            current = month_start(timezone.now())
+            partitions = [partition for partition in audit_partitions() if partition[2] <= current]
+        else:
+            partitions = expired_partitions()
+
+        for name, start, end in partitions:
+            if is_archived(name, root) and not options['force']:
+                self.stdout.write(f'{name}: уже в архиве')
+                continue
+            started = time.perf_counter()
+            rows = archive_partition(name, start, end, root)
+            self.stdout.write(f'{name}: {rows} записей, {time.perf_counter() - started:.1f} с')
+
+        self.stdout.write(self.style.SUCCESS(f'Архив журнала аудита: {root}'))
@@ -1,9 +1,25 @@
+import hashlib
+import json
 import os
+import shutil
 import subprocess
+import time
 from datetime import datetime
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+FORMATS = {'plain': 'p', 'directory': 'd'}
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """SHA-256 файла, читается порциями"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class Command(BaseCommand):
     help = 'Создает резервную копию базы данных PostgreSQL'
 
@@ -14,62 +30,162 @@ class Command(BaseCommand):
             default='backups',
             help='Директория для сохранения бэкапов',
         )
+        parser.add_argument(
+            '--format',
+            choices=sorted(FORMATS),
+            default='plain',
+            help='plain - один файл .sql; directory - каталог pg_dump для параллельного дампа и восстановления',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=min(4, os.cpu_count() or 1),
+            help='Число параллельных потоков pg_dump (только для directory)',
+        )
+        parser.add_argument(
+            '--compress',
+            default='6',
+            help='Сжатие для directory: уровень gzip 0-9 или метод[:уровень], например zstd:3 (pg_dump 16+)',
+        )
 
     def handle(self, *args, **options):
         db_settings = settings.DATABASES['default']
         output_dir = options['output_dir']
-        
+        file_format = options['format']
+
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-        
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"library_backup_{timestamp}.sql"
+        filename = f"library_backup_{timestamp}" + ('.sql' if file_format == 'plain' else '')
         filepath = os.path.join(output_dir, filename)
-        
+
         cmd = [
             'pg_dump',
             '-h', db_settings['HOST'],
             '-p', db_settings['PORT'],
             '-U', db_settings['USER'],
             '-d', db_settings['NAME'],
+            '-F', FORMATS[file_format],
             '-f', filepath,
-            '-w'  
+            '--verbose',
+            '-w'
         ]
-        
+        if file_format == 'directory':
+            cmd += ['-j', str(options['jobs']), '-Z', options['compress']]
+
         try:
             self.stdout.write(f'Создание резервной копии в {filepath}...')
-            
+
             env = os.environ.copy()
             env['PGPASSWORD'] = db_settings['PASSWORD']
-            
-            result = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
-            
+
+            started_at = datetime.now().astimezone()
+            started = time.perf_counter()
+            self.run_pg_dump(cmd, env)
+            duration = time.perf_counter() - started
+
+            manifest = self.write_manifest(filepath, file_format, options, db_settings, started_at, duration)
             self.stdout.write(
-                self.style.SUCCESS(f'Резервная копия успешно создана: {filepath}')
+                self.style.SUCCESS(
+                    f'Резервная копия успешно создана: {filepath} '
+                    f'({manifest["size_bytes"] / 1024 / 1024:.1f} МБ за {duration:.1f} с, sha256 {manifest["sha256"][:12]}…)'
+                )
             )
-            
+
             self.cleanup_old_backups(output_dir)
-            
+
         except subprocess.CalledProcessError as e:
+            self.remove_backup(filepath)
             self.stdout.write(
-                self.style.ERROR(f'Ошибка при создании резервной копии: {e.stderr}')
+                self.style.ERROR(f'Ошибка при создании резервной копии: pg_dump завершился с кодом {e.returncode}')
             )
         except Exception as e:
+            self.remove_backup(filepath)
             self.stdout.write(
                 self.style.ERROR(f'Неожиданная ошибка: {str(e)}')
             )
 
+    def run_pg_dump(self, cmd, env):
+        """Запускает pg_dump и построчно выводит его ход работы (stderr не копится в памяти)"""
+        with subprocess.Popen(cmd, env=env, stderr=subprocess.PIPE, text=True) as process:
+            for line in process.stderr:
+                self.stdout.write(f'  {line.rstrip()}')
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+
+    def write_manifest(self, filepath, file_format, options, db_settings, started_at, duration):
+        """
+        Сохраняет описание копии: размер, длительность и контрольные суммы.
+
+        Для каталога манифест лежит внутри, общая sha256 считается по именам
+        и суммам файлов; для файла .sql - рядом, <имя>.manifest.json.
+        """
+        if file_format == 'directory':
+            files = {
+                name: {'size_bytes': os.path.getsize(os.path.join(filepath, name)),
+                       'sha256': file_checksum(os.path.join(filepath, name))}
+                for name in sorted(os.listdir(filepath))
+            }
+            digest = hashlib.sha256()
+            for name, info in files.items():
+                digest.update(f'{name} {info["sha256"]}\n'.encode())
+            checksum = digest.hexdigest()
+            manifest_path = os.path.join(filepath, 'manifest.json')
+        else:
+            files = {}
+            checksum = file_checksum(filepath)
+            manifest_path = f'{filepath}.manifest.json'
+
+        manifest = {
+            'database': db_settings['NAME'],
+            'format': file_format,
+            'path': os.path.basename(filepath),
+            'started_at': started_at.isoformat(),
+            'duration_seconds': round(duration, 3),
+            'size_bytes': sum(info['size_bytes'] for info in files.values()) if files else os.path.getsize(filepath),
+            'sha256': checksum,
+            'pg_dump_version': subprocess.run(
+                ['pg_dump', '--version'], capture_output=True, text=True,
+            ).stdout.strip(),
+        }
+        if file_format == 'directory':
+            manifest.update({
+                'jobs': options['jobs'],
+                'compress': options['compress'],
+                'files': files,
+                'restore': f'pg_restore -j {options["jobs"]} -d <база> {os.path.basename(filepath)}',
+            })
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    def remove_backup(self, filepath):
+        """Удаляет незавершенную копию, чтобы она не попала в ротацию"""
+        if os.path.isdir(filepath):
+            shutil.rmtree(filepath, ignore_errors=True)
+        elif os.path.exists(filepath):
+            os.remove(filepath)
 
     def cleanup_old_backups(self, backup_dir, keep_count=10):
         """Удаляет старые бэкапы, оставляя только keep_count последних"""
         try:
-            files = [f for f in os.listdir(backup_dir) if f.startswith('library_backup_') and f.endswith('.sql')]
+            files = [
+                f for f in os.listdir(backup_dir)
+                if f.startswith('library_backup_') and (f.endswith('.sql') or os.path.isdir(os.path.join(backup_dir, f)))
+            ]
             files.sort(key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)))
-            
+
             if len(files) > keep_count:
                 for old_file in files[:-keep_count]:
-                    os.remove(os.path.join(backup_dir, old_file))
+                    path = os.path.join(backup_dir, old_file)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                        if os.path.exists(f'{path}.manifest.json'):
+                            os.remove(f'{path}.manifest.json')
                     self.stdout.write(f'Удален старый бэкап: {old_file}')
-                    
+
         except Exception as e:
-            self.stdout.write(f'Ошибка при очистке старых бэкапов: {str(e)}')
\ No newline at end of file
+            self.stdout.write(f'Ошибка при очистке старых бэкапов: {str(e)}')
@@ -0,0 +1,95 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory, override_settings
+
+from core import views
+from core.admin import library_admin
+
+User = get_user_model()
+
+# Замеры очищают кэш перед каждой пачкой: отдельный кэш в памяти процесса,
+# чтобы не стереть общий кэш отчетов, панелей и пула случайных книг
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark_async_reports',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время ответа синхронных и асинхронных вариантов отчетов и панелей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Количество запросов к каждому варианту')
+        parser.add_argument('--concurrency', type=int, default=1, help='Количество одновременных запросов')
+        parser.add_argument('--admin', help='Логин администратора (по умолчанию первый суперпользователь)')
+        parser.add_argument('--reader', help='Логин читателя (по умолчанию первый читатель)')
+
+    def handle(self, *args, **options):
+        admin_user = self.find_user(options['admin'], is_superuser=True)
+        if admin_user is None:
+            raise CommandError('Нет суперпользователя: создайте его или укажите --admin')
+        reader = self.find_user(options['reader'], role='reader')
+
+        # (название, пользователь, синхронный вариант, асинхронный вариант, путь)
+        cases = [
+            ('Статистика за период', admin_user,
+             library_admin.admin_view(library_admin.statistics_view),
+             library_admin.async_admin_view(library_admin.statistics_async_view),
+             '/library-admin/statistics/'),
+            ('Активные читатели', admin_user,
+             library_admin.admin_view(library_admin.active_readers_view),
+             library_admin.async_admin_view(library_admin.active_readers_async_view),
+             '/library-admin/active-readers/'),
+            ('Панель администратора', admin_user, views.dashboard, views.dashboard_async, '/dashboard/'),
+        ]
+        if reader is not None:
+            cases.append(
+                ('Панель читателя', reader, views.reader_dashboard, views.reader_dashboard_async, '/reader-dashboard/')
+            )
+
+        for title, user, sync_view, async_view, path in cases:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                sync_timings = asyncio.run(self.measure(sync_to_async(sync_view), user, path, options))
+                async_timings = asyncio.run(self.measure(async_view, user, path, options))
+            sync_median = statistics.median(sync_timings)
+            async_median = statistics.median(async_timings)
+            self.stdout.write(
+                f'{title}: синхронно {sync_median:.1f} мс (макс. {max(sync_timings):.1f}), '
+                f'асинхронно {async_median:.1f} мс (макс. {max(async_timings):.1f}), '
+                f'ускорение x{sync_median / async_median if async_median else 0:.2f}'
+            )
+
+    def find_user(self, username, **filters):
+        users = User.objects.filter(is_active=True)
+        if username:
+            return users.filter(username=username).first()
+        return users.filter(**filters).order_by('pk').first()
+
+    async def measure(self, view, user, path, options):
+        """Время ответа в миллисекундах; перед каждой пачкой запросов кэш замеров очищается, чтобы измерять сами запросы"""
+        factory = AsyncRequestFactory()
+        timings = []
+
+        async def auser():
+            return user
+
+        async def call():
+            request = factory.get(path)
+            request.user = user
+            request.auser = auser
+            started = time.perf_counter()
+            await view(request)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        for _ in range(max(options['repeat'] // options['concurrency'], 1)):
+            await cache.aclear()
+            await asyncio.gather(*(call() for _ in range(options['concurrency'])))
+        return timings
@@ -0,0 +1,93 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.test import RequestFactory
+
+from core import audit
+from core.models import AuditActionCount, AuditLog
+
+User = get_user_model()
+
+MARKER = 'benchmark_audit'
+# События очереди проходят через count_actions, синхронные - нет
+BUFFERED_MARKER = f'{MARKER}:buffered'
+
+
+class Command(BaseCommand):
+    help = 'Измеряет накладные расходы журнала аудита на запрос: очередь против синхронного INSERT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=5000, help='Количество событий в каждом замере')
+        parser.add_argument('--user', help='Логин пользователя событий (по умолчанию первый активный)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        user = users.filter(username=options['user']).first() if options['user'] else users.order_by('pk').first()
+        if user is None:
+            raise CommandError('Нет пользователей для событий аудита')
+
+        request = RequestFactory().get('/')
+        request.user = user
+        events = options['events']
+
+        def synchronous():
+            AuditLog.objects.create(user=user, action='view_report', description=MARKER, ip_address='127.0.0.1')
+
+        def buffered():
+            audit.record('view_report', user, BUFFERED_MARKER, request)
+
+        writer = audit.get_writer()
+        before = writer.stats()
+        try:
+            for title, func in [('Синхронный INSERT', synchronous), ('Очередь с фоновой записью', buffered)]:
+                timings = self.measure(func, events)
+                self.stdout.write(
+                    f'{title:<26} | медиана {statistics.median(timings):8.1f} мкс | '
+                    f'p99 {timings[int(len(timings) * 0.99)]:8.1f} мкс | макс {timings[-1]:8.1f} мкс'
+                )
+
+            started = time.perf_counter()
+            writer.flush()
+            elapsed = time.perf_counter() - started
+            after = writer.stats()
+            self.stdout.write(
+                f'Дозапись остатка очереди: {elapsed * 1000:.1f} мс; '
+                f'записано {after["written"] - before["written"]}, '
+                f'отброшено {after["dropped"] - before["dropped"]}, '
+                f'ошибок {after["failed"] - before["failed"]}'
+            )
+        finally:
+            writer.flush()
+            deleted = self.cleanup()
+            self.stdout.write(self.style.SUCCESS(f'Замеры завершены, удалено тестовых событий: {deleted}'))
+
+    def cleanup(self):
+        """Удаляет события замеров и вычитает записанные через очередь из дневных счетчиков"""
+        with transaction.atomic():
+            counted = (
+                AuditLog.objects.filter(description=BUFFERED_MARKER)
+                .annotate(date=TruncDate('timestamp'))
+                .order_by()
+                .values('date', 'action')
+                .annotate(events=Count('id'))
+            )
+            for row in counted:
+                AuditActionCount.objects.filter(date=row['date'], action=row['action']).update(
+                    count=F('count') - row['events']
+                )
+            deleted, _ = AuditLog.objects.filter(description__in=[MARKER, BUFFERED_MARKER]).delete()
+        return deleted
+
+    def measure(self, func, events):
+        """Время каждого вызова в микросекундах, по возрастанию"""
+        timings = []
+        for _ in range(events):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        return sorted(timings)
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from books.models import Author, Book
+from borrowings.models import Borrowing
+from borrowings.services import BookUnavailable, checkout, return_borrowing
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест выдачи и возврата книг из нескольких потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Количество параллельных потоков')
+        parser.add_argument('--copies', type=int, default=500, help='Количество экземпляров тестовой книги')
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=100,
+            help='Попыток выдачи на поток (суммарно больше числа копий, чтобы проверить отказы)',
+        )
+
+    def handle(self, *args, **options):
+        threads_count = options['threads']
+        copies = options['copies']
+        attempts = options['attempts']
+
+        author = Author.objects.create(name='Нагрузочный тест')
+        book = Book.objects.create(title='Нагрузочный тест выдачи', author=author, total_copies=copies)
+        users = [
+            User.objects.create(username=f'checkout_bench_{book.pk}_{i}', role='reader')
+            for i in range(threads_count)
+        ]
+
+        try:
+            started = time.perf_counter()
+            results = self.run_threads(users, lambda user: self.checkout_worker(book, user, attempts))
+            checkout_elapsed = time.perf_counter() - started
+
+            issued = sum(ok for ok, _ in results)
+            refused = sum(failed for _, failed in results)
+            book.refresh_from_db()
+            ledger = Borrowing.objects.filter(book=book).count()
+            self.report_check('Выдача', book, copies - issued, ledger == issued)
+            self.stdout.write(
+                f'Выдано: {issued}, отказов: {refused}, записей в журнале: {ledger}, '
+                f'{issued / checkout_elapsed:.0f} выдач/с'
+            )
+
+            started = time.perf_counter()
+            results = self.run_threads(users, self.return_worker)
+            return_elapsed = time.perf_counter() - started
+
+            returned = sum(ok for ok, _ in results)
+            book.refresh_from_db()
+            self.report_check('Возврат', book, copies, returned == issued)
+            self.stdout.write(f'Возвращено: {returned}, {returned / return_elapsed:.0f} возвратов/с')
+        finally:
+            Borrowing.objects.filter(book=book).delete()
+            book.delete()
+            author.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run_threads(self, users, worker):
+        results = [None] * len(users)
+
+        def target(index, user):
+            try:
+                results[index] = worker(user)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=target, args=(i, user)) for i, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def checkout_worker(self, book, user, attempts):
+        issued = refused = 0
+        for _ in range(attempts):
+            try:
+                checkout(Borrowing(book=book, user=user))
+                issued += 1
+            except BookUnavailable:
+                refused += 1
+        return issued, refused
+
+    def return_worker(self, user):
+        returned = repeated = 0
+        for borrowing in Borrowing.objects.filter(user=user).exclude(status='returned'):
+            if return_borrowing(borrowing):
+                returned += 1
+            # Повторный возврат той же выдачи не должен увеличить счетчик
+            if not return_borrowing(borrowing):
+                repeated += 1
+        return returned, repeated
+
+    def report_check(self, stage, book, expected, ledger_ok):
+        if book.available_copies == expected and ledger_ok and book.available_copies >= 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'{stage}: счетчик корректен (available_copies={book.available_copies})'
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f'{stage}: рассинхронизация! available_copies={book.available_copies}, ожидалось {expected}'
+            ))
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from books.models import Author, Book
+from borrowings.models import Borrowing
+from core.benchmarking import analyze, measure
+from core.counts import EstimatedCountPaginator, estimated_count
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает точный COUNT(*) с оценками числа строк на большом журнале выдач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=10_000_000,
+            help='Количество синтетических выдач',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов каждого подсчета',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        # Синтетические данные создаются в транзакции и откатываются после замеров
+        with transaction.atomic():
+            self.stdout.write(f'Подготовка журнала из {rows} выдач...')
+            author = Author.objects.create(name='Тест подсчета')
+            book = Book.objects.create(title='Тест подсчета', author=author, total_copies=1)
+            user = User.objects.create(username=f'count_bench_{book.pk}')
+
+            table = connection.ops.quote_name(Borrowing._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (book_id, user_id, borrowed_date, due_date, status, renew_count) '
+                    f"SELECT %s, %s, now() - i * interval '1 minute', now() + (15 - i %% 60) * interval '1 day', "
+                    f"(ARRAY['active', 'returned', 'returned', 'overdue'])[i %% 4 + 1], 0 "
+                    f'FROM generate_series(1, %s) AS i',
+                    [book.pk, user.pk, rows],
+                )
+            analyze(Borrowing._meta.db_table)
+
+            cases = [
+                ('Вся таблица', Borrowing.objects.all()),
+                ('status = overdue', Borrowing.objects.filter(status='overdue')),
+            ]
+            for title, queryset in cases:
+                exact = queryset.count()
+                estimate, is_estimated = estimated_count(queryset)
+                exact_median, exact_max = measure(queryset.count, repeat)
+                estimate_median, estimate_max = measure(lambda: estimated_count(queryset), repeat)
+                error = abs(estimate - exact) * 100 / exact if exact else 0
+
+                self.stdout.write(
+                    f'{title:<18} | точно: {exact:>10} за {exact_median:8.1f} мс (макс {exact_max:8.1f}) | '
+                    f'{"оценка" if is_estimated else "точно "}: {estimate:>10} за {estimate_median:6.1f} мс '
+                    f'(макс {estimate_max:6.1f}) | погрешность {error:.1f}%'
+                )
+
+            def changelist_count():
+                paginator = EstimatedCountPaginator(Borrowing.objects.order_by('-pk'), 100)
+                return paginator.count, list(paginator.page(1))
+
+            median, maximum = measure(changelist_count, repeat)
+            self.stdout.write(f'Первая страница списка выдач с оценкой числа строк: {median:.1f} мс (макс {maximum:.1f})')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Замеры завершены, тестовые данные удалены'))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from books.models import Book
+from books.search import search_books, update_search_vectors
+from core.benchmarking import analyze, fill_catalog, measure
+
+DEFAULT_QUERIES = ['война', 'мастера маргариту', 'Достоевский', 'детектив', 'путешествия острова']
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает полнотекстовый поиск каталога со старым фильтром icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Размеры каталога для замеров',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов каждого запроса',
+        )
+        parser.add_argument(
+            '--query',
+            action='append',
+            dest='queries',
+            help='Поисковый запрос (можно указать несколько раз)',
+        )
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        repeat = options['repeat']
+
+        # Синтетические данные создаются в транзакции и откатываются после замеров
+        with transaction.atomic():
+            for size in sorted(options['sizes']):
+                self.stdout.write(f'Подготовка каталога из {size} книг...')
+                fill_catalog(size)
+                update_search_vectors(Book.objects.filter(search_vector__isnull=True))
+                analyze(Book._meta.db_table)
+
+                for query in queries:
+                    legacy = Book.objects.select_related('author', 'genre').filter(
+                        Q(title__icontains=query) |
+                        Q(author__name__icontains=query) |
+                        Q(genre__name__icontains=query)
+                    )
+                    fulltext = search_books(Book.objects.select_related('author', 'genre'), query)
+
+                    legacy_median, legacy_max = measure(lambda: list(legacy[:12]), repeat)
+                    fulltext_median, fulltext_max = measure(lambda: list(fulltext[:12]), repeat)
+
+                    self.stdout.write(
+                        f'{size:>9} | {query:<22} | '
+                        f'icontains: {legacy_median:8.1f} мс (макс {legacy_max:8.1f}) | '
+                        f'полнотекстовый: {fulltext_median:8.1f} мс (макс {fulltext_max:8.1f})'
+                    )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Замеры завершены, тестовые данные удалены'))
@@ -0,0 +1,35 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.exports import CHUNK_SIZE, EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка каталога, журналов выдач и аудита в CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS), help='Что выгружать')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help='Формат выгрузки')
+        parser.add_argument('--output', type=str, help='Файл для выгрузки (по умолчанию stdout)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Размер порции чтения из БД')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        lines = 0
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for line in stream_export(options['name'], options['format'], options['chunk_size']):
+                output.write(line)
+                lines += 1
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено строк: {lines} в {options["output"]} за {elapsed:.2f} с'
+            ))
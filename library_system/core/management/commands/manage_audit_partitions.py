@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_partition, is_archived, verify_archive
+from core.partitions import drop_partition, ensure_partitions, expired_partitions
+
+
+class Command(BaseCommand):
+    help = 'Создает будущие месячные секции журнала аудита и удаляет секции старше срока хранения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, help='На сколько месяцев вперед создавать секции')
+        parser.add_argument('--retention-months', type=int, help='Срок хранения журнала в месяцах')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать секции к удалению')
+        parser.add_argument('--no-archive', action='store_true', help='Удалять секции без выгрузки в архив')
+
+    def handle(self, *args, **options):
+        for name, moved in ensure_partitions(options['ahead']):
+            self.stdout.write(f'Создана секция {name}' + (f', перенесено из секции по умолчанию: {moved}' if moved else ''))
+
+        for name, start, end in expired_partitions(options['retention_months']):
+            if options['dry_run']:
+                self.stdout.write(f'Будет удалена секция {name} ({start:%Y-%m})')
+                continue
+            try:
+                rows = None if options['no_archive'] else self.archive(name, start, end)
+                drop_partition(name, start, end, expected_rows=rows)
+            except ValueError as error:
+                self.stdout.write(self.style.ERROR(f'{error}; секция {name} не удалена'))
+                continue
+            self.stdout.write(f'Удалена секция {name} ({start:%Y-%m})')
+
+        self.stdout.write(self.style.SUCCESS('Секции журнала аудита обслужены'))
+
+    def archive(self, name, start, end):
+        """Выгружает секцию в архив (или перевыгружает несверившийся сегмент) и сверяет с БД; возвращает число строк"""
+        if is_archived(name):
+            try:
+                return verify_archive(name)
+            except ValueError as error:
+                self.stdout.write(self.style.WARNING(f'{error}; сегмент выгружается заново'))
+        archive_partition(name, start, end)
+        rows = verify_archive(name)
+        self.stdout.write(f'Секция {name} выгружена в архив и сверена: {rows} записей')
+        return rows
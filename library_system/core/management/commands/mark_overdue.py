@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from borrowings.services import mark_overdue_borrowings
+
+
+class Command(BaseCommand):
+    help = 'Помечает просроченными все активные выдачи с истекшим сроком возврата'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = mark_overdue_borrowings()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Помечено просроченных выдач: {changed}, время: {elapsed * 1000:.1f} мс')
+        )
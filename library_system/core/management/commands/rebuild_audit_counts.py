@@ -0,0 +1,21 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.audit import rebuild_action_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные счетчики действий аудита из журнала'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start_date', type=date.fromisoformat, help='Первый день (ГГГГ-ММ-ДД)')
+        parser.add_argument('--to', dest='end_date', type=date.fromisoformat, help='Последний день (ГГГГ-ММ-ДД)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_action_counts(options['start_date'], options['end_date'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Счетчики аудита пересчитаны, строк: {rows}, время: {elapsed:.2f} с'))
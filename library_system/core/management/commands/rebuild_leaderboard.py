@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from borrowings.leaderboard import rebuild_leaderboard
+from core.report_cache import invalidate_reports
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики активности читателей и итоги по ролям из журнала выдач'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        roles = rebuild_leaderboard()
+        invalidate_reports('active_readers')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Счетчики читателей пересчитаны, ролей: {roles}, время: {elapsed:.2f} с'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rankings import WINDOWS, refresh_rankings
+from core.report_cache import invalidate_reports
+from core.rollups import refresh_daily_facts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярности книг, авторов и жанров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            action='append',
+            choices=list(WINDOWS),
+            dest='windows',
+            help='Окно рейтинга (по умолчанию все)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        refresh_daily_facts()
+        stored = refresh_rankings(options['windows'])
+        invalidate_reports('statistics', 'popular_books')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Сохранено позиций рейтинга: {stored}, время: {elapsed:.2f} с'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.recommendations import TOP_N, refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Обновляет рекомендации "с этой книгой также брали" по новым выдачам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n',
+            type=int,
+            default=TOP_N,
+            help='Сколько похожих книг хранить для каждой книги',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рекомендации по всей истории выдач',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pairs, books = refresh_recommendations(top_n=options['top_n'], full=options['full'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Новых пар читатель-книга: {pairs}, пересчитано книг: {books}, время: {elapsed:.2f} с'
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.report_cache import invalidate_reports
+from core.rollups import refresh_daily_facts, refresh_monthly_rollup
+
+
+class Command(BaseCommand):
+    help = 'Обновляет накопительные итоги для отчетов админки'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать все итоги по полной истории',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        added = refresh_monthly_rollup(rebuild=options['rebuild'])
+        facts = refresh_daily_facts(rebuild=options['rebuild'])
+        invalidate_reports('statistics', 'monthly_statistics')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Помесячный итог: учтено новых выдач {added}. '
+            f'Дневные итоги: выдач {facts["loans"]}, возвратов {facts["returns"]}, '
+            f'просрочек {facts["overdues"]}, новых книг {facts["new_books"]}. '
+            f'Время: {elapsed:.2f} с'
+        ))
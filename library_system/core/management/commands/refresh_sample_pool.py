@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.sampling import refresh_available_pool
+
+
+class Command(BaseCommand):
+    help = 'Обновляет пул доступных книг для случайных подборок на главной и в панели читателя'
+
+    def handle(self, *args, **options):
+        ids = refresh_available_pool()
+        self.stdout.write(self.style.SUCCESS(f'Пул случайных книг обновлен: {len(ids)} книг'))
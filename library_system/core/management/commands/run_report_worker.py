@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Обработчик очереди фоновых отчетов (можно запускать несколько экземпляров)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать задания из очереди и завершиться')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Пауза между проверками пустой очереди, с')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Завершиться после стольких заданий (0 - без ограничения)')
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write(self.style.SUCCESS('Обработчик отчетов запущен'))
+
+        try:
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                close_old_connections()
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(f'Возвращено в очередь зависших заданий: {requeued}')
+
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                started = time.perf_counter()
+                self.stdout.write(f'Задание #{job.pk} ({job.kind}) начато')
+                job = run_job(job)
+                processed += 1
+
+                elapsed = time.perf_counter() - started
+                if job.status == 'done':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Задание #{job.pk} готово: {job.rows} строк, {elapsed:.1f} с'
+                    ))
+                elif job.status != 'failed':
+                    self.stdout.write(self.style.WARNING(
+                        f'Задание #{job.pk} возвращено в очередь, пока выполнялось: результат отброшен'
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(
+                        f'Задание #{job.pk} завершилось ошибкой: {job.error.strip().splitlines()[-1]}'
+                    ))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Обработчик отчетов остановлен, выполнено заданий: {processed}'))
@@ -31,5 +31,5 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('Планировщик резервного копирования остановлен'))
 
     def run_backup(self):
-        """Выполняет команду резервного копирования"""
-        call_command('backup_db')
\ No newline at end of file
+        """Выполняет команду резервного копирования (каталог pg_dump: параллельный дамп и восстановление)"""
+        call_command('backup_db', format='directory')
\ No newline at end of file
@@ -0,0 +1,60 @@
+import time
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+# (команда, интервал по умолчанию в минутах, название задачи)
+JOBS = [
+    ('mark_overdue', 15, 'Пометка просроченных выдач'),
+    ('refresh_sample_pool', 5, 'Обновление пула случайных книг'),
+    ('refresh_recommendations', 60, 'Обновление рекомендаций'),
+    ('refresh_rollups', 10, 'Обновление итогов для отчетов'),
+    ('refresh_rankings', 60, 'Обновление рейтингов популярности'),
+    ('rebuild_leaderboard', 1440, 'Сверка счетчиков активности читателей'),
+    ('manage_audit_partitions', 1440, 'Обслуживание секций журнала аудита'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Запускает планировщик периодических задач обслуживания библиотеки'
+
+    def add_arguments(self, parser):
+        for command, interval, name in JOBS:
+            parser.add_argument(
+                f'--{command.replace("_", "-")}-interval',
+                type=int,
+                default=interval,
+                help=f'{name}: интервал в минутах',
+            )
+
+    def handle(self, *args, **options):
+        scheduler = BackgroundScheduler()
+
+        for command, _, name in JOBS:
+            scheduler.add_job(
+                self.run_command,
+                args=[command],
+                trigger=IntervalTrigger(minutes=options[f'{command}_interval']),
+                id=command,
+                name=name,
+                replace_existing=True,
+                coalesce=True,
+                max_instances=1,
+            )
+
+        try:
+            scheduler.start()
+            self.stdout.write(self.style.SUCCESS('Планировщик задач запущен'))
+
+            while True:
+                time.sleep(1)
+
+        except KeyboardInterrupt:
+            scheduler.shutdown()
+            self.stdout.write(self.style.SUCCESS('Планировщик задач остановлен'))
+
+    def run_command(self, name, *args):
+        """Выполняет management-команду из задачи планировщика"""
+        call_command(name, *args)
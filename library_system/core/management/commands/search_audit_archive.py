@@ -0,0 +1,60 @@
+import json
+import time
+from datetime import date, datetime, time as day_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archive import search_archive
+from core.models import AuditLog
+
+
+def _day(value):
+    try:
+        return datetime.combine(date.fromisoformat(value), day_time.min, tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f'Неверная дата: {value} (нужен формат ГГГГ-ММ-ДД)')
+
+
+class Command(BaseCommand):
+    help = 'Ищет записи в архиве журнала аудита, распаковывая только блоки, подходящие по индексу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Id или логин пользователя')
+        parser.add_argument(
+            '--action',
+            action='append',
+            dest='actions',
+            choices=[action for action, _ in AuditLog.ACTION_CHOICES],
+            help='Действие (можно несколько)',
+        )
+        parser.add_argument('--from', dest='date_from', help='С даты ГГГГ-ММ-ДД (UTC)')
+        parser.add_argument('--to', dest='date_to', help='По дату ГГГГ-ММ-ДД включительно (UTC)')
+        parser.add_argument('--archive', help='Каталог архива (по умолчанию AUDIT_ARCHIVE_ROOT)')
+        parser.add_argument('--limit', type=int, default=0, help='Не больше стольких записей (0 - все)')
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            if options['user'].isdigit():
+                user_id = int(options['user'])
+            else:
+                user_id = get_user_model().objects.filter(username=options['user']).values_list('pk', flat=True).first()
+                if user_id is None:
+                    raise CommandError(f'Пользователь {options["user"]} не найден')
+        start = _day(options['date_from']) if options['date_from'] else None
+        end = _day(options['date_to']) + timedelta(days=1) if options['date_to'] else None
+
+        stats = {}
+        found = 0
+        started = time.perf_counter()
+        for row in search_archive(user_id, options['actions'], start, end, options['archive'], stats):
+            self.stdout.write(json.dumps(row, ensure_ascii=False))
+            found += 1
+            if found == options['limit']:
+                break
+
+        self.stderr.write(
+            f'Найдено записей: {found}; распаковано блоков: {stats["blocks_read"]} '
+            f'из {stats["blocks_total"]}; {(time.perf_counter() - started) * 1000:.1f} мс'
+        )
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.analysis import loan_duration_distribution, monthly_active_readers, overdue_rate_by_genre
+from core.snapshot import load_snapshot, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Выгружает журнал выдач в колоночный снимок NumPy для офлайн-анализа'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='snapshots/loans',
+            help='Каталог снимка (старый снимок заменяется целиком)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Размер порции чтения из БД')
+        parser.add_argument(
+            '--summary',
+            action='store_true',
+            help='После выгрузки вывести длительность выдач, просрочки по жанрам и активных читателей',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = write_snapshot(options['output'], chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Снимок {options["output"]}: {rows} выдач, время: {elapsed:.2f} с'))
+
+        if options['summary']:
+            self.print_summary(load_snapshot(options['output']))
+
+    def print_summary(self, snapshot):
+        started = time.perf_counter()
+        durations = loan_duration_distribution(snapshot)
+        genres = overdue_rate_by_genre(snapshot)
+        months = monthly_active_readers(snapshot)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Завершенных выдач: {durations["loans"]}, средняя длительность {durations["mean"]:.1f} дн.')
+        for percentile, days in durations['percentiles'].items():
+            self.stdout.write(f'  p{percentile}: {days:.1f} дн.')
+        for low, high, count in durations['histogram']:
+            self.stdout.write(f'  {low:g}-{high:g} дн.: {count}')
+
+        self.stdout.write('Просрочки по жанрам:')
+        for genre_id, (loans, late, rate) in sorted(genres.items(), key=lambda item: -item[1][2]):
+            name = 'без жанра' if genre_id < 0 else f'жанр {genre_id}'
+            self.stdout.write(f'  {name}: {late} из {loans} ({rate:.1%})')
+
+        self.stdout.write('Активные читатели по месяцам:')
+        for month, readers in months:
+            self.stdout.write(f'  {month}: {readers}')
+
+        self.stdout.write(f'Анализ: {elapsed * 1000:.1f} мс')
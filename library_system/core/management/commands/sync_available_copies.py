@@ -1,14 +1,106 @@
+import time
+
 from django.core.management.base import BaseCommand
-from books.models import Book
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from books.models import Book, BorrowRecord
+from borrowings.models import Borrowing
+
 
 class Command(BaseCommand):
     help = 'Синхронизирует available_copies с фактическими выданными книгами'
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Количество книг, обрабатываемых одним UPDATE',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, не изменяя данные',
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=50,
+            help='Сколько расхождений вывести подробно',
+        )
+
     def handle(self, *args, **options):
-        books = Book.objects.all()
-        for book in books:
-            book.update_availability()
-        
-        self.stdout.write(
-            self.style.SUCCESS('Количество доступных копий успешно синхронизировано')
-        )
\ No newline at end of file
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        started = time.perf_counter()
+
+        bounds = Book.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        checked = mismatched = 0
+        low = bounds['low'] or 0
+        while bounds['high'] is not None and low <= bounds['high']:
+            high = low + chunk_size - 1
+            books, changes = self.sync_chunk(low, high, dry_run)
+            checked += books
+            for book_id, title, available_copies, expected in changes:
+                if mismatched < options['show']:
+                    self.stdout.write(f'  #{book_id} "{title}": {available_copies} -> {expected}')
+                mismatched += 1
+            low = high + 1
+
+        elapsed = time.perf_counter() - started
+        summary = f'Проверено книг: {checked}, расхождений: {mismatched}, время: {elapsed:.2f} с'
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Пробный запуск, изменения не применены. {summary}'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Количество доступных копий успешно синхронизировано. {summary}')
+            )
+
+    def sync_chunk(self, low, high, dry_run):
+        """
+        Пересчитывает книги с id в [low, high] одним UPDATE ... FROM (GROUP BY по журналам выдач).
+
+        Строки книг диапазона сначала блокируются: выдача или возврат, уже
+        списавшие экземпляр, успевают зафиксироваться, и подсчет выдач видит их.
+        Возвращает число книг диапазона и расхождения: [(id, название, было, стало)].
+        """
+        quote = connection.ops.quote_name
+        books = quote(Book._meta.db_table)
+        expected_sql = (
+            f'WITH loans AS ('
+            f'SELECT book_id, count(*) AS n FROM ('
+            f"SELECT book_id FROM {quote(Borrowing._meta.db_table)} "
+            f"WHERE status IN ('active', 'overdue') AND book_id BETWEEN %(low)s AND %(high)s "
+            f'UNION ALL '
+            f'SELECT book_id FROM {quote(BorrowRecord._meta.db_table)} '
+            f'WHERE NOT returned AND book_id BETWEEN %(low)s AND %(high)s'
+            f') AS open_loans GROUP BY book_id), '
+            f'expected AS ('
+            f'SELECT b.id, b.title, b.available_copies AS old, '
+            f'GREATEST(b.total_copies - COALESCE(loans.n, 0), 0) AS new '
+            f'FROM {books} b LEFT JOIN loans ON loans.book_id = b.id '
+            f'WHERE b.id BETWEEN %(low)s AND %(high)s) '
+        )
+        params = {'low': low, 'high': high}
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {books} WHERE id BETWEEN %(low)s AND %(high)s' + ('' if dry_run else ' FOR UPDATE'),
+                params,
+            )
+            checked = cursor.rowcount
+            if dry_run:
+                cursor.execute(
+                    expected_sql + 'SELECT id, title, old, new FROM expected WHERE old IS DISTINCT FROM new ORDER BY id',
+                    params,
+                )
+                return checked, cursor.fetchall()
+
+            cursor.execute(
+                expected_sql
+                + f'UPDATE {books} SET available_copies = expected.new FROM expected '
+                f'WHERE {books}.id = expected.id AND {books}.available_copies IS DISTINCT FROM expected.new '
+                f'RETURNING expected.id, expected.title, expected.old, expected.new',
+                params,
+            )
+            return checked, sorted(cursor.fetchall())
@@ -0,0 +1,26 @@
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_highwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyBorrowingStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Месяц')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество выдач')),
+            ],
+            options={
+                'verbose_name': 'Выдачи за месяц',
+                'verbose_name_plural': 'Выдачи по месяцам',
+                'ordering': ['month'],
+            },
+        ),
+    ]
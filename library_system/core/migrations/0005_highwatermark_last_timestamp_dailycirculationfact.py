@@ -0,0 +1,40 @@
+
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_bookcooccurrence_booksimilarity'),
+        ('core', '0004_monthlyborrowingstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='highwatermark',
+            name='last_timestamp',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Обработано по время'),
+        ),
+        migrations.CreateModel(
+            name='DailyCirculationFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('role', models.CharField(blank=True, default='', max_length=10, verbose_name='Роль читателя')),
+                ('loans', models.IntegerField(default=0, verbose_name='Выдачи')),
+                ('returns', models.IntegerField(default=0, verbose_name='Возвраты')),
+                ('overdues', models.IntegerField(default=0, verbose_name='Просрочки')),
+                ('new_books', models.IntegerField(default=0, verbose_name='Новые книги')),
+                ('book', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='books.book', verbose_name='Книга')),
+                ('genre', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='books.genre', verbose_name='Жанр')),
+            ],
+            options={
+                'verbose_name': 'Дневной итог обращения',
+                'verbose_name_plural': 'Дневные итоги обращения',
+                'indexes': [models.Index(fields=['book', 'date'], name='daily_fact_book_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'book', 'role'), name='daily_fact_date_book_role_uniq')],
+            },
+        ),
+    ]
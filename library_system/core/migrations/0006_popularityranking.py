@@ -0,0 +1,35 @@
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_highwatermark_last_timestamp_dailycirculationfact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('7', '7 дней'), ('30', '30 дней'), ('365', 'Год'), ('all', 'Все время')], max_length=3, verbose_name='Окно')),
+                ('kind', models.CharField(choices=[('book', 'Книга'), ('author', 'Автор'), ('genre', 'Жанр')], max_length=6, verbose_name='Тип')),
+                ('rank', models.PositiveIntegerField(verbose_name='Место')),
+                ('object_id', models.BigIntegerField(null=True, verbose_name='Id объекта')),
+                ('name', models.CharField(blank=True, max_length=200, verbose_name='Название')),
+                ('author_name', models.CharField(blank=True, max_length=200, verbose_name='Автор')),
+                ('genre_name', models.CharField(blank=True, max_length=100, verbose_name='Жанр')),
+                ('loans', models.IntegerField(verbose_name='Выдачи')),
+                ('books', models.IntegerField(default=1, verbose_name='Книг')),
+                ('computed_at', models.DateTimeField(verbose_name='Рассчитано')),
+            ],
+            options={
+                'verbose_name': 'Позиция рейтинга',
+                'verbose_name_plural': 'Рейтинги популярности',
+                'ordering': ['window', 'kind', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('window', 'kind', 'rank'), name='popularity_window_kind_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,126 @@
+
+
+from django.conf import settings
+from django.db import migrations
+
+# Журнал аудита переводится в таблицу, секционированную по месяцам timestamp.
+# Секции создаются за все месяцы с данными и на три месяца вперед, дальше их
+# создает и удаляет команда manage_audit_partitions. Имена таблиц, внешнего
+# ключа и индексов берутся из состояния моделей, как их построил бы Django.
+PARTITION_SQL = """
+ALTER TABLE {table} RENAME TO {old_table};
+
+CREATE TABLE {table} (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    action varchar(20) NOT NULL,
+    description text NOT NULL,
+    ip_address inet NULL,
+    "timestamp" timestamp with time zone NOT NULL,
+    user_id bigint NOT NULL,
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp");
+
+DO $$
+DECLARE
+    month timestamptz;
+    last_month timestamptz := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + interval '3 months';
+BEGIN
+    SELECT date_trunc('month', COALESCE(min("timestamp"), now()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    INTO month FROM {old_table};
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            {table_name} || '_p' || to_char(month AT TIME ZONE 'UTC', 'YYYYMM'),
+            {table_name}, month, month + interval '1 month'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END $$;
+"""
+
+UNPARTITION_SQL = """
+ALTER TABLE {table} RENAME TO {old_table};
+
+CREATE TABLE {table} (
+    id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    action varchar(20) NOT NULL,
+    description text NOT NULL,
+    ip_address inet NULL,
+    "timestamp" timestamp with time zone NOT NULL,
+    user_id bigint NOT NULL
+);
+"""
+
+COPY_SQL = """
+INSERT INTO {table} (id, action, description, ip_address, "timestamp", user_id)
+OVERRIDING SYSTEM VALUE
+SELECT id, action, description, ip_address, "timestamp", user_id FROM {old_table};
+SELECT setval(pg_get_serial_sequence({table_name}, 'id'), COALESCE(max(id), 0) + 1, false) FROM {table};
+DROP TABLE {old_table};
+
+ALTER TABLE {table} ADD CONSTRAINT {fk_name}
+    FOREIGN KEY (user_id) REFERENCES {users_table} (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX {user_index} ON {table} (user_id);
+"""
+
+# Индексы модели, которые секционированная таблица не сохраняет (их заменяет первичный ключ и индекс FK)
+DROPPED_INDEXES = ['core_auditl_timesta_189a84_idx', 'core_auditl_user_id_2ff9b7_idx']
+
+
+def _rebuild(apps, schema_editor, create_sql, old_suffix, indexes):
+    AuditLog = apps.get_model('core', 'AuditLog')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    quote = schema_editor.quote_name
+    table = AuditLog._meta.db_table
+    names = {
+        'table': quote(table),
+        'table_name': schema_editor.quote_value(table),
+        'old_table': quote(f'{table}_{old_suffix}'),
+        'users_table': quote(User._meta.db_table),
+        'fk_name': str(schema_editor._fk_constraint_name(
+            AuditLog, AuditLog._meta.get_field('user'), '_fk_%(to_table)s_%(to_column)s',
+        )),
+        'user_index': quote(schema_editor._create_index_name(table, ['user_id'])),
+    }
+    schema_editor.execute(create_sql.format(**names), params=None)
+    schema_editor.execute(COPY_SQL.format(**names), params=None)
+    for index in AuditLog._meta.indexes:
+        if index.name in indexes:
+            schema_editor.add_index(AuditLog, index)
+
+
+def partition_auditlog(apps, schema_editor):
+    AuditLog = apps.get_model('core', 'AuditLog')
+    kept = [index.name for index in AuditLog._meta.indexes if index.name not in DROPPED_INDEXES]
+    _rebuild(apps, schema_editor, PARTITION_SQL, 'plain', kept)
+
+
+def unpartition_auditlog(apps, schema_editor):
+    AuditLog = apps.get_model('core', 'AuditLog')
+    _rebuild(apps, schema_editor, UNPARTITION_SQL, 'partitioned', [index.name for index in AuditLog._meta.indexes])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_reportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_auditlog, unpartition_auditlog),
+            ],
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='auditlog',
+                    name='core_auditl_timesta_189a84_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='auditlog',
+                    name='core_auditl_user_id_2ff9b7_idx',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_action_counts(apps, schema_editor):
+    AuditLog = apps.get_model('core', 'AuditLog')
+    AuditActionCount = apps.get_model('core', 'AuditActionCount')
+    AuditActionCount.objects.bulk_create(
+        AuditActionCount(**row)
+        for row in AuditLog.objects.annotate(date=TruncDate('timestamp'))
+        .values('date', 'action')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_auditlog_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditActionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('action', models.CharField(choices=[('login', 'Вход в систему'), ('logout', 'Выход из системы'), ('borrow', 'Выдача книги'), ('return', 'Возврат книги'), ('add_book', 'Добавление книги'), ('edit_book', 'Редактирование книги'), ('delete_book', 'Удаление книги'), ('add_user', 'Добавление пользователя'), ('edit_user', 'Редактирование пользователя'), ('view_report', 'Просмотр отчета')], max_length=20, verbose_name='Действие')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Событий')),
+            ],
+            options={
+                'verbose_name': 'Событий аудита за день',
+                'verbose_name_plural': 'Счетчики событий аудита',
+                'constraints': [models.UniqueConstraint(fields=('date', 'action'), name='audit_action_count_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_action_counts, migrations.RunPython.noop),
+    ]
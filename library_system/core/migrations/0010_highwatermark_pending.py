@@ -0,0 +1,18 @@
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_audit_action_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='highwatermark',
+            name='pending',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Пропуски и недавно учтенные строки'),
+        ),
+    ]
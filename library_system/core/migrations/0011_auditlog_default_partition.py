@@ -0,0 +1,37 @@
+
+
+from django.db import migrations
+
+# Секция по умолчанию принимает события, для месяца которых секции еще нет;
+# manage_audit_partitions переносит их в созданную секцию месяца.
+
+
+def create_default_partition(apps, schema_editor):
+    table = apps.get_model('core', 'AuditLog')._meta.db_table
+    schema_editor.execute(
+        f'CREATE TABLE {schema_editor.quote_name(f"{table}_default")} '
+        f'PARTITION OF {schema_editor.quote_name(table)} DEFAULT'
+    )
+
+
+def drop_default_partition(apps, schema_editor):
+    table = apps.get_model('core', 'AuditLog')._meta.db_table
+    default = schema_editor.quote_name(f'{table}_default')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default})')
+        if cursor.fetchone()[0]:
+            raise RuntimeError(
+                f'В секции {table}_default есть события: сначала перенесите их командой manage_audit_partitions'
+            )
+    schema_editor.execute(f'DROP TABLE {default}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_highwatermark_pending'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_partition, drop_default_partition),
+    ]
@@ -1,3 +1,8 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -23,12 +28,255 @@ class AuditLog(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
+        # В PostgreSQL таблица секционирована по месяцам timestamp (core.partitions),
+        # первичный ключ на уровне БД - (id, timestamp). Индекс по user создает ForeignKey.
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id'], name='auditlog_timestamp_id_idx'),
             models.Index(fields=['action']),
-            models.Index(fields=['user']),
         ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.get_action_display()} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.user.username} - {self.get_action_display()} - {self.timestamp}"
+
+class AuditActionCount(models.Model):
+    """
+    Число событий аудита за день по действию; пополняется при записи журнала (core.audit).
+
+    События, удаленные мимо журнала аудита (каскадом вместе с пользователем),
+    из счетчиков не вычитаются: разошедшиеся счетчики пересчитывает команда
+    rebuild_audit_counts.
+    """
+    date = models.DateField(verbose_name='Дата')
+    action = models.CharField(max_length=20, choices=AuditLog.ACTION_CHOICES, verbose_name='Действие')
+    count = models.BigIntegerField(default=0, verbose_name='Событий')
+
+    class Meta:
+        verbose_name = 'Событий аудита за день'
+        verbose_name_plural = 'Счетчики событий аудита'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'action'], name='audit_action_count_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.action}: {self.count}"
+
+class HighWaterMark(models.Model):
+    """Последний обработанный id (или момент времени) источника для инкрементальных фоновых задач"""
+    name = models.CharField(max_length=100, unique=True, verbose_name='Задача')
+    last_id = models.BigIntegerField(default=0, verbose_name='Последний обработанный id')
+    last_timestamp = models.DateTimeField(null=True, blank=True, verbose_name='Обработано по время')
+    pending = models.JSONField(default=dict, blank=True, verbose_name='Пропуски и недавно учтенные строки')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Отметка обработки'
+        verbose_name_plural = 'Отметки обработки'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+    @classmethod
+    def lock(cls, name):
+        """Отметка с блокировкой строки до конца транзакции (одновременно работает один обработчик)"""
+        cls.objects.get_or_create(name=name)
+        return cls.objects.select_for_update().get(name=name)
+
+    @staticmethod
+    def safety_lag():
+        """Сколько ждать строку, id которой уже выдан, но транзакция еще не зафиксирована"""
+        return timedelta(seconds=getattr(settings, 'HIGH_WATER_MARK_LAG', 300))
+
+    def reset(self):
+        self.last_id = 0
+        self.last_timestamp = None
+        self.pending = {}
+
+    def gaps(self):
+        """Ожидаемые пропуски ниже отметки: [(первый id, последний id, когда замечен)]"""
+        return [(low, high, datetime.fromisoformat(seen)) for low, high, seen in self.pending.get('gaps', [])]
+
+    def counted(self):
+        """Фильтр строк, уже учтенных по отметке: id не выше last_id, кроме ожидаемых пропусков"""
+        return models.Q(pk__lte=self.last_id) & ~_id_ranges(self.gaps())
+
+    def claim(self, queryset, now=None):
+        """
+        Забирает еще не учтенные строки queryset и сдвигает отметку; возвращает их фильтр или None.
+
+        Id выдается до фиксации транзакции, поэтому строка с меньшим id может
+        стать видна позже строк с большими. Диапазоны недостающих id ниже
+        отметки запоминаются в pending и проверяются при следующих запусках,
+        пока не пройдет safety_lag(): после этого пропуск считается откатом или
+        удалением. Фильтр описывает ровно увиденные строки, даже если пропуск
+        заполнится до следующего запроса. Отметку сохраняет вызывающий в той же транзакции.
+        """
+        now = now or timezone.now()
+        gaps = self.gaps()
+        ids = sorted(
+            queryset.filter(models.Q(pk__gt=self.last_id) | _id_ranges(gaps))
+            .order_by()
+            .values_list('pk', flat=True)
+        )
+        filled = ids[:bisect_right(ids, self.last_id)]
+        fresh = ids[len(filled):]
+        claimed = models.Q(pk__in=filled)
+
+        # Заполненные id делят свои пропуски на части
+        remaining = []
+        for low, high, seen in gaps:
+            for pk in filled[bisect_left(filled, low):bisect_right(filled, high)]:
+                if pk > low:
+                    remaining.append((low, pk - 1, seen))
+                low = pk + 1
+            if low <= high:
+                remaining.append((low, high, seen))
+
+        if fresh:
+            missing, previous = [], self.last_id
+            for pk in fresh:
+                if pk > previous + 1:
+                    missing.append((previous + 1, pk - 1, now))
+                previous = pk
+            claimed |= models.Q(pk__gt=self.last_id, pk__lte=fresh[-1]) & ~_id_ranges(missing)
+            remaining.extend(missing)
+            self.last_id = fresh[-1]
+
+        expired = now - self.safety_lag()
+        self.pending['gaps'] = [[low, high, seen.isoformat()] for low, high, seen in remaining if seen > expired]
+        return claimed if ids else None
+
+
+def _id_ranges(ranges):
+    """Фильтр по диапазонам id [(первый, последний, ...)]; пустой Q, если диапазонов нет"""
+    condition = models.Q()
+    for low, high, *_ in ranges:
+        condition |= models.Q(pk__range=(low, high))
+    return condition
+
+
+class MonthlyBorrowingStat(models.Model):
+    """Накопительный итог выдач по месяцам для отчета monthly_statistics_view"""
+    month = models.DateField(unique=True, verbose_name='Месяц')
+    count = models.IntegerField(default=0, verbose_name='Количество выдач')
+
+    class Meta:
+        ordering = ['month']
+        verbose_name = 'Выдачи за месяц'
+        verbose_name_plural = 'Выдачи по месяцам'
+
+    def __str__(self):
+        return f"{self.month:%m/%Y}: {self.count}"
+
+
+class DailyCirculationFact(models.Model):
+    """Дневные итоги обращения фонда по книге и роли читателя для отчетов админки"""
+    date = models.DateField(verbose_name='Дата')
+    book = models.ForeignKey(
+        'books.Book', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name='Книга'
+    )
+    genre = models.ForeignKey(
+        'books.Genre', on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+', verbose_name='Жанр'
+    )
+    # Пустая роль - строки о поступлении книг, не связанные с читателем
+    role = models.CharField(max_length=10, blank=True, default='', verbose_name='Роль читателя')
+    loans = models.IntegerField(default=0, verbose_name='Выдачи')
+    returns = models.IntegerField(default=0, verbose_name='Возвраты')
+    overdues = models.IntegerField(default=0, verbose_name='Просрочки')
+    new_books = models.IntegerField(default=0, verbose_name='Новые книги')
+
+    class Meta:
+        verbose_name = 'Дневной итог обращения'
+        verbose_name_plural = 'Дневные итоги обращения'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'book', 'role'], name='daily_fact_date_book_role_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['book', 'date'], name='daily_fact_book_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} #{self.book_id} ({self.role or '-'})"
+
+
+class PopularityRanking(models.Model):
+    """Предрассчитанный рейтинг книг, авторов и жанров по числу выдач за скользящее окно"""
+    WINDOW_CHOICES = [
+        ('7', '7 дней'),
+        ('30', '30 дней'),
+        ('365', 'Год'),
+        ('all', 'Все время'),
+    ]
+    KIND_CHOICES = [
+        ('book', 'Книга'),
+        ('author', 'Автор'),
+        ('genre', 'Жанр'),
+    ]
+
+    window = models.CharField(max_length=3, choices=WINDOW_CHOICES, verbose_name='Окно')
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES, verbose_name='Тип')
+    rank = models.PositiveIntegerField(verbose_name='Место')
+    object_id = models.BigIntegerField(null=True, verbose_name='Id объекта')
+    name = models.CharField(max_length=200, blank=True, verbose_name='Название')
+    author_name = models.CharField(max_length=200, blank=True, verbose_name='Автор')
+    genre_name = models.CharField(max_length=100, blank=True, verbose_name='Жанр')
+    loans = models.IntegerField(verbose_name='Выдачи')
+    books = models.IntegerField(default=1, verbose_name='Книг')
+    computed_at = models.DateTimeField(verbose_name='Рассчитано')
+
+    class Meta:
+        ordering = ['window', 'kind', 'rank']
+        verbose_name = 'Позиция рейтинга'
+        verbose_name_plural = 'Рейтинги популярности'
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'kind', 'rank'], name='popularity_window_kind_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_window_display()} / {self.get_kind_display()} #{self.rank}: {self.name}"
+
+
+def report_results_storage():
+    """Закрытое хранилище результатов отчетов (не раздается как MEDIA)"""
+    return FileSystemStorage(location=settings.REPORT_RESULTS_ROOT)
+
+
+class ReportJob(models.Model):
+    """Фоновое формирование тяжелого отчета; результат сохраняется в файл"""
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готов'),
+        ('failed', 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=30, verbose_name='Отчет')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='Готовность, %')
+    rows = models.IntegerField(default=0, verbose_name='Строк')
+    result = models.FileField(storage=report_results_storage, upload_to='reports/%Y/%m/', blank=True, verbose_name='Файл')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_by = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Заказчик',
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начат')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний признак жизни')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершен')
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name = 'Задание на отчет'
+        verbose_name_plural = 'Задания на отчеты'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='report_job_pending_idx', condition=models.Q(status='pending')),
+            models.Index(fields=['-created_at', '-id'], name='report_job_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} ({self.get_status_display()})"
@@ -0,0 +1,180 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.http import QueryDict
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder округляет время до миллисекунд; ключ курсора должен совпадать с сохраненным точно"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class InvalidCursor(ValueError):
+    """Курсор пагинации поврежден или не соответствует сортировке"""
+
+
+class CursorPage:
+    """Страница курсорной пагинации: без общего количества, только соседние страницы"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, params=None, cursor_param='cursor'):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params
+        self._cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _querystring(self, cursor):
+        params = self._params.copy() if self._params is not None else QueryDict(mutable=True)
+        params.pop('page', None)
+        params[self._cursor_param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring(self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_querystring(self):
+        return self._querystring(self.previous_cursor) if self.has_previous else ''
+
+
+class CursorPaginator:
+    """
+    Курсорная (keyset) пагинация по индексированным ключам сортировки.
+
+    Вместо OFFSET и COUNT(*) следующая страница выбирается условием
+    "строго после последней записи" по ключам ordering, поэтому стоимость
+    любой страницы одинакова. Последний ключ должен быть уникальным (обычно id).
+    """
+
+    def __init__(self, queryset, ordering, per_page, cursor_param='cursor'):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.cursor_param = cursor_param
+        self.fields = [(key.lstrip('-'), key.startswith('-')) for key in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [self._value(obj, field) for field, _ in self.fields]
+        payload = json.dumps({'d': direction, 'k': values}, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction, values = payload['d'], payload['k']
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(str(e))
+        if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor('Курсор не соответствует сортировке')
+        try:
+            values = [self._key_field(field).to_python(value) for (field, _), value in zip(self.fields, values)]
+        except (ValidationError, ValueError, TypeError) as e:
+            raise InvalidCursor(str(e))
+        if None in values:
+            raise InvalidCursor('Пустое значение ключа сортировки')
+        return direction, values
+
+    def _key_field(self, path):
+        """Поле модели или аннотации, по которому сортирует ключ path"""
+        annotations = self.queryset.query.annotations
+        if path in annotations:
+            return annotations[path].output_field
+        opts = self.queryset.model._meta
+        *relations, name = path.split(LOOKUP_SEP)
+        try:
+            for relation in relations:
+                opts = opts.get_field(relation).related_model._meta
+            return opts.pk if name == 'pk' else opts.get_field(name)
+        except (FieldDoesNotExist, AttributeError) as e:
+            raise InvalidCursor(str(e))
+
+    def _value(self, obj, field):
+        for part in field.split(LOOKUP_SEP):
+            obj = getattr(obj, part)
+        return obj
+
+    def _seek_filter(self, values, reverse):
+        """
+        Условие (a, b, c) > (x, y, z) с учетом направления сортировки каждого ключа.
+
+        Цепочку OR дополняет условие a >= x: по нему Postgres начинает
+        упорядоченный просмотр индекса сразу с позиции курсора.
+        """
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        (first_field, descending), first_value = self.fields[0], values[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{first_field}__{lookup}': first_value}) & condition
+
+    def get_page(self, cursor=None, params=None):
+        """Возвращает страницу после (или перед) позицией cursor; некорректный курсор ведет на первую страницу"""
+        direction, values = 'next', None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = 'next', None
+
+        reverse = direction == 'prev'
+        if reverse:
+            ordering = [key[1:] if key.startswith('-') else f'-{key}' for key in self.ordering]
+        else:
+            ordering = self.ordering
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        has_next, has_previous = has_next and bool(rows), has_previous and bool(rows)
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_previous else None
+
+        return CursorPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+            params=params,
+            cursor_param=self.cursor_param,
+        )
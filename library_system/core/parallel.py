@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Общий ограниченный пул потоков для независимых запросов отчетов.
+
+    У каждого потока свое соединение с БД, поэтому размер пула
+    (REPORT_QUERY_WORKERS) ограничивает и число дополнительных соединений.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_QUERY_WORKERS', 4),
+                thread_name_prefix='report-query',
+            )
+    return _executor
+
+
+def _call(func):
+    # Потоки пула живут дольше запроса: как и обработчик запроса, закрываем
+    # устаревшие (CONN_MAX_AGE) и неисправные соединения до и после задачи
+    close_old_connections()
+    try:
+        return func()
+    except DatabaseError:
+        # Соединение потока могло оборваться: следующая задача откроет новое
+        connection.close()
+        raise
+    finally:
+        close_old_connections()
+
+
+async def gather_queries(queries):
+    """Выполняет независимые запросы словаря имя -> функция параллельно в пуле потоков"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    results = await asyncio.gather(*(loop.run_in_executor(executor, _call, query) for query in queries.values()))
+    return dict(zip(queries, results))
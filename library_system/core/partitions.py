@@ -0,0 +1,129 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AuditActionCount, AuditLog
+
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_start(value, months=0):
+    """Начало месяца value (в UTC), сдвинутого на months месяцев"""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{AuditLog._meta.db_table}_p{month:%Y%m}'
+
+
+def audit_partitions():
+    """Секции журнала аудита: [(имя, начало, конец)] по возрастанию начала"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) '
+            'FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [AuditLog._meta.db_table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound)
+        if match:
+            start, end = (datetime.fromisoformat(value) for value in match.groups())
+            partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def default_partition_name():
+    return f'{AuditLog._meta.db_table}_default'
+
+
+def _default_months():
+    """Месяцы событий, попавших в секцию по умолчанию"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') "
+            f'FROM {connection.ops.quote_name(default_partition_name())}'
+        )
+        return [month_start(row[0].replace(tzinfo=dt_timezone.utc)) for row in cursor.fetchall()]
+
+
+def create_partition(start):
+    """
+    Создает секцию месяца start и переносит в нее события месяца из секции по умолчанию.
+
+    Секция по умолчанию блокируется до конца переноса: иначе новое событие
+    месяца, записанное в нее между переносом и созданием секции, помешало бы
+    ее создать.
+    """
+    table = connection.ops.quote_name(AuditLog._meta.db_table)
+    default = connection.ops.quote_name(default_partition_name())
+    name = partition_name(start)
+    bounds = [start, month_start(start, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {default} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE audit_moved ON COMMIT DROP AS '
+            f'SELECT * FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s',
+            bounds,
+        )
+        cursor.execute(f'DELETE FROM {default} WHERE "timestamp" >= %s AND "timestamp" < %s', bounds)
+        cursor.execute(
+            f'CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {table} '
+            f"FOR VALUES FROM ('{bounds[0].isoformat()}') TO ('{bounds[1].isoformat()}')"
+        )
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM audit_moved')
+        moved = cursor.rowcount
+        cursor.execute('DROP TABLE audit_moved')
+    return name, moved
+
+
+def ensure_partitions(ahead=None, now=None):
+    """
+    Создает недостающие секции с текущего месяца на ahead месяцев вперед, а также
+    для месяцев, события которых попали в секцию по умолчанию; возвращает [(имя, перенесено событий)].
+    """
+    ahead = getattr(settings, 'AUDIT_PARTITIONS_AHEAD', 3) if ahead is None else ahead
+    current = month_start(now or timezone.now())
+    existing = {start for _, start, _ in audit_partitions()}
+    months = {month_start(current, offset) for offset in range(ahead + 1)}
+    months.update(_default_months())
+    return [create_partition(start) for start in sorted(months - existing)]
+
+
+def expired_partitions(retention_months=None, now=None):
+    """Секции, целиком старше срока хранения в retention_months месяцев"""
+    if retention_months is None:
+        retention_months = getattr(settings, 'AUDIT_RETENTION_MONTHS', 24)
+    cutoff = month_start(now or timezone.now(), -retention_months)
+    return [partition for partition in audit_partitions() if partition[2] <= cutoff]
+
+
+def drop_partition(name, start, end, expected_rows=None):
+    """
+    Отсоединяет и удаляет секцию [start, end) целиком вместе с ее дневными счетчиками.
+
+    В отличие от DELETE по строкам не оставляет мертвых строк и не нагружает
+    индексы: это операции над каталогом, блокировка родителя короткая.
+    expected_rows - число строк, сверенное с архивом: если после отсоединения
+    в секции оказалось иначе, удаление откатывается с ValueError.
+    """
+    table = connection.ops.quote_name(AuditLog._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {connection.ops.quote_name(name)}')
+        if expected_rows is not None:
+            cursor.execute(f'SELECT count(*) FROM {connection.ops.quote_name(name)}')
+            rows = cursor.fetchone()[0]
+            if rows != expected_rows:
+                raise ValueError(f'В секции {name} {rows} строк, в архиве {expected_rows}')
+        cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
+        AuditActionCount.objects.filter(
+            date__gte=timezone.localdate(start),
+            date__lt=timezone.localdate(end),
+        ).delete()
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import DailyCirculationFact, PopularityRanking
+
+# Окно рейтинга -> число дней (None - вся история)
+WINDOWS = {'7': 7, '30': 30, '365': 365, 'all': None}
+TOP_BOOKS = 20
+TOP_AUTHORS = 10
+
+
+def _window_facts(days, today):
+    facts = DailyCirculationFact.objects.filter(loans__gt=0)
+    if days is not None:
+        facts = facts.filter(date__gt=today - timedelta(days=days))
+    return facts
+
+
+def compute_window(window, today=None, now=None):
+    """Строки рейтинга книг, авторов и жанров для одного окна из таблицы дневных итогов"""
+    today = today or timezone.now().date()
+    now = now or timezone.now()
+    facts = _window_facts(WINDOWS[window], today)
+
+    books = (
+        facts.values('book_id')
+        .annotate(
+            total=Sum('loans'),
+            title=F('book__title'),
+            author=F('book__author__name'),
+            genre=F('book__genre__name'),
+        )
+        .order_by('-total', 'book_id')[:TOP_BOOKS]
+    )
+    authors = (
+        facts.values('book__author_id')
+        .annotate(total=Sum('loans'), books=Count('book_id', distinct=True), author=F('book__author__name'))
+        .order_by('-total', 'book__author_id')[:TOP_AUTHORS]
+    )
+    genres = (
+        facts.values('genre_id')
+        .annotate(total=Sum('loans'), books=Count('book_id', distinct=True), genre=F('genre__name'))
+        .order_by('-total', 'genre_id')
+    )
+
+    rankings = []
+    for rank, row in enumerate(books, start=1):
+        rankings.append(PopularityRanking(
+            window=window, kind='book', rank=rank, object_id=row['book_id'],
+            name=row['title'] or '', author_name=row['author'] or '', genre_name=row['genre'] or '',
+            loans=row['total'], books=1, computed_at=now,
+        ))
+    for rank, row in enumerate(authors, start=1):
+        rankings.append(PopularityRanking(
+            window=window, kind='author', rank=rank, object_id=row['book__author_id'],
+            name=row['author'] or '', loans=row['total'], books=row['books'], computed_at=now,
+        ))
+    for rank, row in enumerate(genres, start=1):
+        rankings.append(PopularityRanking(
+            window=window, kind='genre', rank=rank, object_id=row['genre_id'],
+            name=row['genre'] or 'Без жанра', loans=row['total'], books=row['books'], computed_at=now,
+        ))
+    return rankings
+
+
+def refresh_rankings(windows=None):
+    """Пересчитывает рейтинги популярности; каждое окно заменяется атомарно"""
+    windows = windows or list(WINDOWS)
+    today = timezone.now().date()
+    now = timezone.now()
+    stored = 0
+    for window in windows:
+        rankings = compute_window(window, today, now)
+        with transaction.atomic():
+            PopularityRanking.objects.filter(window=window).delete()
+            PopularityRanking.objects.bulk_create(rankings)
+        stored += len(rankings)
+    return stored
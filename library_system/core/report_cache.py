@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+# Поколения и блокировки пересчета работают только в общем для процессов кэше (CACHES)
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+
+# Счетчики исходов ведутся в памяти процесса: запись в общий кэш на каждый запрос
+# стоила бы нескольких SQL-запросов к таблице кэша
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _timeout():
+    return getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+
+
+def _stale_timeout():
+    return getattr(settings, 'REPORT_CACHE_STALE_TIMEOUT', 3600)
+
+
+def _key(name, params):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'reports:{name}:{digest}'
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        _stats[name, outcome] += 1
+
+
+def _generation_key(name):
+    return f'reports:generation:{name}'
+
+
+def current_generation(name):
+    return cache.get_or_set(_generation_key(name), 0, None)
+
+
+def invalidate_reports(*names):
+    """
+    Помечает устаревшими закэшированные результаты отчетов names; сами значения
+    остаются для отдачи во время пересчета. Вызывается командами, обновившими
+    таблицы, из которых читают отчеты; отчеты по живым таблицам устаревают по сроку.
+    """
+    for name in names:
+        key = _generation_key(name)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def _store(key, value, generation):
+    cache.set(key, (value, time.time() + _timeout(), generation), _stale_timeout())
+
+
+def _lookup(name, key, lock_key, generation):
+    """
+    Состояние записи кэша: ('hit' | 'stale', значение), ('compute', None), если
+    пересчитывать должен текущий запрос, или ('wait', None), если значения нет,
+    а пересчет уже идет.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, entry_generation = entry
+        if expires_at > time.time() and entry_generation == generation:
+            _count(name, 'hit')
+            return 'hit', value
+        if not cache.add(lock_key, True, LOCK_TIMEOUT):
+            _count(name, 'stale')
+            return 'stale', value
+        return 'compute', None
+    if cache.add(lock_key, True, LOCK_TIMEOUT):
+        return 'compute', None
+    return 'wait', None
+
+
+def _poll(name, key, lock_key):
+    """Проверка при ожидании чужого пересчета: (готово, значение)"""
+    entry = cache.get(key)
+    if entry is not None:
+        _count(name, 'hit')
+        return True, entry[0]
+    # Блокировка снята без результата (ошибка пересчета): считаем сами
+    return cache.get(lock_key) is None, None
+
+
+def _finish(name, key, lock_key, value, generation):
+    _store(key, value, generation)
+    cache.delete(lock_key)
+    _count(name, 'miss')
+
+
+def cached_report(name, params, compute):
+    """
+    Результат отчета name с параметрами params из кэша.
+
+    Свежее значение отдается сразу (hit). Устаревшее - по сроку REPORT_CACHE_TIMEOUT
+    или после invalidate_reports(name) - пересчитывает только запрос, захвативший
+    блокировку, остальные получают прежнее значение (stale). Если значения нет
+    совсем, ожидающие запросы ждут результата пересчета до LOCK_TIMEOUT секунд.
+    Возвращает (значение, исход).
+    """
+    key = _key(name, params)
+    lock_key = f'{key}:lock'
+    generation = current_generation(name)
+
+    state, value = _lookup(name, key, lock_key, generation)
+    if state in ('hit', 'stale'):
+        return value, state
+    if state == 'wait':
+        deadline = time.time() + LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            done, value = _poll(name, key, lock_key)
+            if done and value is not None:
+                return value, 'hit'
+            if done:
+                break
+
+    try:
+        value = compute()
+    except BaseException:
+        cache.delete(lock_key)
+        raise
+    _finish(name, key, lock_key, value, generation)
+    return value, 'miss'
+
+
+async def acached_report(name, params, compute):
+    """Асинхронный вариант cached_report: compute - корутинная функция, ожидание не блокирует цикл событий"""
+    key = _key(name, params)
+    lock_key = f'{key}:lock'
+    generation = await sync_to_async(current_generation)(name)
+
+    state, value = await sync_to_async(_lookup)(name, key, lock_key, generation)
+    if state in ('hit', 'stale'):
+        return value, state
+    if state == 'wait':
+        deadline = time.time() + LOCK_TIMEOUT
+        while time.time() < deadline:
+            await asyncio.sleep(WAIT_INTERVAL)
+            done, value = await sync_to_async(_poll)(name, key, lock_key)
+            if done and value is not None:
+                return value, 'hit'
+            if done:
+                break
+
+    try:
+        value = await compute()
+    except BaseException:
+        await cache.adelete(lock_key)
+        raise
+    await sync_to_async(_finish)(name, key, lock_key, value, generation)
+    return value, 'miss'
+
+
+def report_cache_stats(name):
+    """Счетчики попаданий, промахов и выдач устаревших значений для отчета в текущем процессе"""
+    with _stats_lock:
+        stats = {outcome: _stats[name, outcome] for outcome in ('hit', 'miss', 'stale')}
+    requests = sum(stats.values())
+    stats['hit_rate'] = round(100 * (stats['hit'] + stats['stale']) / requests) if requests else 0
+    return stats
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from books.models import Book
+from borrowings.leaderboard import overdue_readers, role_totals, top_readers
+from borrowings.models import Borrowing
+from .counts import estimated_count
+from .models import DailyCirculationFact
+
+
+def run_queries(queries):
+    """Последовательно выполняет запросы словаря имя -> функция"""
+    return {name: query() for name, query in queries.items()}
+
+
+def statistics_queries(start_date, end_date):
+    """Независимые запросы отчета за период; дневные итоги должны быть уже обновлены"""
+    User = get_user_model()
+    facts = DailyCirculationFact.objects.filter(date__range=[start_date, end_date])
+
+    return {
+        'books_stats': lambda: Book.objects.filter(
+            pk__in=facts.filter(new_books__gt=0).values('book_id')
+        ).aggregate(
+            total=Count('id'),
+            available=Count('id', filter=Q(available_copies__gt=0)),
+            borrowed=Count('id', filter=Q(available_copies=0)),
+        ),
+        'borrowing_stats': lambda: facts.aggregate(
+            total_borrowings=Coalesce(Sum('loans'), 0),
+            returned=Coalesce(Sum('returns'), 0),
+            overdue=Coalesce(Sum('overdues'), 0),
+        ),
+        'total_books': lambda: estimated_count(Book.objects.all())[0],
+        'total_users': lambda: estimated_count(User.objects.all())[0],
+        'total_borrowings': lambda: estimated_count(Borrowing.objects.all())[0],
+    }
+
+
+def statistics_result(results):
+    return {
+        'books_stats': results['books_stats'],
+        'borrowing_stats': results['borrowing_stats'],
+        'total_stats': {
+            'total_books': results['total_books'],
+            'total_users': results['total_users'],
+            'total_borrowings': results['total_borrowings'],
+        },
+    }
+
+
+def active_readers_queries():
+    """Независимые запросы отчета об активных читателях"""
+    return {
+        'active_readers': lambda: top_readers(20),
+        'role_stats': role_totals,
+        'readers_with_overdue': lambda: overdue_readers(10),
+    }
@@ -0,0 +1,168 @@
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from borrowings.models import Borrowing
+from .models import DailyCirculationFact, HighWaterMark, MonthlyBorrowingStat
+
+MONTHLY_MARK = 'rollup:monthly_borrowings'
+
+
+def refresh_monthly_rollup(rebuild=False):
+    """
+    Добавляет в помесячный итог выдачи, появившиеся после прошлого обновления.
+
+    Новые строки выбираются по id выше отметки (индекс первичного ключа) вместе
+    с пропусками, которые еще могли зафиксироваться (HighWaterMark.claim), и
+    группируются одним запросом с TruncMonth. Запускается планировщиком, отчеты
+    только читают итог. Возвращает число учтенных выдач.
+    """
+    with transaction.atomic():
+        mark = HighWaterMark.lock(MONTHLY_MARK)
+        if rebuild:
+            MonthlyBorrowingStat.objects.all().delete()
+            mark.reset()
+
+        claimed = mark.claim(Borrowing.objects.all())
+        added = 0
+        if claimed is not None:
+            months = (
+                Borrowing.objects.filter(claimed)
+                .order_by()
+                .annotate(month=TruncMonth('borrowed_date'))
+                .values('month')
+                .annotate(count=Count('id'))
+            )
+            for row in months:
+                month = row['month'].date()
+                updated = MonthlyBorrowingStat.objects.filter(month=month).update(count=F('count') + row['count'])
+                if not updated:
+                    MonthlyBorrowingStat.objects.create(month=month, count=row['count'])
+                added += row['count']
+
+        mark.save(update_fields=['last_id', 'pending', 'updated_at'])
+    return added
+
+
+FACT_MEASURES = ['loans', 'returns', 'overdues', 'new_books']
+FACT_LOANS_MARK = 'facts:loans'
+FACT_BOOKS_MARK = 'facts:new_books'
+FACT_EVENTS_MARK = 'facts:returns_overdues'
+
+
+def _add_facts(facts, rows, measure):
+    """Складывает сгруппированные строки (date, book_id, genre_id, role, count) в словарь приращений"""
+    for date, book_id, genre_id, role, count in rows:
+        key = (date, book_id, role or '')
+        entry = facts.setdefault(key, {**dict.fromkeys(FACT_MEASURES, 0), 'genre_id': genre_id})
+        entry[measure] += count
+
+
+def _apply_facts(facts, batch_size=1000):
+    """Прибавляет приращения к таблице дневных итогов через INSERT ... ON CONFLICT"""
+    table = connection.ops.quote_name(DailyCirculationFact._meta.db_table)
+    columns = ['date', 'book_id', 'genre_id', 'role'] + FACT_MEASURES
+    updates = ', '.join(f'{name} = {table}.{name} + EXCLUDED.{name}' for name in FACT_MEASURES)
+    items = list(facts.items())
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            params = []
+            for (date, book_id, role), entry in batch:
+                params.extend([date, book_id, entry['genre_id'], role] + [entry[name] for name in FACT_MEASURES])
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES {placeholders} '
+                f'ON CONFLICT (date, book_id, role) DO UPDATE SET {updates}, genre_id = EXCLUDED.genre_id',
+                params,
+            )
+
+
+def _grouped(queryset, date_field):
+    return (
+        queryset.order_by()
+        .annotate(day=TruncDate(date_field))
+        .values_list('day', 'book_id', 'book__genre_id', 'user__role')
+        .annotate(count=Count('id'))
+    )
+
+
+def _claim_events(mark, key, queryset, field, now):
+    """
+    События queryset по времени field, еще не учтенные отметкой mark.
+
+    Окно начинается за safety_lag() до прошлого запуска, поэтому событие из
+    транзакции, зафиксированной позже, все равно попадает в окно; учтенные
+    в этом хвосте строки хранятся в pending[key] и повторно не считаются.
+    """
+    settled = now - HighWaterMark.safety_lag()
+    counted = {pk: datetime.fromisoformat(at) for pk, at in mark.pending.get(key, [])}
+    window = Q(**{f'{field}__lte': now})
+    if mark.last_timestamp:
+        window &= Q(**{f'{field}__gt': mark.last_timestamp - HighWaterMark.safety_lag()})
+
+    events = queryset.filter(window).exclude(pk__in=list(counted))
+    recent = dict(events.filter(**{f'{field}__gt': settled}).values_list('pk', field))
+    counted.update(recent)
+    mark.pending[key] = [[pk, at.isoformat()] for pk, at in counted.items() if at > settled]
+    return events.filter(Q(**{f'{field}__lte': settled}) | Q(pk__in=list(recent)))
+
+
+def refresh_daily_facts(now=None, rebuild=False):
+    """
+    Дописывает в таблицу дневных итогов события, появившиеся после прошлого запуска.
+
+    Выдачи и новые книги отслеживаются по id (HighWaterMark.claim), возвраты и
+    просрочки - по времени события (returned_date и due_date) с перекрытием
+    окон. Запускается планировщиком и фоновыми отчетами, страницы только
+    читают итоги. Возвращает словарь с числом учтенных событий.
+    """
+    from books.models import Book
+
+    now = now or timezone.now()
+    facts = {}
+    totals = dict.fromkeys(FACT_MEASURES, 0)
+
+    with transaction.atomic():
+        loans_mark = HighWaterMark.lock(FACT_LOANS_MARK)
+        books_mark = HighWaterMark.lock(FACT_BOOKS_MARK)
+        events_mark = HighWaterMark.lock(FACT_EVENTS_MARK)
+        if rebuild:
+            DailyCirculationFact.objects.all().delete()
+            for mark in (loans_mark, books_mark, events_mark):
+                mark.reset()
+
+        claimed = loans_mark.claim(Borrowing.objects.all(), now=now)
+        if claimed is not None:
+            _add_facts(facts, _grouped(Borrowing.objects.filter(claimed), 'borrowed_date'), 'loans')
+
+        claimed = books_mark.claim(Book.objects.all(), now=now)
+        if claimed is not None:
+            new_books = (
+                Book.objects.filter(claimed)
+                .order_by()
+                .annotate(day=TruncDate('created_at'))
+                .values_list('day', 'id', 'genre_id', Value(''))
+                .annotate(count=Count('id'))
+            )
+            _add_facts(facts, new_books, 'new_books')
+
+        returns = _claim_events(events_mark, 'returns', Borrowing.objects.all(), 'returned_date', now)
+        _add_facts(facts, _grouped(returns, 'returned_date'), 'returns')
+        overdue = Borrowing.objects.filter(Q(returned_date__isnull=True) | Q(returned_date__gt=F('due_date')))
+        overdue = _claim_events(events_mark, 'overdues', overdue, 'due_date', now)
+        _add_facts(facts, _grouped(overdue, 'due_date'), 'overdues')
+        events_mark.last_timestamp = now
+
+        _apply_facts(facts)
+        for mark in (loans_mark, books_mark, events_mark):
+            mark.save(update_fields=['last_id', 'last_timestamp', 'pending', 'updated_at'])
+
+    for entry in facts.values():
+        for name in FACT_MEASURES:
+            totals[name] += entry[name]
+    return totals
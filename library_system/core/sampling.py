@@ -0,0 +1,95 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+
+from books.models import Book
+from .counts import table_estimates
+
+POOL_CACHE_KEY = 'sampling:available_books'
+SAMPLE_RANGES = 8
+
+
+def _pool_size():
+    return getattr(settings, 'SAMPLE_POOL_SIZE', 500)
+
+
+def _random_ranges(count, ranges=SAMPLE_RANGES):
+    """
+    До count id доступных книг из ranges отрезков, начинающихся со случайных id.
+
+    Каждый отрезок читается по первичному ключу с LIMIT, без сортировки
+    каталога; отрезок, упершийся в конец таблицы, добирается с ее начала.
+    """
+    bounds = Book.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    available = Book.objects.filter(available_copies__gt=0).order_by('id').values_list('id', flat=True)
+    per_range = max(1, count // ranges)
+    ids = set()
+    for _ in range(ranges):
+        start = random.randint(bounds['low'], bounds['high'])
+        chunk = list(available.filter(id__gte=start)[:per_range])
+        if len(chunk) < per_range:
+            chunk += available.filter(id__lt=start)[:per_range - len(chunk)]
+        ids.update(chunk)
+    return list(ids)
+
+
+def refresh_available_pool():
+    """
+    Пересобирает пул id доступных книг для случайной выборки.
+
+    На больших таблицах пул набирается через TABLESAMPLE BERNOULLI без
+    сортировки всего каталога. Строки выборки идут в физическом порядке,
+    поэтому вся выборка перемешивается и только потом обрезается до размера
+    пула. Если доступных книг мало и выборка оказалась мала, пул добирается
+    отрезками от случайных id. Небольшой каталог читается целиком.
+
+    Пул хранится без срока: запросы отдают прежний пул, пока его не заменит
+    следующий запуск refresh_sample_pool.
+    """
+    pool_size = _pool_size()
+    table = Book._meta.db_table
+    estimated = table_estimates(Book)[Book] or 0
+
+    if estimated > pool_size * 10:
+        # С запасом, т.к. часть строк отсеется по доступности
+        percent = min(100.0, pool_size * 4 * 100.0 / estimated)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {connection.ops.quote_name(table)} TABLESAMPLE BERNOULLI (%s) '
+                f'WHERE available_copies > 0',
+                [percent],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) < pool_size // 2:
+            ids = list(set(ids).union(_random_ranges(pool_size)))
+    else:
+        ids = list(Book.objects.filter(available_copies__gt=0).values_list('id', flat=True)[:pool_size * 10])
+    random.shuffle(ids)
+    ids = ids[:pool_size]
+
+    cache.set(POOL_CACHE_KEY, ids, None)
+    return ids
+
+
+def sample_available_books(k):
+    """Возвращает до k случайных доступных книг, выбирая из заранее собранного пула за O(k)"""
+    pool = cache.get(POOL_CACHE_KEY)
+    if pool is None:
+        # Пул еще не собран (первый запуск или очищенный кэш): временный пул из
+        # нескольких отрезков, его заменит фоновое обновление
+        pool = _random_ranges(_pool_size(), ranges=4)
+        cache.add(POOL_CACHE_KEY, pool, None)
+
+    # Берем кандидатов с запасом: часть книг могла закончиться после сборки пула
+    candidates = random.sample(pool, min(len(pool), k * 2))
+    books = Book.objects.filter(
+        pk__in=candidates,
+        available_copies__gt=0,
+    ).select_related('author', 'genre').in_bulk()
+
+    return [books[pk] for pk in candidates if pk in books][:k]
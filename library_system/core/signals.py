@@ -0,0 +1,32 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from books.models import Book
+from . import audit
+
+
+@receiver(user_logged_in)
+def audit_login(sender, request, user, **kwargs):
+    audit.record('login', user, 'Вход в систему', request)
+
+
+@receiver(user_logged_out)
+def audit_logout(sender, request, user, **kwargs):
+    audit.record('logout', user, 'Выход из системы', request)
+
+
+@receiver(post_save, sender=Book)
+def audit_book_save(sender, instance, created, raw=False, **kwargs):
+    """Добавление и правка книг пользователем; массовые загрузки вне запросов не журналируются"""
+    actor = audit.current_actor()
+    if actor is not None and not raw:
+        action = 'add_book' if created else 'edit_book'
+        audit.record(action, actor, f'{instance.title} (#{instance.pk})')
+
+
+@receiver(post_delete, sender=Book)
+def audit_book_delete(sender, instance, **kwargs):
+    actor = audit.current_actor()
+    if actor is not None:
+        audit.record('delete_book', actor, f'{instance.title} (#{instance.pk})')
@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+
+SNAPSHOT_VERSION = 1
+STATUS_CODES = {'active': 0, 'returned': 1, 'overdue': 2}
+NAT = np.iinfo(np.int64).min
+
+# Колонка -> тип в файле; время хранится в секундах, отсутствующее значение - NaT
+COLUMNS = {
+    'id': np.int64,
+    'book_id': np.int64,
+    'user_id': np.int64,
+    'genre_id': np.int64,
+    'borrowed': 'datetime64[s]',
+    'due': 'datetime64[s]',
+    'returned': 'datetime64[s]',
+    'status': np.int8,
+}
+
+
+def _epoch(column):
+    return f'COALESCE(EXTRACT(EPOCH FROM {column})::bigint, {NAT})'
+
+
+def _select_sql():
+    loans = connection.ops.quote_name(Borrowing._meta.db_table)
+    books = connection.ops.quote_name(Book._meta.db_table)
+    status = ' '.join(f"WHEN '{name}' THEN {code}" for name, code in STATUS_CODES.items())
+    return (
+        f'SELECT l.id, l.book_id, l.user_id, COALESCE(b.genre_id, -1), '
+        f'{_epoch("l.borrowed_date")}, {_epoch("l.due_date")}, {_epoch("l.returned_date")}, '
+        f'CASE l.status {status} ELSE -1 END '
+        f'FROM {loans} l LEFT JOIN {books} b ON b.id = l.book_id '
+        f'WHERE l.id <= %s ORDER BY l.id'
+    )
+
+
+def write_snapshot(path, chunk_size=50000):
+    """
+    Выгружает журнал выдач в колоночные файлы .npy в каталоге path.
+
+    Строки читаются серверным курсором порциями и пишутся прямо в файлы,
+    открытые через memmap, так что в памяти держится только одна порция.
+    Снимок собирается во временном каталоге и публикуется через _publish.
+    Возвращает число строк.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix=f'.{os.path.basename(path)}-', dir=parent)
+
+    try:
+        # REPEATABLE READ: подсчет и выгрузка видят один и тот же снимок данных
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute(f'SELECT COALESCE(MAX(id), 0), COUNT(*) FROM {connection.ops.quote_name(Borrowing._meta.db_table)}')
+                max_id, rows = cursor.fetchone()
+
+            files = {
+                name: np.lib.format.open_memmap(
+                    os.path.join(workdir, f'{name}.npy'), mode='w+', dtype=dtype, shape=(rows,),
+                )
+                for name, dtype in COLUMNS.items()
+            }
+
+            offset = 0
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(_select_sql(), [max_id])
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    data = np.array(chunk, dtype=np.int64)
+                    end = offset + len(data)
+                    for index, column in enumerate(files.values()):
+                        values = data[:, index]
+                        column[offset:end] = values.view(column.dtype) if column.dtype.kind == 'M' else values
+                    offset = end
+
+        for column in files.values():
+            column.flush()
+        del files
+
+        with open(os.path.join(workdir, 'meta.json'), 'w', encoding='utf-8') as meta:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'rows': offset,
+                'max_id': max_id,
+                'created_at': timezone.now().isoformat(),
+                'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+                'status_codes': STATUS_CODES,
+            }, meta, ensure_ascii=False, indent=2)
+
+        os.chmod(workdir, 0o755)
+        _publish(path, workdir)
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return offset
+
+
+def _publish(path, workdir):
+    """
+    Делает собранный каталог текущей версией снимка.
+
+    path - символическая ссылка на каталог версии, она подменяется одним
+    os.replace: читатель всегда видит старый или новый снимок целиком.
+    Предыдущая версия остается для уже открытых снимков, более старые удаляются.
+    """
+    parent, name = os.path.split(path)
+    prefix = f'.{name}.'
+    version = os.path.join(parent, f'{prefix}{timezone.now():%Y%m%d%H%M%S%f}')
+    os.rename(workdir, version)
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Снимок, записанный прежней версией команды, - обычный каталог
+        os.rename(path, os.path.join(parent, f'{prefix}0'))
+
+    link = f'{version}.link'
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+
+    versions = sorted(
+        entry for entry in os.listdir(parent)
+        if entry.startswith(prefix) and not os.path.islink(os.path.join(parent, entry))
+    )
+    for entry in versions[:-2]:
+        shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+class LoanSnapshot:
+    """Снимок журнала выдач: колонки открываются через memmap при первом обращении"""
+
+    def __init__(self, path):
+        # Каталог версии, а не ссылка: колонки, открытые позже, берутся из того же снимка
+        self.path = os.path.realpath(path)
+        with open(os.path.join(self.path, 'meta.json'), encoding='utf-8') as meta:
+            self.meta = json.load(meta)
+        if self.meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f'Неподдерживаемая версия снимка: {self.meta.get("version")}')
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in COLUMNS:
+            raise AttributeError(name)
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+
+def load_snapshot(path):
+    return LoanSnapshot(path)
@@ -1,2 +1,455 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from books.models import Author, Book, BorrowRecord
+from books.search import search_books
+from borrowings.models import Borrowing
+from borrowings.services import checkout
+from core.admin import library_admin
+from core.analysis import loan_duration_distribution, monthly_active_readers, overdue_rate_by_genre
+from core.archive import archive_partition, search_archive, verify_archive
+from core.audit import AuditWriter, rebuild_action_counts
+from core.dashboard import compute_global_stats
+from core.models import AuditActionCount, AuditLog, HighWaterMark
+from core.pagination import CursorPaginator
+from core.report_cache import cached_report, invalidate_reports
+from core.sampling import POOL_CACHE_KEY, refresh_available_pool, sample_available_books
+from core.snapshot import SNAPSHOT_VERSION, LoanSnapshot
+from core.rollups import refresh_daily_facts
+from core.partitions import audit_partitions, ensure_partitions, month_start, partition_name
+
+User = get_user_model()
+
+
+class DashboardQueryCountTests(TestCase):
+    """Количество запросов панелей не должно расти с объемом данных"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin_user', password='pass', role='admin')
+        cls.librarian = User.objects.create_user('librarian_user', password='pass', role='librarian')
+        cls.reader = User.objects.create_user('reader_user', password='pass', role='reader')
+
+        author = Author.objects.create(name='Автор')
+        books = [Book.objects.create(title=f'Книга {i}', author=author, total_copies=2) for i in range(5)]
+        for i, book in enumerate(books):
+            BorrowRecord.objects.create(
+                user=cls.reader,
+                book=book,
+                due_date=timezone.now() + timedelta(days=-1 if i % 2 else 7),
+            )
+
+    def setUp(self):
+        cache.clear()
+        # Пул случайных книг собирает фоновая задача refresh_sample_pool
+        refresh_available_pool()
+
+    def assertDashboardQueries(self, user, url_name, cold, warm):
+        self.client.force_login(user)
+        with self.assertNumQueries(cold):
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(warm):
+            self.client.get(reverse(url_name))
+        return response
+
+    def test_admin_dashboard(self):
+        # сессия + пользователь + чтение кэша + оценки размеров таблиц + 3 агрегата
+        # + запись в таблицу кэша (подсчет строк, точка сохранения, проверка ключа, вставка);
+        # с прогретым кэшем - сессия, пользователь и чтение кэша
+        response = self.assertDashboardQueries(self.admin, 'core:dashboard', cold=13, warm=3)
+        self.assertEqual(response.context['total_users'], 3)
+        self.assertEqual(response.context['total_books'], 5)
+        self.assertEqual(response.context['active_borrowings_count'], 5)
+        self.assertEqual(response.context['overdue_borrowings_count'], 2)
+        self.assertEqual(response.context['readers_count'], 1)
+
+    def test_librarian_dashboard(self):
+        # + список последних выдач
+        self.assertDashboardQueries(self.librarian, 'core:dashboard', cold=14, warm=4)
+
+    def test_reader_dashboard(self):
+        # + личный агрегат, текущие выдачи, рекомендации, чтение пула и добор случайных книг
+        response = self.assertDashboardQueries(self.reader, 'core:reader_dashboard', cold=18, warm=8)
+        self.assertEqual(response.context['user_borrowings_count'], 5)
+        self.assertEqual(response.context['user_overdue_count'], 2)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=3)
+    def test_large_table_counts_marked(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Book._meta.db_table}')
+        stats = compute_global_stats()
+        # Вся таблица - по статистике, с условием - точно до порога
+        self.assertEqual((stats['total_books'], stats['count_marks']['total_books']), (5, '≈'))
+        self.assertEqual((stats['available_books'], stats['count_marks']['available_books']), (3, '≥'))
+
+
+class SamplingTests(TestCase):
+    """Случайные книги без сортировки каталога, пул живет до следующего обновления"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cold_pool_without_random_sort(self):
+        author = Author.objects.create(name='Автор')
+        books = [Book.objects.create(title=f'Книга {i}', author=author, total_copies=1) for i in range(20)]
+        Book.objects.filter(pk__in=[book.pk for book in books[::2]]).update(available_copies=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            sample = sample_available_books(4)
+        self.assertEqual(len(sample), 4)
+        self.assertTrue(all(book.available_copies > 0 for book in sample))
+        self.assertFalse(any('RANDOM()' in query['sql'] for query in queries))
+
+        pool = cache.get(POOL_CACHE_KEY)
+        self.assertEqual(sorted(pool), sorted(book.pk for book in books[1::2]))
+        self.assertEqual(sorted(refresh_available_pool()), sorted(pool))
+
+
+class ImportBooksTests(TestCase):
+    """Повторный импорт находит книги с ISBN в любом написании и не уводит доступные копии ниже нуля"""
+
+    def test_reimport_matches_hyphenated_isbn(self):
+        book = Book.objects.create(title='Книга', author=Author.objects.create(name='Автор'),
+                                   isbn='0-306-40615-2', total_copies=3)
+        Book.objects.filter(pk=book.pk).update(available_copies=1)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as source:
+            source.write('title,author,isbn,total_copies\nКнига,Автор,0306406152,1\n')
+            source.flush()
+            call_command('import_books', source.name, stdout=io.StringIO())
+
+        self.assertEqual(Book.objects.count(), 1)
+        book.refresh_from_db()
+        self.assertEqual((book.total_copies, book.available_copies), (1, 0))
+
+
+class AuditWriterTests(TestCase):
+    """События аудита пишутся пачками и только после фиксации транзакции"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user('audit_reader', password='pass', role='reader')
+        cls.book = Book.objects.create(title='Книга', author=Author.objects.create(name='Автор'), total_copies=2)
+
+    def test_flush_writes_batches(self):
+        writer = AuditWriter(batch_size=2)
+        for _ in range(5):
+            writer.put(AuditLog(user=self.reader, action='login', description='Вход в систему'))
+        writer.flush()
+        self.assertEqual(writer.stats()['written'], 5)
+        self.assertEqual(AuditLog.objects.filter(user=self.reader, action='login').count(), 5)
+        self.assertEqual(AuditActionCount.objects.get(date=timezone.localdate(), action='login').count, 5)
+
+    def test_failed_batch_retried_in_parts(self):
+        writer = AuditWriter(batch_size=4)
+        for minutes in range(3):
+            writer.put(AuditLog(user=self.reader, action='login', description='Вход в систему',
+                                timestamp=timezone.now() - timedelta(minutes=minutes)))
+        # Нарушает NOT NULL: не записывается только это событие
+        writer.put(AuditLog(user=self.reader, action='logout', description=None, timestamp=timezone.now()))
+        with self.assertLogs('core.audit', 'WARNING') as logs:
+            writer.flush()
+        self.assertEqual(writer.stats()['written'], 3)
+        self.assertEqual(writer.stats()['failed'], 1)
+        self.assertEqual(AuditLog.objects.filter(user=self.reader, action='login').count(), 3)
+        self.assertTrue(any('не записано' in line for line in logs.output))
+
+    def test_unavailable_database_retries_whole_batch(self):
+        writer = AuditWriter(batch_size=4, retry_delay=0)
+        for _ in range(3):
+            writer.put(AuditLog(user=self.reader, action='login', description='Вход в систему'))
+        bulk_create = AuditLog.objects.bulk_create
+        attempts = []
+
+        def flaky_bulk_create(batch, **kwargs):
+            attempts.append(len(batch))
+            if len(attempts) == 1:
+                raise OperationalError('соединение потеряно')
+            return bulk_create(batch, **kwargs)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', flaky_bulk_create), self.assertLogs('core.audit', 'WARNING'):
+            writer.flush()
+        self.assertEqual(attempts, [3, 3])
+        self.assertEqual(writer.stats()['written'], 3)
+        self.assertEqual(writer.stats()['failed'], 0)
+
+    def test_full_queue_drops_events(self):
+        writer = AuditWriter(max_size=1, enqueue_timeout=0)
+        entry = AuditLog(user=self.reader, action='login', description='Вход в систему')
+        self.assertTrue(writer.put(entry))
+        # Отброшенные события сводятся в одно сообщение за drop_log_interval
+        with self.assertLogs('core.audit', 'WARNING') as logs:
+            for _ in range(3):
+                self.assertFalse(writer.put(entry))
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(writer.stats()['dropped'], 3)
+
+    def test_event_queued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            checkout(BorrowRecord(user=self.reader, book=self.book, due_date=timezone.now()))
+        self.assertEqual(len(callbacks), 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                checkout(BorrowRecord(user=self.reader, book=self.book, due_date=timezone.now()))
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+
+
+class AuditLogViewTests(TestCase):
+    """Журнал аудита: счетчики действий из дневных итогов, число запросов не зависит от объема"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('audit_admin', password='pass', role='admin', is_staff=True)
+        cls.reader = User.objects.create_user('audit_reader', last_name='Иванов', password='pass')
+        writer = AuditWriter()
+        for user, action in [(cls.admin, 'login'), (cls.reader, 'login'), (cls.reader, 'borrow')]:
+            writer.put(AuditLog(user=user, action=action, description='-'))
+        writer.flush()
+
+    def get(self, view, query=''):
+        request = RequestFactory().get(f'/audit-log/{query}')
+        request.user = self.admin
+        return view(request)
+
+    def test_action_counts(self):
+        # страница журнала + дневные счетчики
+        with self.assertNumQueries(2):
+            response = self.get(library_admin.audit_log_view)
+        self.assertContains(response, 'Выдача книги')
+        self.assertContains(response, 'audit_reader')
+
+        # для одного пользователя: страница, счетчики по его записям, логин
+        with self.assertNumQueries(3):
+            self.get(library_admin.audit_log_view, f'?user={self.reader.pk}&action=borrow')
+
+    def test_user_lookup(self):
+        response = self.get(library_admin.audit_log_users_view, '?q=ИВА')
+        self.assertEqual([user['username'] for user in json.loads(response.content)['results']], ['audit_reader'])
+
+    def test_rebuild_after_cascade(self):
+        today = timezone.localdate()
+        self.reader.delete()
+        self.assertEqual(AuditActionCount.objects.get(date=today, action='login').count, 2)
+
+        rebuild_action_counts(today, today)
+        self.assertEqual(
+            dict(AuditActionCount.objects.filter(date=today).values_list('action', 'count')),
+            {'login': 1},
+        )
+
+
+class AuditArchiveTests(TestCase):
+    """Поиск в архиве распаковывает только блоки нужного пользователя"""
+
+    def test_search_by_user(self):
+        users = [User.objects.create_user(f'archived_{i}') for i in range(3)]
+        AuditLog.objects.bulk_create(
+            AuditLog(user=users[i % 3], action='borrow' if i % 2 else 'login', description=str(i))
+            for i in range(30)
+        )
+        start = month_start(timezone.now())
+        with tempfile.TemporaryDirectory() as root:
+            rows = archive_partition(partition_name(start), start, month_start(start, 1), root, block_rows=5)
+            self.assertEqual(rows, 30)
+
+            stats = {}
+            rows = list(search_archive(users[1].pk, ['borrow'], root=root, stats=stats))
+        self.assertEqual(sorted(int(row['description']) for row in rows), [1, 7, 13, 19, 25])
+        self.assertEqual(stats, {'blocks_read': 2, 'blocks_total': 6})
+
+    def test_verify_against_partition(self):
+        user = User.objects.create_user('verified_user')
+        AuditLog.objects.bulk_create(AuditLog(user=user, action='login', description=str(i)) for i in range(10))
+        start = month_start(timezone.now())
+        name = partition_name(start)
+        with tempfile.TemporaryDirectory() as root:
+            archive_partition(name, start, month_start(start, 1), root, block_rows=4)
+            self.assertEqual(verify_archive(name, root), AuditLog.objects.filter(timestamp__gte=start).count())
+
+            AuditLog.objects.create(user=user, action='logout', description='После выгрузки')
+            with self.assertRaises(ValueError):
+                verify_archive(name, root)
+
+
+class AuditPartitionTests(TestCase):
+    """Событие месяца без секции попадает в секцию по умолчанию и переносится при ее создании"""
+
+    def test_default_partition_split(self):
+        user = User.objects.create_user('partitioned_user')
+        old = month_start(timezone.now(), -60)
+        AuditLog.objects.create(user=user, action='login', description='Старое событие', timestamp=old)
+
+        created = ensure_partitions()
+        self.assertIn((partition_name(old), 1), created)
+        self.assertIn(partition_name(old), [name for name, _, _ in audit_partitions()])
+        self.assertEqual(AuditLog.objects.filter(user=user, timestamp=old).count(), 1)
+
+
+class HighWaterMarkTests(TestCase):
+    """Строки, зафиксированные позже строк с большими id, не теряются"""
+
+    def test_late_row_below_mark_is_claimed(self):
+        now = timezone.now()
+        mark = HighWaterMark.lock('test:authors')
+        Author.objects.bulk_create([Author(pk=1001, name='Первый'), Author(pk=1003, name='Третий')])
+
+        claimed = mark.claim(Author.objects.all(), now=now)
+        self.assertEqual(sorted(Author.objects.filter(claimed).values_list('pk', flat=True)), [1001, 1003])
+        self.assertEqual(mark.last_id, 1003)
+        self.assertFalse(Author.objects.filter(mark.counted(), pk=1002).exists())
+
+        Author.objects.create(pk=1002, name='Второй')
+        claimed = mark.claim(Author.objects.all(), now=now + timedelta(seconds=1))
+        self.assertEqual(list(Author.objects.filter(claimed).values_list('pk', flat=True)), [1002])
+        self.assertIsNone(mark.claim(Author.objects.all(), now=now + timedelta(seconds=2)))
+
+    def test_gap_expires_after_lag(self):
+        now = timezone.now()
+        mark = HighWaterMark.lock('test:authors')
+        Author.objects.bulk_create([Author(pk=2001, name='Первый'), Author(pk=2003, name='Третий')])
+        mark.claim(Author.objects.all(), now=now)
+        self.assertEqual(mark.gaps()[-1][:2], (2002, 2002))
+
+        mark.claim(Author.objects.all(), now=now + HighWaterMark.safety_lag())
+        self.assertEqual(mark.gaps(), [])
+
+
+class ReportCacheTests(TestCase):
+    """Отчет устаревает после обновления своих итогов, а не после каждой выдачи"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_per_report(self):
+        reader = User.objects.create_user('cache_reader', password='pass', role='reader')
+        book = Book.objects.create(title='Книга', author=Author.objects.create(name='Автор'), total_copies=2)
+        cached_report('monthly_statistics', {}, lambda: 1)
+        cached_report('popular_books', {}, lambda: 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Borrowing.objects.create(user=reader, book=book, due_date=timezone.now() + timedelta(days=7))
+        self.assertEqual(cached_report('monthly_statistics', {}, lambda: 2), (1, 'hit'))
+
+        invalidate_reports('monthly_statistics')
+        self.assertEqual(cached_report('monthly_statistics', {}, lambda: 2), (2, 'miss'))
+        self.assertEqual(cached_report('popular_books', {}, lambda: 2), (1, 'hit'))
+
+
+class DailyFactsTests(TestCase):
+    """Возврат, зафиксированный после запуска пересчета, учитывается ровно один раз"""
+
+    def test_late_return_counted_once(self):
+        reader = User.objects.create_user('facts_reader', password='pass', role='reader')
+        book = Book.objects.create(title='Книга', author=Author.objects.create(name='Автор'), total_copies=2)
+        now = timezone.now()
+        first, second = Borrowing.objects.bulk_create([
+            Borrowing(user=reader, book=book, due_date=now + timedelta(days=7)) for _ in range(2)
+        ])
+
+        Borrowing.objects.filter(pk=first.pk).update(returned_date=now - timedelta(seconds=30))
+        self.assertEqual(refresh_daily_facts(now=now)['returns'], 1)
+
+        # Возврат с временем до прошлого запуска, ставший видимым после него
+        Borrowing.objects.filter(pk=second.pk).update(returned_date=now - timedelta(seconds=10))
+        self.assertEqual(refresh_daily_facts(now=now + timedelta(minutes=1))['returns'], 1)
+        self.assertEqual(refresh_daily_facts(now=now + timedelta(minutes=2))['returns'], 0)
+
+
+class CursorPaginatorTests(TestCase):
+    """Курсор должен точно воспроизводить ключи: равные ранги и время с микросекундами"""
+
+    def walk(self, paginator):
+        seen, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            seen.extend(obj.pk for obj in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_sub_millisecond_timestamps(self):
+        user = User.objects.create_user('cursor_user')
+        moment = timezone.now().replace(microsecond=123000)
+        logs = AuditLog.objects.bulk_create(
+            AuditLog(user=user, action='login', description=str(i), timestamp=moment + timedelta(microseconds=i % 4))
+            for i in range(10)
+        )
+        paginator = CursorPaginator(AuditLog.objects.all(), ['-timestamp', '-id'], 3)
+        self.assertEqual(sorted(self.walk(paginator)), sorted(log.pk for log in logs))
+
+    def test_equal_search_rank(self):
+        author = Author.objects.create(name='Автор')
+        books = [Book.objects.create(title='Одинаковое название', author=author) for _ in range(30)]
+        paginator = CursorPaginator(search_books(Book.objects.all(), 'одинаковое'), ['-rank', 'title', 'id'], 12)
+        self.assertEqual(sorted(self.walk(paginator)), sorted(book.pk for book in books))
+
+    def test_malformed_values_fall_back_to_first_page(self):
+        user = User.objects.create_user('cursor_user')
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=Book.objects.create(title='Книга', author=Author.objects.create(name='Автор'), total_copies=1),
+            due_date=timezone.now(),
+        )
+        paginator = CursorPaginator(Borrowing.objects.all(), ['due_date', 'id'], 10)
+        for values in (['abc', 1], [None, 1], [1, 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'d': 'next', 'k': values}).encode()).decode()
+            page = paginator.get_page(cursor)
+            self.assertEqual([obj.pk for obj in page], [borrowing.pk])
+            self.assertFalse(page.has_previous)
+
+
+class LoanAnalysisTests(SimpleTestCase):
+    """Векторные расчеты по снимку на небольших известных массивах"""
+
+    def setUp(self):
+        nat = np.datetime64('NaT', 's')
+        columns = {
+            'id': np.arange(1, 6, dtype=np.int64),
+            'book_id': np.array([10, 11, 12, 13, 14], dtype=np.int64),
+            'user_id': np.array([1, 1, 2, 2, 2], dtype=np.int64),
+            'genre_id': np.array([-1, 4, 4, -1, 2], dtype=np.int64),
+            'borrowed': np.array(['2026-01-05', '2026-01-10', '2026-01-20', '2026-02-01', '2026-02-03'], dtype='datetime64[s]'),
+            'due': np.array(['2026-01-19', '2026-01-24', '2026-02-03', '2026-02-15', '2026-02-17'], dtype='datetime64[s]'),
+            'returned': np.array(
+                [np.datetime64('2026-01-08', 's'), np.datetime64('2026-01-25', 's'), nat,
+                 np.datetime64('2026-03-15', 's'), np.datetime64('2026-02-03T12:00', 's')],
+            ),
+            'status': np.array([1, 1, 0, 1, 1], dtype=np.int8),
+        }
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, values in columns.items():
+            np.save(os.path.join(directory.name, f'{name}.npy'), values)
+        with open(os.path.join(directory.name, 'meta.json'), 'w', encoding='utf-8') as meta:
+            json.dump({'version': SNAPSHOT_VERSION, 'rows': 5, 'created_at': '2026-03-01T00:00:00+00:00'}, meta)
+        self.snapshot = LoanSnapshot(directory.name)
+
+    def test_duration_histogram(self):
+        result = loan_duration_distribution(self.snapshot, bins=(0, 7, 14, 30))
+        self.assertEqual(result['loans'], 4)
+        self.assertAlmostEqual(result['mean'], (3 + 15 + 42 + 0.5) / 4)
+        self.assertEqual([count for _, _, count in result['histogram']], [2, 0, 1, 1])
+
+    def test_genre_without_genre_bucket(self):
+        rates = overdue_rate_by_genre(self.snapshot)
+        self.assertEqual(rates, {-1: (2, 1, 0.5), 2: (1, 0, 0.0), 4: (2, 2, 1.0)})
+
+    def test_monthly_distinct_readers(self):
+        self.assertEqual(monthly_active_readers(self.snapshot), [('2026-01', 2), ('2026-02', 1)])
@@ -5,6 +5,8 @@ app_name = 'core'
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/async/', views.dashboard_async, name='dashboard_async'),
     path('reader-dashboard/', views.reader_dashboard, name='reader_dashboard'),
+    path('reader-dashboard/async/', views.reader_dashboard_async, name='reader_dashboard_async'),
     path('', views.index, name='index')
 ]
@@ -1,21 +1,91 @@
-from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
-from django.contrib.auth import get_user_model
-from books.models import Book, BorrowRecord
-from django.utils import timezone
-from users.models import User
+import asyncio
 
-User = get_user_model()
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
+from django.contrib.auth.decorators import login_required
+from books.models import BorrowRecord
+from books.recommendations import recommend_for_user
+from .dashboard import aget_global_stats, get_global_stats, get_reader_stats
+from .parallel import gather_queries
+from .sampling import sample_available_books
 
 def index(request):
     """Главная страница для всех пользователей"""
-    featured_books = Book.objects.filter(available_copies__gt=0).order_by('?')[:6]
+    featured_books = sample_available_books(6)
 
     context = {
         'featured_books': featured_books,
     }
     return render(request, 'index.html', context)
 
+def _count_marks(stats, *names):
+    """Отметки приблизительных значений (≈, ≥) для показанных на панели счетчиков"""
+    return {name: mark for name, mark in stats['count_marks'].items() if name in names}
+
+
+def _staff_dashboard_context(role, stats, recent_borrowings):
+    if role == 'librarian':
+        return {
+            'active_borrowings_count': stats['active_borrowings_count'],
+            'overdue_borrowings_count': stats['overdue_borrowings_count'],
+            'recent_borrowings': recent_borrowings,
+            'total_books': stats['total_books'],
+            'available_books': stats['available_books'],
+            'count_marks': _count_marks(
+                stats, 'active_borrowings_count', 'overdue_borrowings_count', 'total_books', 'available_books',
+            ),
+        }
+
+    if role == 'admin':
+        return {
+            'total_users': stats['total_users'],
+            'total_books': stats['total_books'],
+            'active_borrowings_count': stats['active_borrowings_count'],
+            'overdue_borrowings_count': stats['overdue_borrowings_count'],
+            'librarians_count': stats['librarians_count'],
+            'readers_count': stats['readers_count'],
+            'available_books': stats['available_books'],
+            'borrowed_books_count': stats['active_borrowings_count'],
+            'count_marks': stats['count_marks'],
+        }
+
+    return {}
+
+
+def _recent_borrowings():
+    return BorrowRecord.objects.filter(
+        returned=False
+    ).select_related('book', 'user').order_by('-borrow_date')[:5]
+
+
+def _current_borrowings(user):
+    return BorrowRecord.objects.filter(
+        user=user,
+        returned=False
+    ).select_related('book', 'book__author')[:5]
+
+
+def _fill_recommendations(recommended_books, sample):
+    """Новым читателям без истории добавляем случайные доступные книги"""
+    if len(recommended_books) < 4:
+        recommended_ids = {book.pk for book in recommended_books}
+        recommended_books += [
+            book for book in sample() if book.pk not in recommended_ids
+        ][:4 - len(recommended_books)]
+    return recommended_books
+
+
+def _reader_dashboard_context(current_borrowings, recommended_books, stats, reader_stats):
+    return {
+        'current_borrowings': current_borrowings,
+        'recommended_books': recommended_books,
+        'total_books': stats['total_books'],
+        'available_books': stats['available_books'],
+        'count_marks': _count_marks(stats, 'total_books', 'available_books'),
+        **reader_stats,
+    }
+
+
 @login_required
 def dashboard(request):
     """Панель управления для авторизованных пользователей"""
@@ -24,42 +94,33 @@ def dashboard(request):
     if user.role == 'reader':
         return redirect('core:reader_dashboard')
 
-    context = {}
+    stats = get_global_stats()
+    recent_borrowings = _recent_borrowings() if user.role == 'librarian' else None
+    context = _staff_dashboard_context(user.role, stats, recent_borrowings)
+
+    return render(request, 'core/dashboard.html', context)
+
+
+@login_required
+async def dashboard_async(request):
+    """Панель управления: общие показатели и последние выдачи загружаются параллельно"""
+    user = await request.auser()
+
+    if user.role == 'reader':
+        return redirect('core:reader_dashboard_async')
 
     if user.role == 'librarian':
-        active_borrowings = BorrowRecord.objects.filter(returned=False)
-        overdue_borrowings = active_borrowings.filter(due_date__lt=timezone.now())
-        recent_borrowings = active_borrowings.select_related('book', 'user').order_by('-borrow_date')[:5]
+        stats, results = await asyncio.gather(
+            aget_global_stats(),
+            gather_queries({'recent_borrowings': lambda: list(_recent_borrowings())}),
+        )
+        recent_borrowings = results['recent_borrowings']
+    else:
+        stats, recent_borrowings = await aget_global_stats(), None
 
-        context.update({
-            'active_borrowings_count': active_borrowings.count(),
-            'overdue_borrowings_count': overdue_borrowings.count(),
-            'recent_borrowings': recent_borrowings,
-            'total_books': Book.objects.count(),
-            'available_books': Book.objects.filter(available_copies__gt=0).count(),
-        })
-
-    elif user.role == 'admin':
-        total_users = User.objects.count()
-        total_books = Book.objects.count()
-        active_borrowings = BorrowRecord.objects.filter(returned=False)
-        librarians_count = User.objects.filter(role='librarian').count()
-        readers_count = User.objects.filter(role='reader').count()
-
-        context.update({
-            'total_users': total_users,
-            'total_books': total_books,
-            'active_borrowings_count': active_borrowings.count(),
-            'overdue_borrowings_count': active_borrowings.filter(
-                due_date__lt=timezone.now()
-            ).count(),
-            'librarians_count': librarians_count,
-            'readers_count': readers_count,
-            'available_books': Book.objects.filter(available_copies__gt=0).count(),
-            'borrowed_books_count': active_borrowings.count(),
-        })
+    context = _staff_dashboard_context(user.role, stats, recent_borrowings)
+    return await sync_to_async(render)(request, 'core/dashboard.html', context)
 
-    return render(request, 'core/dashboard.html', context)
 
 @login_required
 def reader_dashboard(request):
@@ -69,26 +130,37 @@ def reader_dashboard(request):
     if user.role != 'reader':
         return redirect('core:dashboard')
 
-    all_current_borrowings = BorrowRecord.objects.filter(
-        user=user,
-        returned=False
-    ).select_related('book', 'book__author')
+    current_borrowings = _current_borrowings(user)
+    recommended_books = _fill_recommendations(
+        recommend_for_user(user, 4),
+        lambda: sample_available_books(4),
+    )
+    stats = get_global_stats()
 
-    current_borrowings = all_current_borrowings[:5]
+    context = _reader_dashboard_context(current_borrowings, recommended_books, stats, get_reader_stats(user))
+    return render(request, 'core/reader_dashboard.html', context)
 
-    recommended_books = Book.objects.filter(
-        available_copies__gt=0
-    ).order_by('?')[:4]
 
-    context = {
-        'current_borrowings': current_borrowings,
-        'recommended_books': recommended_books,
-        'user_borrowings_count': all_current_borrowings.count(),  # Используем полный QuerySet
-        'user_overdue_count': all_current_borrowings.filter(  # Используем полный QuerySet
-            due_date__lt=timezone.now()
-        ).count(),
-        'total_books': Book.objects.count(),
-        'available_books': Book.objects.filter(available_copies__gt=0).count(),
-    }
+@login_required
+async def reader_dashboard_async(request):
+    """Личная панель читателя: независимые запросы выполняются параллельно"""
+    user = await request.auser()
 
-    return render(request, 'core/reader_dashboard.html', context)
+    if user.role != 'reader':
+        return redirect('core:dashboard_async')
+
+    stats, results = await asyncio.gather(
+        aget_global_stats(),
+        gather_queries({
+            'current_borrowings': lambda: list(_current_borrowings(user)),
+            'recommended_books': lambda: recommend_for_user(user, 4),
+            'sample': lambda: sample_available_books(4),
+            'reader_stats': lambda: get_reader_stats(user),
+        }),
+    )
+    recommended_books = _fill_recommendations(results['recommended_books'], lambda: results['sample'])
+
+    context = _reader_dashboard_context(
+        results['current_borrowings'], recommended_books, stats, results['reader_stats']
+    )
+    return await sync_to_async(render)(request, 'core/reader_dashboard.html', context)
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     'users',
     'books', 
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.AuditContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -129,6 +131,41 @@ STATICFILES_DIRS = [
 ]
 
 
+# Кэш отчетов, блокировки их пересчета и поколение кэша должны быть общими
+# для всех процессов, поэтому кэш хранится в базе. Таблицу создает
+# python manage.py createcachetable (обязательный шаг развертывания);
+# вместо нее можно подключить общий Redis (django.core.cache.backends.redis.RedisCache).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'library_cache',
+    }
+}
+
+DASHBOARD_CACHE_TIMEOUT = 60
+
+REPORT_CACHE_TIMEOUT = 300
+REPORT_CACHE_STALE_TIMEOUT = 3600
+REPORT_QUERY_WORKERS = 4
+REPORT_RESULTS_ROOT = os.path.join(BASE_DIR, 'report_results')
+
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Дольше транзакции, добавляющие выдачи и книги, не длятся (секунды): столько
+# фоновые пересчеты ждут строки с пропущенными id ниже своих отметок
+HIGH_WATER_MARK_LAG = 300
+
+SAMPLE_POOL_SIZE = 500
+
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0
+AUDIT_ENQUEUE_TIMEOUT = 0.05
+AUDIT_PARTITIONS_AHEAD = 3
+AUDIT_RETENTION_MONTHS = 24
+AUDIT_ARCHIVE_ROOT = os.path.join(BASE_DIR, 'audit_archive')
+
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
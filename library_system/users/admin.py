@@ -1,9 +1,10 @@
 from django.contrib import admin
+from core.counts import EstimatedCountAdminMixin
 from django.contrib.auth.admin import UserAdmin
 from .models import User
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(EstimatedCountAdminMixin, UserAdmin):
     list_display = ('username', 'email', 'role', 'is_staff', 'date_joined')
     list_filter = ('role', 'is_staff', 'date_joined')
     fieldsets = UserAdmin.fieldsets + (
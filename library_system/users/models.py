@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -26,4 +28,9 @@ class User(AbstractUser):
     class Meta:
         db_table = 'library_users'
         verbose_name = 'Пользователь'
-        verbose_name_plural = 'Пользователи'
\ No newline at end of file
+        verbose_name_plural = 'Пользователи'
+        # Поиск по началу логина или фамилии без учета регистра (istartswith)
+        indexes = [
+            models.Index(OpClass(Upper('username'), name='text_pattern_ops'), name='user_username_prefix_idx'),
+            models.Index(OpClass(Upper('last_name'), name='text_pattern_ops'), name='user_last_name_prefix_idx'),
+        ]
\ No newline at end of file